@@ -0,0 +1,347 @@
+"""
+Замеры времени функций анализа операций на синтетических файлах со схемой LIST_OPERATION.
+
+Запуск:
+    python -m benchmarks.bench_pipeline --sizes 10k 1m 10m --repeat 3
+    python -m benchmarks.bench_pipeline --sizes 10k --compare benchmarks/results/<прежний замер>.json
+
+Файлы операций создаются один раз (каталог benchmarks/data), курсы валют и котировки отдаёт
+локальный сервер-заглушка (tests/stub_server.py), файлы с результатами функций пишутся во временный каталог.
+Результаты замеров записываются в JSON (по умолчанию — каталог benchmarks/results) вместе с коммитом,
+на котором они получены, чтобы сравнивать производительность разных версий.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from src.config import LIST_OPERATION
+from src.reports import clear_report_caches, spending_by_weekday
+from src.services import get_profitable_cashback
+from src.utils import (
+    conversion_to_single_currency,
+    filter_by_date,
+    get_data_from_expensess,
+    get_list_operation,
+    get_period_operation,
+    rate_cache,
+)
+from tests.stub_server import StubApiServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DATA_DIR = os.path.join(BENCH_DIR, "data")
+BENCH_RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Колонки файла операций
+OPERATION_COLUMNS: List[str] = list(LIST_OPERATION[1])
+# Размеры синтетических файлов по умолчанию
+DEFAULT_SIZES = ["10k", "1m", "10m"]
+# Строк в одном блоке при создании файла (файл на 10 млн строк не держится в памяти целиком)
+GENERATE_CHUNK_SIZE = 1_000_000
+# Период операций синтетического файла и дата, от которой строятся отчёты
+PERIOD_START = "2018-01-01"
+PERIOD_END = "2021-12-31"
+REPORT_DATE = "31.12.2021"
+
+EXPENSE_CATEGORIES = [
+    "Супермаркеты",
+    "Фастфуд",
+    "Рестораны",
+    "Транспорт",
+    "Такси",
+    "Одежда и обувь",
+    "Аптеки",
+    "Связь",
+    "Развлечения",
+    "Каршеринг",
+    "Переводы",
+    "Наличные",
+]
+INCOME_CATEGORIES = ["Пополнения", "Бонусы", "Переводы"]
+CURRENCIES = ["RUB", "USD", "EUR"]
+CURRENCY_WEIGHTS = [0.9, 0.06, 0.04]
+
+
+def parse_size(size: str) -> int:
+    """
+    Переводит размер файла в количество строк: "10k" → 10 000, "1m" → 1 000 000, "500" → 500.
+
+    :param size: размер
+    :return: количество строк
+    """
+    multipliers = {"k": 1_000, "m": 1_000_000}
+    size = size.strip().lower()
+    if size[-1:] in multipliers:
+        return int(float(size[:-1]) * multipliers[size[-1]])
+    return int(size)
+
+
+def generate_operations(rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Создаёт синтетические операции с колонками LIST_OPERATION[1] (OPERATION_COLUMNS) в формате файла банка
+    (даты строками, суммы числами; десятичная запятая задаётся при записи CSV).
+
+    :param rows: количество операций
+    :param seed: начальное значение генератора случайных чисел
+    :return: DataFrame с операциями
+    """
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(PERIOD_START, PERIOD_END, freq="D")
+    day_strings = np.asarray(days.strftime("%d.%m.%Y"))
+    time_strings = np.asarray([f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in range(0, 86400, 7)])
+
+    payment_dates = day_strings[rng.integers(0, len(days), rows)]
+    operation_dates = pd.Series(payment_dates) + " " + time_strings[rng.integers(0, len(time_strings), rows)]
+
+    is_income = rng.random(rows) < 0.15
+    amounts = np.round(rng.lognormal(mean=6.0, sigma=1.2, size=rows), 2)
+    amounts = np.where(is_income, amounts * 5, -amounts)
+    currencies = rng.choice(CURRENCIES, size=rows, p=CURRENCY_WEIGHTS)
+    categories = np.where(
+        is_income, rng.choice(INCOME_CATEGORIES, size=rows), rng.choice(EXPENSE_CATEGORIES, size=rows)
+    )
+    cashback = np.where(~is_income & (rng.random(rows) < 0.3), np.round(np.abs(amounts) * 0.01, 2), np.nan)
+
+    return pd.DataFrame(
+        {
+            "Дата операции": operation_dates,
+            "Дата платежа": payment_dates,
+            "Номер карты": rng.choice(["*7197", "*4556", "*5091"], size=rows),
+            "Статус": np.where(rng.random(rows) < 0.95, "OK", "FAILED"),
+            "Сумма операции": amounts,
+            "Валюта операции": currencies,
+            "Сумма платежа": amounts,
+            "Валюта платежа": currencies,
+            "Кэшбэк": cashback,
+            "Категория": categories,
+            "MCC": rng.integers(4000, 6000, rows),
+            "Описание": rng.choice(["Колхоз", "Магнит", "Яндекс Такси", "Перевод с карты"], size=rows),
+            "Бонусы (включая кэшбэк)": np.round(np.abs(amounts) / 100),
+            "Округление на инвесткопилку": 0.0,
+            "Сумма операции с округлением": np.abs(amounts),
+        },
+        columns=OPERATION_COLUMNS,
+    )
+
+
+def ensure_dataset(rows: int, data_dir: str = BENCH_DATA_DIR, seed: int = 0) -> str:
+    """
+    Возвращает путь к синтетическому CSV-файлу операций, создавая его блоками при первом обращении.
+
+    :param rows: количество операций
+    :param data_dir: каталог файлов
+    :param seed: начальное значение генератора случайных чисел
+    :return: путь к файлу
+    """
+    file_path = os.path.join(data_dir, f"operations_{rows}_{seed}.csv")
+    if os.path.isfile(file_path):
+        return file_path
+
+    os.makedirs(data_dir, exist_ok=True)
+    tmp_path = f"{file_path}.tmp"
+    for number, start in enumerate(range(0, rows, GENERATE_CHUNK_SIZE)):
+        chunk = generate_operations(min(GENERATE_CHUNK_SIZE, rows - start), seed + number)
+        chunk.to_csv(tmp_path, mode="w" if number == 0 else "a", header=number == 0, index=False, decimal=",")
+    os.replace(tmp_path, file_path)
+    return file_path
+
+
+def measure(func: Callable[[], Any], repeat: int, setup: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """
+    Замеряет время выполнения функции.
+
+    :param func: функция без аргументов
+    :param repeat: количество замеров
+    :param setup: функция, выполняемая перед каждым замером (не входит в замер)
+    :return: словарь: best_s, mean_s, times_s
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start_time = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start_time)
+    return {"best_s": round(min(times), 6), "mean_s": round(sum(times) / len(times), 6), "times_s": times}
+
+
+def benchmark_dataset(path_filename: str, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Замеряет функции на одном файле операций (курсы и котировки должны отдаваться заглушкой).
+
+    :param path_filename: путь к файлу операций
+    :param repeat: количество замеров каждой функции
+    :return: словарь: имя функции → результаты замера (см. measure)
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    df = get_list_operation(path_filename, OPERATION_COLUMNS)
+    results["get_list_operation"] = measure(lambda: get_list_operation(path_filename, OPERATION_COLUMNS), repeat)
+
+    # кэш разобранного файла: первый вызов сохраняет его, замеряются повторные
+    get_list_operation(path_filename, OPERATION_COLUMNS, use_cache=True)
+    results["get_list_operation_cached"] = measure(
+        lambda: get_list_operation(path_filename, OPERATION_COLUMNS, use_cache=True), repeat
+    )
+
+    list_period = get_period_operation(REPORT_DATE, "Y")
+    results["filter_by_date"] = measure(lambda: filter_by_date(df, list_period), repeat)
+
+    # курсы валют запрашиваются у заглушки при каждом замере
+    results["conversion_to_single_currency"] = measure(
+        lambda: conversion_to_single_currency(df, "RUB"), repeat, setup=rate_cache.clear
+    )
+    df_rub = conversion_to_single_currency(df, "RUB")
+    results["get_data_from_expensess"] = measure(lambda: get_data_from_expensess(df_rub), repeat)
+
+    year, month = REPORT_DATE[6:], REPORT_DATE[3:5]
+    results["get_profitable_cashback"] = measure(lambda: get_profitable_cashback(df, year, month), repeat)
+
+    # кэш отчётов очищается, иначе замерялось бы только попадание в кэш
+    results["spending_by_weekday"] = measure(
+        lambda: spending_by_weekday(df, REPORT_DATE), repeat, setup=clear_report_caches
+    )
+
+    for result in results.values():
+        result["rows"] = len(df)
+    return results
+
+
+def get_commit() -> Dict[str, Any]:
+    """
+    Возвращает текущий коммит git и признак незакоммиченных изменений.
+
+    :return: словарь: commit, dirty (None, если git недоступен)
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=BENCH_DIR
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=BENCH_DIR,
+        ).stdout
+        return {"commit": commit, "dirty": bool(status.strip())}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def run_benchmarks(sizes: List[str], repeat: int = 3, data_dir: str = BENCH_DATA_DIR) -> Dict[str, Any]:
+    """
+    Замеряет функции на синтетических файлах указанных размеров.
+
+    :param sizes: размеры файлов ("10k", "1m", "10m" или количество строк)
+    :param repeat: количество замеров каждой функции
+    :param data_dir: каталог синтетических файлов
+    :return: результаты замеров со сведениями об окружении
+    """
+    server = StubApiServer().start()
+    output_dir = tempfile.mkdtemp(prefix="bench_output_")
+    results: Dict[str, Any] = {
+        **get_commit(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "sizes": {},
+    }
+    try:
+        with ExitStack() as stack:
+            stack.enter_context(patch.dict(os.environ, {"API_KEY": "bench", "API_KEY_SP_500": "bench"}))
+            stack.enter_context(patch("src.utils.URL_EXCHANGE", f"{server.url}/v6/"))
+            stack.enter_context(patch("src.utils.URL_EXCHANGE_SP_500", f"{server.url}/stable/stock-peers?"))
+            stack.enter_context(patch("src.utils.URL_EXCHANGE_SP_500_BATCH", f"{server.url}/api/v3/quote-short/"))
+            # файлы с результатами функций (answer.json, reports.json и т. п.) — во временный каталог
+            stack.enter_context(patch("src.utils.DATA_DIR", output_dir))
+            stack.enter_context(patch("src.reports.DATA_DIR", output_dir))
+
+            for size in sizes:
+                rows = parse_size(size)
+                path_filename = ensure_dataset(rows, data_dir)
+                print(f"Замеры на файле {os.path.basename(path_filename)} ({rows} строк)")
+                results["sizes"][size] = benchmark_dataset(path_filename, repeat)
+    finally:
+        server.stop()
+        rate_cache.clear()
+        clear_report_caches()
+    return results
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.1) -> List[Dict[str, Any]]:
+    """
+    Сравнивает два замера по лучшему времени каждой функции.
+
+    :param baseline: прежний замер (см. run_benchmarks)
+    :param current: новый замер
+    :param threshold: допустимое замедление (0.1 — на 10 %), сверх него функция отмечается как регрессия
+    :return: список словарей: size, function, baseline_s, current_s, ratio, regression
+    """
+    comparison = []
+    for size, functions in current["sizes"].items():
+        for name, result in functions.items():
+            base = baseline.get("sizes", {}).get(size, {}).get(name)
+            if base is None:
+                continue
+            ratio = result["best_s"] / base["best_s"] if base["best_s"] else float("inf")
+            comparison.append(
+                {
+                    "size": size,
+                    "function": name,
+                    "baseline_s": base["best_s"],
+                    "current_s": result["best_s"],
+                    "ratio": round(ratio, 3),
+                    "regression": ratio > 1 + threshold,
+                }
+            )
+    return comparison
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Замеры времени функций анализа операций")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="размеры файлов: 10k, 1m, 10m, ...")
+    parser.add_argument("--repeat", type=int, default=3, help="количество замеров каждой функции")
+    parser.add_argument("--output", help="файл для результатов (по умолчанию — в каталоге benchmarks/results)")
+    parser.add_argument("--compare", help="файл с прежними результатами для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.1, help="допустимое замедление при сравнении")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.repeat)
+
+    output = args.output or os.path.join(
+        BENCH_RESULTS_DIR, f"bench_{results['commit'] or 'nogit'}_{datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=4)
+
+    for size, functions in results["sizes"].items():
+        for name, result in functions.items():
+            print(f"{size:>6} {name:<32} {result['best_s']:>10.4f} с")
+    print(f"Результаты записаны в {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Сравнение с {baseline.get('commit')}:")
+        for row in compare_results(baseline, results, args.threshold):
+            mark = "  РЕГРЕССИЯ" if row["regression"] else ""
+            print(f"{row['size']:>6} {row['function']:<32} ×{row['ratio']:.2f}{mark}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,52 @@
+import argparse
 import json
 import os
 
 import pandas as pd
 
 from src import app_logger
+from src.aggregates import build_daily_aggregates, get_prefix_sum_index
 from src.config import DATA_DIR, LIST_OPERATION
+from src.profiling import PipelineProfiler
 from src.reports import spending_by_weekday
 from src.services import get_profitable_cashback
-from src.utils import get_list_operation
+from src.tracing import log_run_summary
+from src.utils import get_list_operation, load_rate_history, load_rate_store, save_rate_store
 from src.views import events_operations
+from src.writer import start_output_writer, stop_output_writer
 
 path_s = os.path.join(DATA_DIR, LIST_OPERATION[0])
 logger = app_logger.get_logger("main.log")
 
 
-if __name__ == '__main__':
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Анализ банковских операций")
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="профилировать этапы программы (cProfile и tracemalloc), отчёты записываются в каталог logs",
+    )
+    args = parser.parse_args()
+    profiler = PipelineProfiler(enabled=args.profile)
+
     logger.info("Начало работы программы")
 
+    # Логи и файлы с результатами записываются в фоне, не задерживая расчёты
+    app_logger.start_log_listener()
+    start_output_writer()
+
     # Вызов функции считывание данных из файла и фильтруем по статусу операции <<OK>>
     print(f"Считывание данных из файла {LIST_OPERATION[0]}")
-    logger.info(f"Считывание данных из файла {LIST_OPERATION[0]}\n")
+    logger.info("Считывание данных из файла %s\n", LIST_OPERATION[0])
+
+    with profiler.stage("load"):
+        df = get_list_operation(path_s, LIST_OPERATION[1], use_cache=True)
+
+        # Курсы валют, полученные предыдущими запусками (за текущую дату)
+        load_rate_store()
 
-    df = get_list_operation(path_s, LIST_OPERATION[1])
+        # Исторические курсы валют (если файл есть — суммы пересчитываются по курсу на дату платежа)
+        rate_history = load_rate_history()
 
     if df is None or len(df) == 0:
         logger.error("Нет данных для дальнейшей обработки")
@@ -30,27 +55,55 @@ if __name__ == '__main__':
         logger.error("df должен быть pandas.DataFrame")
 
     else:
+        with profiler.stage("aggregates"):
+            # Дневные агрегаты строятся один раз, разделы «Расходы» и «Поступления» считаются по ним
+            aggregates = build_daily_aggregates(df)
+            # Индекс нарастающих итогов хранится в кэше рядом с файлом операций
+            prefix_index = get_prefix_sum_index(path_s, df, LIST_OPERATION[1])
+
         # Вызов функции события events_operations
         print("=" * 20, "Формирование раздела События")
         logger.info("вызов функции events_operations для формирования раздела События")
         try:
-            result = events_operations(df, "20.05.2020", "Y")
+            with profiler.stage("events"):
+                result = events_operations(
+                    df,
+                    "20.05.2020",
+                    "Y",
+                    rate_history=None if rate_history.empty else rate_history,
+                    aggregates=aggregates,
+                    prefix_index=prefix_index,
+                )
 
             print(json.dumps(result, indent=4, ensure_ascii=False))
             if result is None:
                 logger.error("Ошибка функции events_operations для раздела События")
         except Exception as e:
-                logger.error(f"Ошибка функции events_operations для раздела События - {e}")
+            logger.error(f"Ошибка функции events_operations для раздела События - {e}")
 
         # Вызов функции анадиз повышенного кешбека get_profitable_cashback
-        logger.info("вызов функции get_profitable_cashback анализ повышенного кешбека для формирования раздела Сервисы")
+        logger.info(
+            "вызов функции get_profitable_cashback анализ повышенного кешбека для формирования раздела Сервисы"
+        )
         print("=" * 20, "Выгодные категории повышенного кешбэка:")
-        result = get_profitable_cashback(df, "2019", "10")
+        with profiler.stage("cashback"):
+            result = get_profitable_cashback(df, "2019", "10")
         print(json.dumps(result, indent=4, ensure_ascii=False))
 
         print("=" * 20, "Траты по дням недели:")
-        result = spending_by_weekday(df,"01.01.2022")
-        print(json.dumps(result.to_dict('records'), indent=4, ensure_ascii=False))
+        with profiler.stage("weekday_report"):
+            result = spending_by_weekday(df, "01.01.2022")
+        print(json.dumps(result.to_dict("records"), indent=4, ensure_ascii=False))
+
+    save_rate_store()
+    stop_output_writer()
+
+    # отчёты профилирования (если включено) — в каталоге logs
+    for report_path in profiler.write_report().values():
+        print(f"Отчёт профилирования: {report_path}")
 
     print("Завершение работы программы")
     logger.info("Завершение работы программы")
+    # сводка по этапам обработки (время, строки, попадания в кэш) — в logs/trace.jsonl
+    log_run_summary()
+    app_logger.stop_log_listener()
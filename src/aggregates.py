@@ -0,0 +1,280 @@
+import os
+from typing import Any, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from src import app_logger
+from src.cache import get_frame_fingerprint, load_frame_cache, save_frame_cache
+from src.config import COUNT_COLUMN, LIST_OPERATION, PAYMENT_DATE_COLUMN, SIGN_COLUMN
+from src.utils import normalize_operations, slice_by_period
+
+# Настройка логирования
+logger = app_logger.get_logger("aggregates.log")
+
+# Ключ агрегата (кроме дня): категория, валюта платежа, знак операции
+AGGREGATE_KEYS: List[str] = [str(LIST_OPERATION[4]), str(LIST_OPERATION[2]), SIGN_COLUMN]
+# Суммируемые показатели: сумма платежа, количество операций, кэшбэк
+AGGREGATE_VALUES: List[str] = [str(LIST_OPERATION[3]), COUNT_COLUMN, "Кэшбэк"]
+
+
+def group_daily_aggregates(df: DataFrame, day_values: np.ndarray) -> DataFrame:
+    """
+    Группирует строки (операции или уже посчитанные агрегаты) по дню и ключу агрегата.
+
+    :param df: DataFrame с колонками AGGREGATE_KEYS и AGGREGATE_VALUES
+    :param day_values: день (datetime64) для каждой строки df
+    :return: агрегаты, отсортированные по дню; индекс и колонка "Дата платежа" — день
+    """
+    keys: List[Any] = [pd.DatetimeIndex(day_values, name=PAYMENT_DATE_COLUMN), *AGGREGATE_KEYS]
+    grouped = (
+        df[AGGREGATE_KEYS + AGGREGATE_VALUES]
+        .groupby(keys, dropna=False, observed=True)
+        .sum()
+        .reset_index(level=AGGREGATE_KEYS)
+    )
+    grouped[COUNT_COLUMN] = grouped[COUNT_COLUMN].astype("int64")
+    grouped[PAYMENT_DATE_COLUMN] = grouped.index
+    return grouped
+
+
+def build_daily_aggregates(df: DataFrame) -> DataFrame:
+    """
+    Строит материализованные дневные агрегаты операций: сумма платежа, количество операций и кэшбэк
+    по каждому дню, категории, валюте платежа и знаку операции (-1 — расход, 1 — поступление).
+
+    Агрегаты имеют ту же схему, что и операции (колонки "Дата платежа", "Категория", "Валюта платежа",
+    "Сумма платежа"), поэтому к ним применимы slice_by_period, conversion_to_single_currency
+    и get_data_by_categories. Операции с нулевой или некорректной суммой не учитываются.
+
+    :param df: DataFrame с операциями
+    :return: DataFrame с агрегатами, индекс — отсортированные дни платежа
+    """
+    category_col, currency_col, _ = AGGREGATE_KEYS
+    amount_col = str(LIST_OPERATION[3])
+
+    df = normalize_operations(df)
+    amounts = pd.to_numeric(df[amount_col], errors="coerce").to_numpy(dtype=float)
+    signs = np.sign(amounts)
+    rows = np.flatnonzero(signs != 0)
+    rows = rows[~np.isnan(signs[rows])]
+
+    # отсутствующие в данных колонки ключа считаются пустыми, отсутствующий кэшбэк — нулевым
+    cashback = df["Кэшбэк"] if "Кэшбэк" in df.columns else pd.Series(0.0, index=df.index)
+    missing_keys = np.full(len(rows), None, dtype=object)
+    operations = pd.DataFrame(
+        {
+            category_col: df[category_col].array.take(rows) if category_col in df.columns else missing_keys,
+            currency_col: df[currency_col].array.take(rows) if currency_col in df.columns else missing_keys,
+            SIGN_COLUMN: signs[rows].astype("int8"),
+            amount_col: amounts[rows],
+            COUNT_COLUMN: np.ones(len(rows), dtype="int64"),
+            "Кэшбэк": pd.to_numeric(cashback, errors="coerce").fillna(0.0).to_numpy(dtype=float)[rows],
+        }
+    )
+    day_values = pd.DatetimeIndex(df.index).normalize().to_numpy()[rows]
+    aggregates = group_daily_aggregates(operations, day_values)
+
+    logger.info("Построены дневные агрегаты: %s операций → %s строк", len(df), len(aggregates))
+    return aggregates
+
+
+def append_daily_aggregates(aggregates: DataFrame, new_operations: DataFrame) -> DataFrame:
+    """
+    Дополняет дневные агрегаты новыми операциями без повторного прохода по уже учтённым операциям.
+
+    Пересчитываются только строки агрегатов, начиная с самого раннего дня среди новых операций;
+    при добавлении операций за новые дни агрегаты просто дописываются в конец.
+
+    :param aggregates: агрегаты, построенные build_daily_aggregates
+    :param new_operations: DataFrame с новыми операциями
+    :return: обновлённые агрегаты (исходный DataFrame не изменяется)
+    """
+    new_aggregates = build_daily_aggregates(new_operations)
+    if new_aggregates.empty:
+        return aggregates
+    if aggregates.empty:
+        return new_aggregates
+
+    # Агрегаты, которые не затрагиваются новыми операциями, переиспользуются как есть
+    start = pd.DatetimeIndex(aggregates.index).searchsorted(new_aggregates.index[0], side="left")
+    head = aggregates.iloc[:start]
+    tail = aggregates.iloc[start:]
+    if not tail.empty:
+        merged = pd.concat([tail, new_aggregates])
+        new_aggregates = group_daily_aggregates(merged, merged.index.to_numpy())
+
+    logger.info(
+        "Дневные агрегаты дополнены: пересчитано %s строк, добавлено операций %s", len(tail), len(new_operations)
+    )
+    result: DataFrame = pd.concat([head, new_aggregates])
+    return result
+
+
+def get_period_aggregates(aggregates: DataFrame, data_from: Any, data_to: Any) -> DataFrame:
+    """
+    Возвращает агрегаты за период [data_from, data_to), свёрнутые по категории, валюте и знаку операции.
+
+    :param aggregates: агрегаты, построенные build_daily_aggregates
+    :param data_from: начало периода (включительно)
+    :param data_to: конец периода (не включительно)
+    :return: DataFrame с колонками AGGREGATE_KEYS и AGGREGATE_VALUES
+    """
+    period = slice_by_period(aggregates, data_from, data_to)
+    result: DataFrame = (
+        period[AGGREGATE_KEYS + AGGREGATE_VALUES]
+        .groupby(AGGREGATE_KEYS, dropna=False, observed=True, sort=False)
+        .sum()
+        .reset_index()
+    )
+    return result
+
+
+class PrefixSumIndex:
+    """
+    Индекс нарастающих итогов по дневным агрегатам: для каждого ключа (категория, валюта, знак)
+    хранятся суммы платежей, количества операций и кэшбэка с начала истории до каждого дня.
+
+    Итоги за любой период [data_from, data_to) получаются двумя бинарными поисками по дням
+    и вычитанием двух строк нарастающих итогов — без прохода по операциям или агрегатам за период.
+    """
+
+    def __init__(self, days: pd.DatetimeIndex, keys: DataFrame, cumsums: np.ndarray) -> None:
+        """
+        :param days: отсортированные дни, за которые есть агрегаты
+        :param keys: ключи агрегатов (колонки AGGREGATE_KEYS), по одной строке на ключ
+        :param cumsums: нарастающие итоги формы (показатель, день + 1, ключ);
+            первая строка по дням — нулевая (итог до первого дня)
+        """
+        self.days = days
+        self.keys = keys
+        self.cumsums = cumsums
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    @classmethod
+    def from_aggregates(cls, aggregates: DataFrame) -> "PrefixSumIndex":
+        """
+        Строит индекс по дневным агрегатам.
+
+        :param aggregates: агрегаты, построенные build_daily_aggregates
+        :return: PrefixSumIndex
+        """
+        day_codes, days = pd.factorize(pd.DatetimeIndex(aggregates.index), sort=True)
+        key_frame = aggregates[AGGREGATE_KEYS].astype({column: object for column in AGGREGATE_KEYS[:2]})
+        key_codes = key_frame.groupby(AGGREGATE_KEYS, dropna=False, sort=False).ngroup().to_numpy()
+        keys = key_frame.drop_duplicates(ignore_index=True)
+
+        cumsums = np.zeros((len(AGGREGATE_VALUES), len(days) + 1, len(keys)))
+        for position, column in enumerate(AGGREGATE_VALUES):
+            np.add.at(cumsums[position], (day_codes + 1, key_codes), aggregates[column].to_numpy(dtype=float))
+        np.cumsum(cumsums, axis=1, out=cumsums)
+
+        logger.info("Построен индекс нарастающих итогов: %s дней × %s ключей", len(days), len(keys))
+        return cls(pd.DatetimeIndex(days), keys, cumsums)
+
+    def get_period_aggregates(self, data_from: Any, data_to: Any) -> DataFrame:
+        """
+        Возвращает итоги за период [data_from, data_to) по каждому ключу (только ключи с операциями за период).
+
+        :param data_from: начало периода (включительно)
+        :param data_to: конец периода (не включительно)
+        :return: DataFrame с колонками AGGREGATE_KEYS и AGGREGATE_VALUES (как у get_period_aggregates)
+        """
+        totals = self.get_periods_totals([[data_from, data_to]])
+
+        result = self.keys.copy()
+        for position, column in enumerate(AGGREGATE_VALUES):
+            result[column] = totals[position, 0]
+        result[COUNT_COLUMN] = result[COUNT_COLUMN].round().astype("int64")
+        period: DataFrame = result.loc[result[COUNT_COLUMN] > 0].reset_index(drop=True)
+        return period
+
+    def get_periods_totals(self, list_periods: List[List[Any]]) -> np.ndarray:
+        """
+        Возвращает итоги сразу за несколько периодов [data_from, data_to) одной векторной операцией.
+
+        :param list_periods: список периодов [data_from, data_to]
+        :return: массив формы (показатель, период, ключ) в порядке AGGREGATE_VALUES и self.keys
+        """
+        bounds = pd.DatetimeIndex([pd.Timestamp(bound) for period in list_periods for bound in period[:2]])
+        positions = self.days.searchsorted(bounds, side="left").reshape(-1, 2)
+        totals = self.cumsums[:, positions[:, 1], :] - self.cumsums[:, positions[:, 0], :]
+        # разность нарастающих итогов содержит погрешность вычислений с плавающей точкой — суммы в копейках
+        result: np.ndarray = np.round(totals, 2)
+        return result
+
+    def to_frames(self) -> Tuple[DataFrame, DataFrame]:
+        """
+        Представляет индекс в виде двух DataFrame для сохранения в кэше.
+
+        :return: кортеж (ключи, нарастающие итоги: индекс — дни, колонки "<показатель>|<номер ключа>")
+        """
+        columns = [f"{column}|{key}" for column in AGGREGATE_VALUES for key in range(len(self.keys))]
+        values = self.cumsums[:, 1:, :].transpose(1, 0, 2).reshape(len(self.days), -1)
+        sums = pd.DataFrame(values, index=self.days, columns=columns)
+        keys = self.keys.astype({column: "string" for column in AGGREGATE_KEYS[:2]})
+        return keys, sums
+
+    @classmethod
+    def from_frames(cls, keys: DataFrame, sums: DataFrame) -> "PrefixSumIndex":
+        """
+        Восстанавливает индекс из DataFrame, полученных методом to_frames.
+
+        :param keys: ключи агрегатов
+        :param sums: нарастающие итоги
+        :return: PrefixSumIndex
+        """
+        values = sums.to_numpy(dtype=float).reshape(len(sums), len(AGGREGATE_VALUES), len(keys)).transpose(1, 0, 2)
+        cumsums = np.concatenate([np.zeros((len(AGGREGATE_VALUES), 1, len(keys))), values], axis=1)
+        keys = keys.astype({column: object for column in AGGREGATE_KEYS[:2]})
+        for column in AGGREGATE_KEYS[:2]:
+            keys[column] = keys[column].where(keys[column].notna(), np.nan)
+        return cls(pd.DatetimeIndex(sums.index), keys, cumsums)
+
+
+def get_prefix_sum_index(
+    path_filename: str,
+    df: DataFrame,
+    list_operation: Sequence[str],
+    filter_str: str = "OK",
+    name_field: str = "Статус",
+) -> PrefixSumIndex:
+    """
+    Возвращает индекс нарастающих итогов для операций из файла path_filename.
+
+    Индекс хранится в кэше рядом с файлом вместе с разобранными операциями (см. get_list_operation)
+    и пересобирается только при изменении исходного файла, параметров загрузки или переданных операций
+    («отпечаток» df входит в ключ кэша, поэтому индекс по другому DataFrame не подменяет сохранённый).
+
+    :param path_filename: путь к исходному файлу операций
+    :param df: операции, загруженные из этого файла функцией get_list_operation
+    :param list_operation: список обязательных полей (параметр загрузки)
+    :param filter_str: статус операции (параметр загрузки)
+    :param name_field: имя колонки статуса (параметр загрузки)
+    :return: PrefixSumIndex
+    """
+    params = {
+        "columns": list(list_operation),
+        "filter_str": filter_str,
+        "name_field": name_field,
+        "frame": get_frame_fingerprint(df),
+    }
+    keys_params = {**params, "index": "prefix_sums", "part": "keys"}
+    sums_params = {**params, "index": "prefix_sums", "part": "sums"}
+
+    if os.path.isfile(path_filename):
+        keys, fingerprint = load_frame_cache(path_filename, keys_params)
+        sums = load_frame_cache(path_filename, sums_params)[0] if keys is not None else None
+        if keys is not None and sums is not None:
+            logger.info("Индекс нарастающих итогов для %s загружен из кэша", os.path.basename(path_filename))
+            return PrefixSumIndex.from_frames(keys, sums)
+
+    index = PrefixSumIndex.from_aggregates(build_daily_aggregates(df))
+    if os.path.isfile(path_filename):
+        keys, sums = index.to_frames()
+        save_frame_cache(path_filename, keys_params, keys, fingerprint)
+        save_frame_cache(path_filename, sums_params, sums, fingerprint)
+    return index
@@ -1,23 +1,50 @@
+import atexit
 import logging
 import os
+import queue
+import threading
 from logging import Logger
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from typing import Dict, Optional
 
-from src.config import LOG_DIR
+from src.config import LOG_BACKUP_COUNT, LOG_DIR, LOG_MAX_BYTES, LOG_ROTATE_WHEN, LOG_ROTATION
 
 s_log_format: str = "%(asctime)s - [%(levelname)s] - (%(filename)s).%(funcName)s(%(lineno)d) - %(message)s"
 
+# Реестр логгеров: каждый логгер настраивается один раз, файловые обработчики общие для одного файла
+loggers: Dict[str, Logger] = {}
+handlers_by_path: Dict[str, logging.FileHandler] = {}
+registry_lock = threading.RLock()
 
-def get_file_handler(name: str) -> logging.FileHandler:
+
+def get_file_handler(name: str, log_format: str = s_log_format) -> logging.FileHandler:
     """
-    Создаёт файловый обработчик логов.
+    Возвращает файловый обработчик логов с ротацией (LOG_ROTATION).
+    Для одного файла создаётся один обработчик, повторные вызовы возвращают его же.
 
     :param name: имя файла лога (без пути)
+    :param log_format: формат строки лога (применяется при создании обработчика)
     :return: экземпляр FileHandler
     """
-    file_handler = logging.FileHandler(os.path.join(LOG_DIR, name), mode="w", encoding="utf-8")
-    file_handler.setLevel(logging.INFO)
-    file_handler.setFormatter(logging.Formatter(s_log_format))
-    return file_handler
+    file_path = os.path.abspath(os.path.join(LOG_DIR, name))
+    with registry_lock:
+        file_handler = handlers_by_path.get(file_path)
+        if file_handler is not None:
+            return file_handler
+
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        if LOG_ROTATION == "time":
+            file_handler = TimedRotatingFileHandler(
+                file_path, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+            )
+        else:
+            file_handler = RotatingFileHandler(
+                file_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+            )
+        file_handler.setLevel(logging.INFO)
+        file_handler.setFormatter(logging.Formatter(log_format))
+        handlers_by_path[file_path] = file_handler
+        return file_handler
 
 
 def get_stream_handler() -> logging.StreamHandler:
@@ -32,18 +59,91 @@ def get_stream_handler() -> logging.StreamHandler:
     return stream_handler
 
 
-def get_logger(name: str) -> Logger:
+# Фоновая запись логов: логгеры кладут записи в общую очередь, один поток пишет все файлы
+log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+queue_handler = QueueHandler(log_queue)
+log_listener: Optional[QueueListener] = None
+listener_lock = threading.Lock()
+# Файловые обработчики логгеров (имя логгера → обработчик)
+file_handlers: Dict[str, logging.Handler] = {}
+
+
+class FileRouter(logging.Handler):
+    """
+    Обработчик потока фоновой записи: передаёт запись из очереди файловому обработчику её логгера.
+    """
+
+    def emit(self, record: logging.LogRecord) -> None:
+        handler = file_handlers.get(record.name)
+        if handler is not None and record.levelno >= handler.level:
+            handler.handle(record)
+
+
+def get_logger(name: str, log_format: str = s_log_format) -> Logger:
     """
     Создаёт логгер с файловым и консольным обработчиками.
+    Логгер настраивается при первом вызове, повторные вызовы возвращают его же без новых обработчиков.
+    Если включена фоновая запись логов (start_log_listener), файл пишется потоком фоновой записи.
 
     :param name: имя логгера (обычно __name__ модуля)
+    :param log_format: формат строки лога в файле
     :return: настроеннный экземпляр Logger
     """
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
+    with registry_lock:
+        if name in loggers:
+            return loggers[name]
+
+        logger = logging.getLogger(name)
+        logger.setLevel(logging.INFO)
+
+        # Добавляем обработчики
+        file_handler = get_file_handler(name, log_format)
+        with listener_lock:
+            file_handlers[name] = file_handler
+            logger.addHandler(queue_handler if log_listener is not None else file_handler)
+        # logger.addHandler(get_stream_handler())
+
+        loggers[name] = logger
+        return logger
+
+
+def start_log_listener() -> QueueListener:
+    """
+    Включает фоновую запись логов: файловые обработчики логгеров заменяются общим обработчиком очереди,
+    в вызывающем потоке остаётся только подстановка аргументов в сообщение.
+    Оставшиеся записи пишутся в файлы при завершении программы.
+
+    :return: QueueListener
+    """
+    global log_listener
+    with listener_lock:
+        if log_listener is None:
+            for name, file_handler in file_handlers.items():
+                logger = logging.getLogger(name)
+                logger.removeHandler(file_handler)
+                if queue_handler not in logger.handlers:
+                    logger.addHandler(queue_handler)
+            log_listener = QueueListener(log_queue, FileRouter())
+            log_listener.start()
+            atexit.register(stop_log_listener)
+        return log_listener
 
-    # Добавляем обработчики
-    logger.addHandler(get_file_handler(name))
-    # logger.addHandler(get_stream_handler())
 
-    return logger
+def stop_log_listener() -> None:
+    """
+    Записывает оставшиеся в очереди записи и возвращает логгерам файловые обработчики.
+
+    :return: None
+    """
+    global log_listener
+    with listener_lock:
+        listener, log_listener = log_listener, None
+        if listener is None:
+            return
+        for name, file_handler in file_handlers.items():
+            logger = logging.getLogger(name)
+            logger.removeHandler(queue_handler)
+            if file_handler not in logger.handlers:
+                logger.addHandler(file_handler)
+    listener.stop()
+    atexit.unregister(stop_log_listener)
@@ -0,0 +1,384 @@
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from src import app_logger
+from src.config import CACHE_DIR_NAME, CACHE_FORMAT, FILE_HASH_CACHE_SIZE, FRAME_FINGERPRINT_SAMPLE
+
+# Настройка логирования
+logger = app_logger.get_logger("cache.log")
+
+# parquet доступен только при установленном pyarrow, иначе используем pickle
+PARQUET_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+
+def get_file_hash(path_filename: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Вычисляет хэш SHA-256 содержимого файла (читает файл блоками).
+    Хэш запоминается по пути, размеру и времени изменения файла (см. file_hash_cache),
+    поэтому повторные вызовы для неизменённого файла не читают его заново.
+
+    :param path_filename: путь к файлу
+    :param chunk_size: размер блока чтения в байтах
+    :return: хэш в шестнадцатеричном виде
+    """
+    stat = os.stat(path_filename)
+    cache_key = (os.path.abspath(path_filename), stat.st_size, stat.st_mtime_ns)
+    cached_hash = file_hash_cache.get(cache_key)
+    if cached_hash is not None:
+        return str(cached_hash)
+
+    hasher = hashlib.sha256()
+    with open(path_filename, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(chunk)
+    file_hash = hasher.hexdigest()
+    file_hash_cache.set(cache_key, file_hash)
+    return file_hash
+
+
+def get_file_fingerprint(path_filename: str, with_hash: bool = True) -> Dict[str, Any]:
+    """
+    Возвращает «отпечаток» файла: путь, размер, время изменения и (опционально) хэш содержимого.
+
+    :param path_filename: путь к файлу
+    :param with_hash: вычислять ли хэш содержимого
+    :return: словарь с полями path, size, mtime_ns, sha256
+    """
+    stat = os.stat(path_filename)
+    return {
+        "path": os.path.abspath(path_filename),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": get_file_hash(path_filename) if with_hash else None,
+    }
+
+
+def get_values_words(values: Union[pd.Series, pd.Index]) -> np.ndarray:
+    """
+    Представляет значения колонки или индекса массивом uint64 (одно число на значение).
+    Числа, даты и логические значения берутся в двоичном представлении без хэширования,
+    категории — кодами, строки и прочие значения — хэшами pandas.util.hash_array.
+
+    :param values: колонка DataFrame или индекс
+    :return: массив uint64 длиной len(values)
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return np.asarray(values.array.codes).astype(np.uint64)
+    array = None if pd.api.types.is_extension_array_dtype(values.dtype) else values.to_numpy()
+    if array is not None and array.dtype.kind in "biufmM":
+        return np.ascontiguousarray(array).view(f"u{array.dtype.itemsize}").astype(np.uint64, copy=False)
+    if array is not None and array.dtype == object:
+        return pd.util.hash_array(array)
+    return pd.util.hash_pandas_object(pd.Series(values), index=False).to_numpy()
+
+
+def get_frame_fingerprint(df: DataFrame, sample_size: int = FRAME_FINGERPRINT_SAMPLE) -> str:
+    """
+    Вычисляет «отпечаток» DataFrame: размер, колонки, типы, контрольные суммы всех значений
+    каждой колонки и индекса (см. get_values_words) и хэш не более sample_size строк,
+    равномерно взятых по всему DataFrame. Изменение любого значения меняет «отпечаток».
+
+    :param df: DataFrame
+    :param sample_size: количество строк в выборке
+    :return: хэш в шестнадцатеричном виде
+    """
+    # контрольная сумма колонки — сумма значений с нечётными весами по позициям (mod 2**64):
+    # изменение любого значения или перестановка разных значений меняют сумму
+    weights = np.arange(1, 2 * len(df), 2, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    columns = [df.index] + [df.iloc[:, number] for number in range(df.shape[1])]
+    checksums = [int(np.dot(get_values_words(values), weights)) for values in columns]
+    # категории колонок входят в описание типов
+    dtypes = [
+        list(map(str, dtype.categories)) if isinstance(dtype, pd.CategoricalDtype) else str(dtype)
+        for dtype in df.dtypes
+    ]
+
+    hasher = hashlib.sha256()
+    hasher.update(json.dumps([df.shape, list(map(str, df.columns)), dtypes, checksums], default=str).encode("utf-8"))
+    if len(df) > 0:
+        positions = np.unique(np.linspace(0, len(df) - 1, num=min(len(df), sample_size)).astype(np.int64))
+        hasher.update(pd.util.hash_pandas_object(df.iloc[positions], index=True).to_numpy().tobytes())
+    return hasher.hexdigest()
+
+
+def get_params_key(params: Dict[str, Any]) -> str:
+    """
+    Строит ключ по параметрам загрузки (набор колонок, фильтр и т.п.).
+
+    :param params: словарь параметров, сериализуемый в JSON
+    :return: короткий хэш параметров
+    """
+    raw = json.dumps(params, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def get_cache_format() -> str:
+    """
+    Возвращает формат хранения кэша с учётом доступности pyarrow.
+
+    :return: "parquet" или "pickle"
+    """
+    if CACHE_FORMAT == "parquet" and not PARQUET_AVAILABLE:
+        return "pickle"
+    return CACHE_FORMAT
+
+
+def get_cache_dir(path_filename: str) -> str:
+    """
+    Возвращает каталог кэша, расположенный рядом с исходным файлом.
+
+    :param path_filename: путь к исходному файлу
+    :return: путь к каталогу кэша
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(path_filename)), CACHE_DIR_NAME)
+
+
+def get_meta_path(path_filename: str, params: Dict[str, Any]) -> str:
+    """
+    Возвращает путь к файлу метаданных кэша для исходного файла и параметров загрузки.
+
+    :param path_filename: путь к исходному файлу
+    :param params: параметры загрузки
+    :return: путь к JSON-файлу с метаданными
+    """
+    file_name = f"{os.path.basename(path_filename)}.{get_params_key(params)}.json"
+    return os.path.join(get_cache_dir(path_filename), file_name)
+
+
+def read_meta(meta_path: str) -> Dict[str, Any]:
+    """
+    Считывает метаданные кэша.
+
+    :param meta_path: путь к JSON-файлу с метаданными
+    :return: словарь с метаданными, пустой словарь если файла нет или он повреждён
+    """
+    if not os.path.isfile(meta_path):
+        return {}
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta: Dict[str, Any] = json.load(f)
+        return meta
+    except (OSError, ValueError) as e:
+        logger.error(f"Не удалось прочитать метаданные кэша {meta_path}: {e}")
+        return {}
+
+
+def write_meta(meta_path: str, meta: Dict[str, Any]) -> None:
+    """
+    Записывает метаданные кэша (через временный файл, чтобы не оставить его частично записанным).
+
+    :param meta_path: путь к JSON-файлу с метаданными
+    :param meta: словарь с метаданными
+    :return: None
+    """
+    tmp_path = f"{meta_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, meta_path)
+
+
+def read_frame(data_path: str, cache_format: str) -> DataFrame:
+    """
+    Читает DataFrame из файла кэша.
+
+    :param data_path: путь к файлу с данными
+    :param cache_format: "parquet" или "pickle"
+    :return: DataFrame
+    """
+    if cache_format == "parquet":
+        return pd.read_parquet(data_path)
+    result: DataFrame = pd.read_pickle(data_path)
+    return result
+
+
+def write_frame(df: DataFrame, data_path: str, cache_format: str) -> None:
+    """
+    Записывает DataFrame в файл кэша (через временный файл).
+
+    :param df: DataFrame для записи
+    :param data_path: путь к файлу с данными
+    :param cache_format: "parquet" или "pickle"
+    :return: None
+    """
+    tmp_path = f"{data_path}.tmp"
+    if cache_format == "parquet":
+        df.to_parquet(tmp_path)
+    else:
+        df.to_pickle(tmp_path, compression=None)
+    os.replace(tmp_path, data_path)
+
+
+def load_frame_cache(path_filename: str, params: Dict[str, Any]) -> Tuple[Optional[DataFrame], Dict[str, Any]]:
+    """
+    Ищет в кэше DataFrame, полученный ранее из файла path_filename с параметрами params.
+
+    Если размер и время изменения файла совпадают с сохранёнными — хэш не пересчитывается.
+    Если время изменилось, но содержимое то же (совпал хэш) — кэш считается актуальным.
+
+    :param path_filename: путь к исходному файлу
+    :param params: параметры загрузки
+    :return: кортеж (DataFrame или None при промахе, отпечаток файла)
+    """
+    meta_path = get_meta_path(path_filename, params)
+    meta = read_meta(meta_path)
+    fingerprint = get_file_fingerprint(path_filename, with_hash=False)
+
+    if not meta or not os.path.isfile(meta.get("data_path", "")):
+        fingerprint["sha256"] = get_file_hash(path_filename)
+        return None, fingerprint
+
+    source = meta.get("source", {})
+    if source.get("size") == fingerprint["size"] and source.get("mtime_ns") == fingerprint["mtime_ns"]:
+        fingerprint["sha256"] = source.get("sha256")
+    else:
+        fingerprint["sha256"] = get_file_hash(path_filename)
+        if source.get("sha256") != fingerprint["sha256"]:
+            logger.info("Файл %s изменился, кэш будет пересобран", os.path.basename(path_filename))
+            return None, fingerprint
+        # содержимое не изменилось — обновляем время изменения в метаданных
+        meta["source"] = fingerprint
+        write_meta(meta_path, meta)
+
+    try:
+        return read_frame(meta["data_path"], meta.get("format", "pickle")), fingerprint
+    except Exception as e:
+        logger.error(f"Ошибка чтения кэша {meta['data_path']}: {e}")
+        return None, fingerprint
+
+
+def save_frame_cache(path_filename: str, params: Dict[str, Any], df: DataFrame, fingerprint: Dict[str, Any]) -> None:
+    """
+    Сохраняет DataFrame в кэш рядом с исходным файлом.
+
+    Имя файла с данными строится по хэшу содержимого исходного файла и параметрам загрузки,
+    устаревший файл с данными удаляется.
+
+    :param path_filename: путь к исходному файлу
+    :param params: параметры загрузки
+    :param df: DataFrame для сохранения
+    :param fingerprint: отпечаток исходного файла (см. get_file_fingerprint)
+    :return: None
+    """
+    try:
+        cache_dir = get_cache_dir(path_filename)
+        os.makedirs(cache_dir, exist_ok=True)
+
+        cache_format = get_cache_format()
+        content_key = get_params_key({"sha256": fingerprint["sha256"], "params": params})
+        data_path = os.path.join(cache_dir, f"{os.path.basename(path_filename)}.{content_key}.{cache_format}")
+        write_frame(df, data_path, cache_format)
+
+        meta_path = get_meta_path(path_filename, params)
+        old_data_path = read_meta(meta_path).get("data_path")
+        write_meta(
+            meta_path, {"source": fingerprint, "params": params, "format": cache_format, "data_path": data_path}
+        )
+
+        if old_data_path and old_data_path != data_path and os.path.isfile(old_data_path):
+            os.remove(old_data_path)
+
+        logger.info("Кэш для %s сохранён в %s", os.path.basename(path_filename), data_path)
+    except Exception as e:
+        logger.error(f"Не удалось сохранить кэш для {path_filename}: {e}")
+
+
+class TTLCache:
+    """
+    Потокобезопасный кэш в памяти с вытеснением давно неиспользуемых записей (LRU)
+    и ограниченным временем жизни записей (TTL).
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: Optional[float] = None) -> None:
+        """
+        :param maxsize: максимальное количество записей
+        :param ttl: время жизни записи в секундах (None — без ограничения)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Возвращает значение по ключу или None, если записи нет или она устарела.
+
+        :param key: ключ
+        :return: значение или None
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and (self.ttl is None or time.time() - item[1] < self.ttl):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any, created: Optional[float] = None) -> None:
+        """
+        Сохраняет значение, при переполнении удаляет самую давно использованную запись.
+
+        :param key: ключ
+        :param value: значение
+        :param created: время создания записи (time.time()), по умолчанию — текущее
+        :return: None
+        """
+        with self._lock:
+            self._data[key] = (value, time.time() if created is None else created)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def items(self) -> List[Tuple[Hashable, Any, float]]:
+        """
+        Возвращает актуальные записи кэша.
+
+        :return: список кортежей (ключ, значение, время создания)
+        """
+        now = time.time()
+        with self._lock:
+            return [
+                (key, value, created)
+                for key, (value, created) in self._data.items()
+                if self.ttl is None or now - created < self.ttl
+            ]
+
+    def clear(self) -> None:
+        """
+        Очищает кэш и счётчики попаданий/промахов.
+
+        :return: None
+        """
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Возвращает счётчики кэша.
+
+        :return: словарь с полями hits, misses, size
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+
+# Хэши содержимого исходных файлов: (путь, размер, время изменения) → SHA-256 (см. get_file_hash)
+file_hash_cache = TTLCache(FILE_HASH_CACHE_SIZE)
@@ -8,6 +8,13 @@ LOG_DIR = os.path.join(PARENT_DIR, "logs")
 DATA_DIR = os.path.join(PARENT_DIR, "data")
 # TEMP_DIR = os.path.join(CURRENT_DIR, "tmp")
 
+# Кэш разобранных файлов операций (каталог создаётся рядом с исходным файлом)
+CACHE_DIR_NAME = ".cache"
+# Формат кэша: "parquet" (нужен pyarrow) или "pickle"
+CACHE_FORMAT = "parquet"
+# Количество файлов, хэши содержимого которых хранятся в памяти (ключ — путь, размер и время изменения)
+FILE_HASH_CACHE_SIZE = 32
+
 # определим список с именем обрабатываемого файла (operations.xlsx) и его поля
 LIST_OPERATION = [
     # "operations.csv",
@@ -34,11 +41,97 @@ LIST_OPERATION = [
     "Категория",
 ]
 
+# Схема колонок файла операций (используется при потоковом чтении CSV).
+# Тип остальных колонок определяется pandas автоматически.
+OPERATION_NUMERIC_COLUMNS = [
+    "Сумма операции",
+    "Сумма платежа",
+    "Кэшбэк",
+    "MCC",
+    "Бонусы (включая кэшбэк)",
+    "Округление на инвесткопилку",
+    "Сумма операции с округлением",
+]
+OPERATION_CATEGORY_COLUMNS = ["Валюта операции", "Валюта платежа", "Категория"]
+OPERATION_DATE_COLUMNS = {"Дата операции": "%d.%m.%Y %H:%M:%S", "Дата платежа": "%d.%m.%Y"}
+# Колонка с датой платежа и производные колонки нормализованного DataFrame операций
+PAYMENT_DATE_COLUMN = "Дата платежа"
+YEAR_COLUMN = "год"
+MONTH_COLUMN = "месяц"
+WEEKDAY_COLUMN = "день_недели"
+# Дневные агрегаты операций (день × категория × валюта × знак): колонка знака операции
+# (-1 — расход, 1 — поступление) и колонка количества операций
+SIGN_COLUMN = "знак"
+COUNT_COLUMN = "количество"
+# Количество строк в одном блоке при потоковом чтении CSV
+CSV_CHUNK_SIZE = 100_000
+
+# Кэш курсов валют: время жизни записи (сек), максимальное количество записей в памяти
+# и файл для хранения курсов между запусками программы
+EXCHANGE_RATE_TTL = 60 * 60
+EXCHANGE_RATE_CACHE_SIZE = 256
+EXCHANGE_RATE_STORE_FILE = os.path.join(DATA_DIR, CACHE_DIR_NAME, "exchange_rates.json")
+
+# Исторические курсы валют (для пересчёта операций по курсу на дату платежа):
+# файл с курсами и его колонки
+EXCHANGE_RATE_HISTORY_FILE = os.path.join(DATA_DIR, "exchange_rates_history.csv")
+RATE_HISTORY_COLUMNS = ["Дата курса", "Валюта", "Целевая валюта", "Курс"]
+
 # URL_EXCHANGE = "https://api.apilayer.com/exchangerates_data/convert"
 URL_EXCHANGE = "https://v6.exchangerate-api.com/v6/"
 # URL_EXCHANGE_SP_500 = "https://www.alphavantage.co"
 URL_EXCHANGE_SP_500 = "https://financialmodelingprep.com/stable/stock-peers?"
-# URL_EXCHANGE_SP_500 = "https://financialmodelingprep.com/api/v3/quote-short/{','.join(symbols)}?apikey={api_key}""
+# Пакетный запрос котировок: к адресу добавляются тикеры через запятую, ключ передаётся параметром apikey
+URL_EXCHANGE_SP_500_BATCH = "https://financialmodelingprep.com/api/v3/quote-short/"
+
+# Параметры HTTP-клиента для внешних API
+# Таймауты (подключение, чтение) в секундах для каждого API
+API_TIMEOUTS = {"exchange": (3.05, 10), "sp_500": (3.05, 10)}
+API_DEFAULT_TIMEOUT = (3.05, 10)
+# Размер пула соединений и повторные попытки с нарастающей задержкой
+API_POOL_SIZE = 10
+API_RETRY_TOTAL = 2
+API_RETRY_BACKOFF = 0.3
+API_RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Параллельные запросы к API: количество потоков и общее время ожидания всех запросов (сек)
+API_MAX_WORKERS = 8
+API_DEADLINE = 20
+# Размыкатель цепи: после API_CIRCUIT_FAILURES ошибок подряд запросы к API
+# не выполняются API_CIRCUIT_RESET секунд
+API_CIRCUIT_FAILURES = 5
+API_CIRCUIT_RESET = 60
+
+# Запись результатов в файлы: формат по умолчанию ("pretty" — JSON с отступами,
+# "compact" — JSON без отступов, "orjson" — быстрый кодировщик, если установлен пакет orjson)
+OUTPUT_SERIALIZER = "pretty"
+# Запись отчётов декоратором decorator_write_with_args: "json" — перезапись файла последним отчётом,
+# "jsonl" — дописывание записей в файл JSON Lines, "parquet" — новый файл в каталоге отчёта при каждом вызове;
+# количество строк, сериализуемых за один раз
+REPORT_SINK = "json"
+REPORT_CHUNK_SIZE = 10_000
+# Файлы логов: ротация "size" — по размеру (LOG_MAX_BYTES), "time" — по времени (LOG_ROTATE_WHEN);
+# количество хранимых предыдущих файлов
+LOG_ROTATION = "size"
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_ROTATE_WHEN = "midnight"
+LOG_BACKUP_COUNT = 3
+# Трассировка этапов обработки (src/tracing.py): файл со структурированными записями JSON в каталоге логов
+TRACING_ENABLED = True
+TRACE_LOG_FILE = "trace.jsonl"
+# Профилирование (python main.py --profile): количество функций в отчёте и порядок сортировки pstats
+PROFILE_TOP_N = 30
+PROFILE_SORT = "cumulative"
+# Кэш результатов функций-отчётов (decorator_cache_report): количество результатов в памяти
+# и хранение результатов на диске (каталог REPORT_CACHE_DIR) между запусками программы
+REPORT_CACHE_SIZE = 32
+REPORT_CACHE_DISK = False
+REPORT_CACHE_DIR = os.path.join(DATA_DIR, CACHE_DIR_NAME, "reports")
+# Ограничения дискового кэша отчётов: время хранения файла (сек) и количество файлов
+REPORT_CACHE_DISK_TTL = 7 * 24 * 60 * 60
+REPORT_CACHE_DISK_MAX_FILES = 128
+# Количество строк DataFrame, хэшируемых целиком в «отпечатке» для ключа кэша, в дополнение
+# к контрольным суммам всех значений колонок (см. get_frame_fingerprint)
+FRAME_FINGERPRINT_SAMPLE = 1024
 
 #
 # DATABASE_URL = "sqlite:///app.db"
@@ -0,0 +1,116 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Tuple
+
+from src import app_logger
+from src.config import LOG_DIR, PROFILE_SORT, PROFILE_TOP_N
+
+# Настройка логирования
+logger = app_logger.get_logger("profiling.log")
+
+
+class PipelineProfiler:
+    """
+    Профилирование этапов программы: время по функциям (cProfile) и пиковая память (tracemalloc) каждого этапа.
+    Этапы выполняются последовательно, вложенные этапы не поддерживаются.
+    """
+
+    def __init__(self, enabled: bool = True, top_n: int = PROFILE_TOP_N) -> None:
+        """
+        :param enabled: профилирование включено (иначе этапы выполняются без измерений)
+        :param top_n: количество функций в отчёте по каждому этапу
+        """
+        self.enabled = enabled
+        self.top_n = top_n
+        self.stages: List[Dict[str, Any]] = []
+        self.profiles: List[Tuple[str, cProfile.Profile]] = []
+        self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Выполняет блок кода как этап профилирования.
+
+        :param name: имя этапа
+        :return: None
+        """
+        if not self.enabled:
+            yield
+            return
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        profile = cProfile.Profile()
+        start_time = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            duration = time.perf_counter() - start_time
+            memory_after, memory_peak = tracemalloc.get_traced_memory()
+            self.profiles.append((name, profile))
+            self.stages.append(
+                {
+                    "stage": name,
+                    "duration_s": round(duration, 6),
+                    "memory_peak_mb": round((memory_peak - memory_before) / 2**20, 3),
+                    "memory_retained_mb": round((memory_after - memory_before) / 2**20, 3),
+                }
+            )
+            logger.info("Этап %s: %.3f с, пиковая память %.3f МБ", name, duration, self.stages[-1]["memory_peak_mb"])
+
+    def get_stats_text(self, profiles: List[cProfile.Profile]) -> str:
+        """
+        Формирует текстовый отчёт pstats по одному или нескольким этапам: функции, отсортированные по PROFILE_SORT.
+
+        :param profiles: данные cProfile этапов
+        :return: текст отчёта
+        """
+        stream = io.StringIO()
+        pstats.Stats(*profiles, stream=stream).strip_dirs().sort_stats(PROFILE_SORT).print_stats(self.top_n)
+        return stream.getvalue()
+
+    def write_report(self, dir_path: str = LOG_DIR) -> Dict[str, str]:
+        """
+        Записывает отчёты профилирования и останавливает tracemalloc (если он запущен профилировщиком):
+        profile_<время>.prof — данные cProfile всех этапов (для pstats, snakeviz и т. п.),
+        profile_<время>.txt — самые затратные функции всей программы и каждого этапа,
+        profile_<время>.json — время и пиковая память каждого этапа.
+
+        :param dir_path: каталог для отчётов
+        :return: словарь: вид отчёта ("prof", "txt", "json") → путь к файлу
+        """
+        if not self.enabled or not self.profiles:
+            return {}
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+        os.makedirs(dir_path, exist_ok=True)
+        base_name = os.path.join(dir_path, f"profile_{datetime.now():%Y%m%d_%H%M%S}")
+        paths = {kind: f"{base_name}.{kind}" for kind in ("prof", "txt", "json")}
+
+        profiles = [profile for _, profile in self.profiles]
+        pstats.Stats(*profiles).dump_stats(paths["prof"])
+
+        with open(paths["txt"], "w", encoding="utf-8") as f:
+            f.write(f"=== Вся программа ===\n{self.get_stats_text(profiles)}")
+            for name, profile in self.profiles:
+                f.write(f"\n=== Этап {name} ===\n{self.get_stats_text([profile])}")
+
+        with open(paths["json"], "w", encoding="utf-8") as f:
+            json.dump({"sort": PROFILE_SORT, "stages": self.stages}, f, ensure_ascii=False, indent=4)
+
+        logger.info("Отчёты профилирования записаны: %s", ", ".join(paths.values()))
+        return paths
@@ -1,36 +1,103 @@
+import json
+import os
+import time
+import uuid
 from datetime import datetime, timedelta
 from functools import wraps
-from typing import Any, Callable, Optional
+from typing import Any, Callable, Dict, Optional
 
+import numpy as np
 import pandas as pd
 
 from src import app_logger
-from src.config import LIST_OPERATION
+from src.aggregates import build_daily_aggregates
+from src.cache import (
+    PARQUET_AVAILABLE,
+    TTLCache,
+    get_cache_format,
+    get_frame_fingerprint,
+    get_params_key,
+    read_frame,
+    write_frame,
+)
+from src.config import (
+    COUNT_COLUMN,
+    DATA_DIR,
+    LIST_OPERATION,
+    REPORT_CACHE_DIR,
+    REPORT_CACHE_DISK,
+    REPORT_CACHE_DISK_MAX_FILES,
+    REPORT_CACHE_DISK_TTL,
+    REPORT_CACHE_SIZE,
+    REPORT_CHUNK_SIZE,
+    REPORT_SINK,
+    SIGN_COLUMN,
+    WEEKDAY_COLUMN,
+)
+from src.tracing import add_cache_hits, traced
 from src.utils import conversion_to_single_currency, filter_by_date, write_json
+from src.writer import append_json_lines, write_parquet_part
 
 # Настройка логирования
 logger = app_logger.get_logger("reports.log")
 
+# Названия дней недели (0 — понедельник)
+DAYS_OF_WEEK = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]
 
-def decorator_write_with_args(file_name: str = "reports.json") -> Callable:
+
+def decorator_write_with_args(
+    file_name: str = "reports.json", sink: str = REPORT_SINK, chunk_size: int = REPORT_CHUNK_SIZE
+) -> Callable:
     """
     Декоратор для функций-отчетов, который записывает в файл результат, который возвращает функция, формирующая отчет.
     :param file_name: Декоратор без параметра — записывает данные отчета в файл с названием по умолчанию.
                      Декоратор с параметром — принимает имя файла в качестве параметра.
+    :param sink: способ записи:
+        "json" — файл перезаписывается последним отчётом (список записей);
+        "jsonl" — записи дописываются в файл JSON Lines (расширение имени файла заменяется на .jsonl);
+        "parquet" — каждый отчёт записывается отдельным файлом в каталог с именем файла без расширения.
+        Для "jsonl" и "parquet" к каждой записи добавляются сведения о запуске: run_id, run_function,
+        run_args, run_started, run_duration (сек)
+    :param chunk_size: количество строк, сериализуемых за один раз (для "jsonl")
     :return: Записывает результат функции в файл file_name.
     """
 
     def my_decorator(func: Callable) -> Callable:
         @wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> pd.DataFrame:
+            started = datetime.now()
+            start_time = time.perf_counter()
             result: pd.DataFrame = func(*args, **kwargs)
+            duration = time.perf_counter() - start_time
+
+            if sink == "json":
+                # Преобразование в словарь (исправленный orient)
+                result_dict = result.to_dict(orient="records")
 
-            # Преобразование в словарь (исправленный orient)
-            result_dict = result.to_dict(orient="records")
+                # Запись результата в JSON
+                write_json(result_dict, file_name)
+                logger.info("Запись результатов в %s", file_name)
+                return result
 
-            # Запись результата в JSON
-            write_json(result_dict, file_name)
-            logger.info(f"Запись результатов в {file_name}")
+            metadata = {
+                "run_id": f"{started:%Y%m%d%H%M%S%f}-{uuid.uuid4().hex[:8]}",
+                "run_function": func.__name__,
+                "run_args": describe_args(args, kwargs),
+                "run_started": started.isoformat(timespec="seconds"),
+                "run_duration": round(duration, 6),
+            }
+            try:
+                base_name = os.path.join(DATA_DIR, os.path.splitext(file_name)[0])
+                if sink == "parquet" and not PARQUET_AVAILABLE:
+                    logger.warning("pyarrow не установлен, отчёт записывается в JSON Lines")
+                if sink == "parquet" and PARQUET_AVAILABLE:
+                    path_file = write_parquet_part(base_name, result, metadata)
+                else:
+                    path_file = f"{base_name}.jsonl"
+                    append_json_lines(path_file, result, metadata, chunk_size)
+                logger.info("Запись %s строк отчёта %s в %s", len(result), func.__name__, path_file)
+            except (IOError, OSError, ValueError) as e:
+                logger.error(f"Ошибка при записи отчёта {func.__name__}: {e}")
 
             return result
 
@@ -39,7 +106,170 @@ def decorator_write_with_args(file_name: str = "reports.json") -> Callable:
     return my_decorator
 
 
+# Кэши результатов функций-отчётов (имя функции → кэш), см. decorator_cache_report
+report_caches: Dict[str, TTLCache] = {}
+
+
+def decorator_cache_report(maxsize: int = REPORT_CACHE_SIZE, disk: bool = REPORT_CACHE_DISK) -> Callable:
+    """
+    Декоратор, запоминающий результаты функций-отчётов.
+
+    Ключ результата — имя функции, «отпечатки» переданных DataFrame (см. get_frame_fingerprint)
+    и остальные аргументы. Результаты хранятся в памяти (не более maxsize, давно неиспользуемые
+    вытесняются) и, если disk=True, на диске в каталоге REPORT_CACHE_DIR (не дольше REPORT_CACHE_DISK_TTL,
+    не больше REPORT_CACHE_DISK_MAX_FILES файлов). Пустые результаты (нет данных или ошибка) не запоминаются.
+    В лог пишутся доля попаданий и время, сэкономленное за счёт кэша.
+
+    :param maxsize: количество результатов в памяти
+    :param disk: хранить результаты на диске
+    :return: декоратор
+    """
+
+    def my_decorator(func: Callable) -> Callable:
+        cache = report_caches.setdefault(func.__qualname__, TTLCache(maxsize=maxsize))
+        saved_time = [0.0]
+
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            # день расчёта входит в ключ: отчёты без явной даты строятся от текущей даты
+            key = get_params_key(
+                {
+                    "function": func.__qualname__,
+                    "args": describe_args(args, kwargs, fingerprint=True),
+                    "day": datetime.now().date().isoformat(),
+                }
+            )
+            data_path = os.path.join(REPORT_CACHE_DIR, f"{func.__name__}.{key}.{get_cache_format()}")
+
+            cached = cache.get(key)
+            if cached is None and disk and is_fresh_report_file(data_path):
+                try:
+                    cached = (read_frame(data_path, get_cache_format()), 0.0)
+                    cache.set(key, cached)
+                except Exception as e:
+                    logger.error(f"Ошибка чтения кэша отчёта {data_path}: {e}")
+
+            if cached is not None:
+                add_cache_hits()
+                result, duration = cached
+                saved_time[0] += duration
+                log_report_cache(func.__name__, cache, saved_time[0])
+                return result.copy()
+
+            start_time = time.perf_counter()
+            result = func(*args, **kwargs)
+            duration = time.perf_counter() - start_time
+
+            if isinstance(result, pd.DataFrame) and not result.empty:
+                cache.set(key, (result.copy(), duration))
+                if disk:
+                    try:
+                        os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+                        write_frame(result, data_path, get_cache_format())
+                        prune_report_cache_dir()
+                    except Exception as e:
+                        logger.error(f"Не удалось сохранить кэш отчёта {data_path}: {e}")
+            log_report_cache(func.__name__, cache, saved_time[0])
+            return result
+
+        return wrapper
+
+    return my_decorator
+
+
+def is_fresh_report_file(data_path: str) -> bool:
+    """
+    Проверяет, что файл дискового кэша отчёта существует и не старше REPORT_CACHE_DISK_TTL.
+
+    :param data_path: путь к файлу
+    :return: True, если файлом можно пользоваться
+    """
+    try:
+        return time.time() - os.path.getmtime(data_path) < REPORT_CACHE_DISK_TTL
+    except OSError:
+        return False
+
+
+def prune_report_cache_dir() -> None:
+    """
+    Удаляет из каталога дискового кэша отчётов устаревшие файлы (старше REPORT_CACHE_DISK_TTL)
+    и самые старые файлы сверх REPORT_CACHE_DISK_MAX_FILES.
+
+    :return: None
+    """
+    with os.scandir(REPORT_CACHE_DIR) as entries:
+        files = sorted(((entry.stat().st_mtime, entry.path) for entry in entries if entry.is_file()), reverse=True)
+    now = time.time()
+    for number, (mtime, path) in enumerate(files):
+        if number >= REPORT_CACHE_DISK_MAX_FILES or now - mtime >= REPORT_CACHE_DISK_TTL:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.error(f"Не удалось удалить файл кэша отчёта {path}: {e}")
+
+
+def log_report_cache(name: str, cache: TTLCache, saved_time: float) -> None:
+    """
+    Пишет в лог статистику кэша функции-отчёта.
+
+    :param name: имя функции
+    :param cache: кэш результатов
+    :param saved_time: сэкономленное время в секундах
+    :return: None
+    """
+    stats = cache.stats()
+    total = stats["hits"] + stats["misses"]
+    hit_rate = stats["hits"] / total if total else 0.0
+    logger.info(
+        "Кэш отчёта %s: попаданий %s из %s (%.0f%%), записей %s, сэкономлено %.3f с",
+        name,
+        stats["hits"],
+        total,
+        hit_rate * 100,
+        stats["size"],
+        saved_time,
+    )
+
+
+def clear_report_caches() -> None:
+    """
+    Очищает кэши результатов функций-отчётов в памяти.
+
+    :return: None
+    """
+    for cache in report_caches.values():
+        cache.clear()
+
+
+def describe_args(args: tuple, kwargs: dict, fingerprint: bool = False) -> str:
+    """
+    Описывает аргументы вызова функции-отчёта для сведений о запуске (DataFrame — только размером).
+
+    :param args: позиционные аргументы
+    :param kwargs: именованные аргументы
+    :param fingerprint: описывать DataFrame «отпечатком» содержимого (для ключа кэша)
+    :return: строка JSON
+    """
+
+    def describe(value: Any) -> Any:
+        if isinstance(value, pd.DataFrame):
+            if fingerprint:
+                return f"DataFrame[{get_frame_fingerprint(value)}]"
+            return f"DataFrame[{value.shape[0]}x{value.shape[1]}]"
+        return value if isinstance(value, (str, int, float, bool, type(None))) else repr(value)
+
+    return json.dumps(
+        {
+            "args": [describe(value) for value in args],
+            "kwargs": {key: describe(value) for key, value in kwargs.items()},
+        },
+        ensure_ascii=False,
+    )
+
+
+@traced()
 @decorator_write_with_args()
+@decorator_cache_report()
 def spending_by_weekday(transactions: pd.DataFrame, date: Optional[str] = None) -> pd.DataFrame:
     """
     Возвращает средние траты в каждый из дней недели за последние три месяца (от переданной даты).
@@ -66,26 +296,26 @@ def spending_by_weekday(transactions: pd.DataFrame, date: Optional[str] = None)
                 return pd.DataFrame(columns=["день_недели", "средние_траты"])
 
         today_date = today_dt.date()
-        logger.debug(f"Расчёт ведётся от даты: {today_date}")
+        logger.debug("Расчёт ведётся от даты: %s", today_date)
 
         # Вычисление границы периода (последние 3 месяца)
         data_from = today_date - pd.DateOffset(months=3)
         data_to = today_date + timedelta(days=1)  # до конца текущего дня
         list_period = [data_from, data_to]
-        logger.debug(f"Период анализа: {data_from} – {data_to}")
+        logger.debug("Период анализа: %s – %s", data_from, data_to)
 
         # Фильтрация транзакций: только расходы (сумма < 0)
         if amount_col not in transactions.columns:
             logger.error(f"Столбец '{amount_col}' не найден в данных.")
             return pd.DataFrame(columns=["день_недели", "средние_траты"])
 
-        df_expenses = transactions[transactions[amount_col] < 0]
-        if df_expenses.empty:
+        if not (transactions[amount_col] < 0).any():
             logger.warning("Нет транзакций с расходами за указанный период.")
             return pd.DataFrame(columns=["день_недели", "средние_траты"])
 
-        # Фильтрация по периоду
-        df_filtered = filter_by_date(df_expenses, list_period)
+        # Фильтрация по периоду (дата платежа уже разобрана при загрузке), затем только расходы
+        df_period = filter_by_date(transactions, list_period)
+        df_filtered = df_period.loc[df_period[amount_col] < 0] if not df_period.empty else df_period
         if df_filtered.empty:
             logger.warning("Нет расходов за последние 3 месяца.")
             return pd.DataFrame(columns=["день_недели", "средние_траты"])
@@ -96,11 +326,8 @@ def spending_by_weekday(transactions: pd.DataFrame, date: Optional[str] = None)
             logger.error("Не удалось конвертировать суммы в RUB")
             return pd.DataFrame(columns=["день_недели", "средние_траты"])
 
-        # Расчёт дня недели
-        result_df["день_недели"] = result_df["Дата платежа"].dt.weekday
-
-        # Группировка и расчёт среднего (гарантируем DataFrame)
-        avg_spending = result_df.groupby("день_недели", as_index=False)[new_amount_col].mean().round(2).abs()
+        # Группировка по дню недели (колонка рассчитана при нормализации) и расчёт среднего
+        avg_spending = result_df.groupby(WEEKDAY_COLUMN, as_index=False)[new_amount_col].mean().round(2).abs()
 
         # Переименование колонки (без inplace)
         # avg_spending = avg_spending.rename(columns={new_amount_col: "средние_траты"})
@@ -111,8 +338,7 @@ def spending_by_weekday(transactions: pd.DataFrame, date: Optional[str] = None)
         avg_spending = avg_spending.sort_values(by="день_недели")
 
         # Маппинг чисел на названия дней
-        days_of_week = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]
-        day_map = {i: day for i, day in enumerate(days_of_week)}
+        day_map = {i: day for i, day in enumerate(DAYS_OF_WEEK)}
         avg_spending["день_недели"] = avg_spending["день_недели"].map(day_map)
 
         logger.info("Рассчитаны средние траты по дням недели")
@@ -125,3 +351,77 @@ def spending_by_weekday(transactions: pd.DataFrame, date: Optional[str] = None)
     except Exception as e:
         logger.critical(f"Неожиданная ошибка в spending_by_weekday: {type(e).__name__}: {e}")
         return pd.DataFrame(columns=["день_недели", "средние_траты"])
+
+
+@traced()
+def spending_by_weekday_rolling(transactions: pd.DataFrame, date_from: str, date_to: str) -> pd.DataFrame:
+    """
+    Возвращает средние траты в каждый из дней недели за три месяца до каждой даты из диапазона
+    (то же, что spending_by_weekday для каждой даты, но за один проход и без записи в файл).
+
+    Расходы один раз сворачиваются в суммы и количества операций по дням (день однозначно задаёт
+    день недели), затем по ним строятся нарастающие итоги для каждого дня недели; итоги за окно
+    каждой даты получаются вычитанием двух строк нарастающих итогов.
+
+    :param transactions: DataFrame с транзакциями (колонки "Дата платежа", "Сумма платежа", "Валюта платежа")
+    :param date_from: первая дата диапазона в формате "дд.мм.гггг"
+    :param date_to: последняя дата диапазона в формате "дд.мм.гггг" (включительно)
+    :return: DataFrame с колонками "дата", "день_недели", "средние_траты" — по строке на дату и день недели,
+        в который были расходы
+    """
+    columns = ["дата", "день_недели", "средние_траты"]
+    new_amount_col = f"{LIST_OPERATION[3]}_RUB"
+    try:
+        try:
+            anchors = pd.date_range(
+                datetime.strptime(date_from, "%d.%m.%Y"), datetime.strptime(date_to, "%d.%m.%Y"), freq="D"
+            )
+        except ValueError as e:
+            logger.error(f"Некорректный формат даты: {date_from}, {date_to}. Ошибка: {e}")
+            return pd.DataFrame(columns=columns)
+
+        if LIST_OPERATION[3] not in transactions.columns:
+            logger.error(f"Столбец '{LIST_OPERATION[3]}' не найден в данных.")
+            return pd.DataFrame(columns=columns)
+
+        # Дневные суммы и количества расходов в RUB (пересчёт — по одной строке на день и валюту)
+        aggregates = build_daily_aggregates(transactions)
+        expenses = conversion_to_single_currency(aggregates.loc[aggregates[SIGN_COLUMN] < 0], "RUB")
+        daily = expenses.groupby(level=0)[[new_amount_col, COUNT_COLUMN]].sum()
+        if daily.empty or anchors.empty:
+            logger.warning("Нет транзакций с расходами за указанный период.")
+            return pd.DataFrame(columns=columns)
+
+        # Нарастающие итоги по дням недели: строка i — итог за дни до daily.index[i] (не включительно)
+        days = pd.DatetimeIndex(daily.index)
+        rows = np.arange(1, len(days) + 1)
+        cum_sums = np.zeros((len(days) + 1, 7))
+        cum_counts = np.zeros((len(days) + 1, 7))
+        cum_sums[rows, days.weekday] = daily[new_amount_col].to_numpy()
+        cum_counts[rows, days.weekday] = daily[COUNT_COLUMN].to_numpy()
+        np.cumsum(cum_sums, axis=0, out=cum_sums)
+        np.cumsum(cum_counts, axis=0, out=cum_counts)
+
+        # Окно каждой даты: [дата - 3 месяца, дата + 1 день)
+        starts = days.searchsorted(anchors - pd.DateOffset(months=3), side="left")
+        stops = days.searchsorted(anchors + timedelta(days=1), side="left")
+        # разность нарастающих итогов округляется до копеек, чтобы убрать погрешность вычислений
+        sums = np.round(cum_sums[stops] - cum_sums[starts], 2)
+        counts = np.rint(cum_counts[stops] - cum_counts[starts])
+
+        anchor_positions, weekdays = np.nonzero(counts > 0)
+        result = pd.DataFrame(
+            {
+                "дата": anchors[anchor_positions],
+                "день_недели": np.array(DAYS_OF_WEEK)[weekdays],
+                "средние_траты": np.abs(
+                    np.round(sums[anchor_positions, weekdays] / counts[anchor_positions, weekdays], 2)
+                ),
+            }
+        )
+        logger.info("Рассчитаны средние траты по дням недели для %s дат", len(anchors))
+        return result
+
+    except Exception as e:
+        logger.critical(f"Неожиданная ошибка в spending_by_weekday_rolling: {type(e).__name__}: {e}")
+        return pd.DataFrame(columns=columns)
@@ -1,17 +1,21 @@
-from typing import Dict
+from itertools import combinations
+from typing import Dict, List, Optional, Sequence, Tuple
 
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
 
 from src import app_logger
-from src.config import LIST_OPERATION
-from src.utils import write_json
+from src.config import LIST_OPERATION, MONTH_COLUMN, YEAR_COLUMN
+from src.utils import is_normalized_operations, normalize_operations, write_json
 
 # Настройка логирования
 logger = app_logger.get_logger("services.log")
 
 
-def get_profitable_cashback(data: DataFrame, str_year: str, str_month: str) -> Dict[str, float]:
+def get_profitable_cashback(
+    data: DataFrame, str_year: str, str_month: str, cashback_pivot: Optional[DataFrame] = None
+) -> Dict[str, float]:
     """
     Анализирует, какие категории были наиболее выгодными для выбора
     в качестве категорий повышенного кэшбэка.
@@ -22,12 +26,14 @@ def get_profitable_cashback(data: DataFrame, str_year: str, str_month: str) -> D
         - LIST_OPERATION[4] (название категории, str)
     :param str_year: год для анализа (строка, например "2025")
     :param str_month: месяц для анализа (строка, например "11")
+    :param cashback_pivot: сводная таблица кэшбэка (см. get_cashback_pivot) — если передана,
+        результат берётся из неё без прохода по транзакциям
     :return: словарь {категория: сумма кэшбэка}, отсортированный по убыванию.
              Пустой dict, если данных нет.
     """
     dict_result: Dict[str, float] = {}
     try:
-        logger.info(f"Начало анализа кэшбэка за {str_year}-{str_month}. " f"Всего транзакций: {len(data)}")
+        logger.info("Начало анализа кэшбэка за %s-%s. Всего транзакций: %s", str_year, str_month, len(data))
 
         # Преобразование строк в числа
         try:
@@ -37,38 +43,44 @@ def get_profitable_cashback(data: DataFrame, str_year: str, str_month: str) -> D
             logger.error(f"Некорректный формат года/месяца: {str_year}, {str_month}. Ошибка: {e}")
             raise ValueError("Год и месяц должны быть числовыми строками.") from e
 
-        logger.debug(f"Преобразовано: year={year}, month={month}")
+        logger.debug("Преобразовано: year=%s, month=%s", year, month)
 
-        # преобразование столбца "Дата платежа"
-        if not pd.api.types.is_datetime64_any_dtype(data["Дата платежа"]):
-            logger.info("Столбец 'Дата платежа' не в формате datetime — выполняем преобразование.")
+        if cashback_pivot is not None:
+            dict_result = get_month_cashback(cashback_pivot, year, month)
+            logger.info("Кэшбэк за %s-%s взят из сводной таблицы: %s категорий", year, month, len(dict_result))
+            if dict_result:
+                write_json(dict_result, "cashback.json")
+            return dict_result
+
+        # нормализация "Дата платежа" (данные из get_list_operation уже нормализованы)
+        if not is_normalized_operations(data):
+            logger.info("Данные не нормализованы — выполняем преобразование 'Дата платежа'.")
             try:
-                data["Дата платежа"] = pd.to_datetime(data["Дата платежа"], dayfirst=True, errors="raise")
+                data = normalize_operations(data)
             except Exception as e:
                 logger.error(f"Ошибка преобразования 'Дата платежа' в datetime: {e}")
                 return {}
 
-        # Фильтрация: год, месяц и положительный кэшбэк
-        mask = (data["Дата платежа"].dt.year == year) & (data["Дата платежа"].dt.month == month) & (data["Кэшбэк"] > 0)
-        filtered_data = data.loc[mask].copy()  # копирование
+        # Фильтрация: год, месяц и положительный кэшбэк (по готовым колонкам год/месяц)
+        mask = (data[YEAR_COLUMN] == year) & (data[MONTH_COLUMN] == month) & (data["Кэшбэк"] > 0)
+        filtered_data: DataFrame = data.loc[mask]
 
-        logger.info(f"Отфильтровано транзакций за {year}-{month} с кэшбэком > 0: {len(filtered_data)}")
+        logger.info("Отфильтровано транзакций за %s-%s с кэшбэком > 0: %s", year, month, len(filtered_data))
 
         if filtered_data.empty:
             logger.warning("Нет транзакций с кэшбэком за указанный период.")
             return {}
 
         # Работа с категориальным столбцом
-        category_col = LIST_OPERATION[4]
+        category_col = str(LIST_OPERATION[4])
 
         # Группировка и суммирование кэшбэка
-        cashback_by_category = filtered_data.groupby(category_col, as_index=False)["Кэшбэк"].sum().round(0)
+        cashback_by_category = filtered_data.groupby(category_col, observed=True)["Кэшбэк"].sum().round(0)
 
         # Сортировка по убыванию и преобразование в словарь
-        cashback_by_category.sort_values("Кэшбэк", ascending=False, inplace=True)
-        dict_result = cashback_by_category.set_index(category_col)["Кэшбэк"].to_dict()
+        dict_result = {str(key): value for key, value in cashback_by_category.sort_values(ascending=False).items()}
 
-        logger.info(f"Найдено категорий с кэшбэком: {len(dict_result)}")
+        logger.info("Найдено категорий с кэшбэком: %s", len(dict_result))
         # logger.info(f"Результаты анализа кэшбэка: {dict_result}")
         write_json(dict_result, "cashback.json")
 
@@ -81,3 +93,178 @@ def get_profitable_cashback(data: DataFrame, str_year: str, str_month: str) -> D
     except Exception as e:
         logger.critical(f"Неожиданная ошибка в get_profitable_cashback: {e}")
         return {}
+
+
+def get_cashback_pivot(data: DataFrame) -> DataFrame:
+    """
+    Считает кэшбэк по категориям сразу за все месяцы одной группировкой.
+
+    :param data: DataFrame с транзакциями (столбцы "Дата платежа", "Кэшбэк", LIST_OPERATION[4])
+    :return: сводная таблица: индекс — (год, месяц), колонки — категории, значения — сумма
+        положительного кэшбэка (0, если кэшбэка в категории за месяц не было)
+    """
+    category_col = str(LIST_OPERATION[4])
+    if not is_normalized_operations(data):
+        data = normalize_operations(data)
+
+    positive = data["Кэшбэк"] > 0
+    cashback = data.loc[positive, "Кэшбэк"].groupby(
+        [data.loc[positive, YEAR_COLUMN], data.loc[positive, MONTH_COLUMN], data.loc[positive, category_col]],
+        observed=True,
+    )
+    pivot: DataFrame = cashback.sum().unstack(category_col, fill_value=0)
+    logger.info("Сводная таблица кэшбэка: %s месяцев × %s категорий", len(pivot), len(pivot.columns))
+    return pivot
+
+
+def get_month_cashback(cashback_pivot: DataFrame, year: int, month: int) -> Dict[str, float]:
+    """
+    Возвращает кэшбэк по категориям за месяц из сводной таблицы.
+
+    :param cashback_pivot: сводная таблица кэшбэка (см. get_cashback_pivot)
+    :param year: год
+    :param month: месяц
+    :return: словарь {категория: сумма кэшбэка}, отсортированный по убыванию; пустой dict, если данных нет
+    """
+    if (year, month) not in cashback_pivot.index:
+        return {}
+    row = cashback_pivot.loc[[(year, month)]].iloc[0]
+    row = row[row > 0].round(0).sort_values(ascending=False)
+    return {str(key): value for key, value in row.items()}
+
+
+def get_best_cashback_category(cashback_pivot: DataFrame, str_year: str, str_month: str) -> Dict[str, float]:
+    """
+    Возвращает категорию с наибольшим кэшбэком за месяц.
+
+    :param cashback_pivot: сводная таблица кэшбэка (см. get_cashback_pivot)
+    :param str_year: год (строка, например "2021")
+    :param str_month: месяц (строка, например "10")
+    :return: словарь {категория: сумма кэшбэка}; пустой dict, если данных нет или дата некорректна
+    """
+    try:
+        dict_month = get_month_cashback(cashback_pivot, int(str_year), int(str_month))
+    except ValueError as e:
+        logger.error(f"Некорректный формат года/месяца: {str_year}, {str_month}. Ошибка: {e}")
+        return {}
+    return dict(list(dict_month.items())[:1])
+
+
+def get_top_cashback_categories(
+    cashback_pivot: DataFrame, period_from: str, period_to: str, top_n: int = 3
+) -> Dict[str, float]:
+    """
+    Возвращает top_n категорий с наибольшим кэшбэком за диапазон месяцев (включительно).
+
+    :param cashback_pivot: сводная таблица кэшбэка (см. get_cashback_pivot)
+    :param period_from: первый месяц диапазона в формате "ГГГГ-ММ"
+    :param period_to: последний месяц диапазона в формате "ГГГГ-ММ"
+    :param top_n: количество категорий
+    :return: словарь {категория: сумма кэшбэка}, отсортированный по убыванию
+    """
+    try:
+        month_from = parse_year_month(period_from)
+        month_to = parse_year_month(period_to)
+    except ValueError as e:
+        logger.error(f"Некорректный формат диапазона: {period_from} – {period_to}. Ошибка: {e}")
+        return {}
+
+    rows = cashback_pivot.loc[month_from:month_to]
+    totals = rows.sum()
+    totals = totals[totals > 0].sort_values(ascending=False).head(top_n).round(0)
+    logger.info("Топ-%s категорий кэшбэка за %s – %s: %s", top_n, period_from, period_to, len(totals))
+    return {str(key): value for key, value in totals.items()}
+
+
+def parse_year_month(str_period: str) -> Tuple[int, int]:
+    """
+    Разбирает месяц в формате "ГГГГ-ММ".
+
+    :param str_period: строка, например "2021-10"
+    :return: кортеж (год, месяц)
+    """
+    str_year, str_month = str_period.split("-")
+    month = int(str_month)
+    if not 1 <= month <= 12:
+        raise ValueError(f"Некорректный месяц: {str_month}")
+    return int(str_year), month
+
+
+def get_spend_pivot(data: DataFrame) -> DataFrame:
+    """
+    Считает траты по категориям за каждый месяц одной группировкой (матрица «месяц × категория»).
+
+    Используется сумма в RUB (колонка "<сумма>_RUB"), если она есть, иначе сумма платежа.
+
+    :param data: DataFrame с транзакциями (столбцы "Дата платежа", сумма платежа, LIST_OPERATION[4])
+    :return: сводная таблица: индекс — (год, месяц), колонки — категории, значения — сумма расходов (> 0)
+    """
+    category_col = str(LIST_OPERATION[4])
+    amount_col = f"{LIST_OPERATION[3]}_RUB" if f"{LIST_OPERATION[3]}_RUB" in data.columns else str(LIST_OPERATION[3])
+    if not is_normalized_operations(data):
+        data = normalize_operations(data)
+
+    expenses = data[amount_col] < 0
+    spend = (-data.loc[expenses, amount_col]).groupby(
+        [data.loc[expenses, YEAR_COLUMN], data.loc[expenses, MONTH_COLUMN], data.loc[expenses, category_col]],
+        observed=True,
+    )
+    pivot: DataFrame = spend.sum().unstack(category_col, fill_value=0)
+    logger.info("Матрица трат: %s месяцев × %s категорий", len(pivot), len(pivot.columns))
+    return pivot
+
+
+def get_candidate_sets(categories: Sequence[str], set_size: int = 3) -> List[Tuple[str, ...]]:
+    """
+    Возвращает все наборы из set_size категорий повышенного кэшбэка.
+
+    :param categories: категории, из которых выбираются наборы
+    :param set_size: количество категорий в наборе
+    :return: список кортежей категорий
+    """
+    return list(combinations(categories, set_size))
+
+
+def simulate_cashback(
+    spend_pivot: DataFrame, candidate_sets: Sequence[Sequence[str]], bonus_rates: Sequence[float]
+) -> DataFrame:
+    """
+    Оценивает, сколько повышенного кэшбэка принёс бы каждый набор категорий при каждой ставке
+    на исторических тратах: все комбинации считаются одним матричным умножением
+    (наборы × категории) · (категории × месяцы).
+
+    :param spend_pivot: матрица трат (см. get_spend_pivot)
+    :param candidate_sets: наборы категорий повышенного кэшбэка
+    :param bonus_rates: ставки повышенного кэшбэка (доля, например 0.05 — 5 %)
+    :return: DataFrame с колонками "категории", "ставка", "кэшбэк" (за все месяцы),
+        "кэшбэк_в_месяц" (в среднем), "лучший_месяц" (ГГГГ-ММ); отсортирован по убыванию кэшбэка
+    """
+    columns = ["категории", "ставка", "кэшбэк", "кэшбэк_в_месяц", "лучший_месяц"]
+    if spend_pivot.empty or not candidate_sets or not bonus_rates:
+        logger.warning("Нет данных о тратах, наборов категорий или ставок для оценки кэшбэка.")
+        return pd.DataFrame(columns=columns)
+
+    # Матрица принадлежности категорий наборам; неизвестные категории (без трат) не учитываются
+    category_positions = {str(category): position for position, category in enumerate(spend_pivot.columns)}
+    membership = np.zeros((len(candidate_sets), len(category_positions)))
+    for set_position, candidate_set in enumerate(candidate_sets):
+        positions = [category_positions[category] for category in candidate_set if category in category_positions]
+        membership[set_position, positions] = 1.0
+
+    # Траты в категориях набора за каждый месяц: (наборы × месяцы), затем ставки: (ставки × наборы × месяцы)
+    set_spend = membership @ spend_pivot.to_numpy(dtype=float).T
+    rates = np.asarray(bonus_rates, dtype=float)
+    monthly_cashback = rates[:, np.newaxis, np.newaxis] * set_spend[np.newaxis, :, :]
+
+    months = [f"{year}-{month:02d}" for year, month in spend_pivot.index]
+    result = pd.DataFrame(
+        {
+            "категории": [", ".join(candidate_set) for candidate_set in candidate_sets] * len(rates),
+            "ставка": np.repeat(rates, len(candidate_sets)),
+            "кэшбэк": monthly_cashback.sum(axis=2).ravel().round(2),
+            "кэшбэк_в_месяц": monthly_cashback.mean(axis=2).ravel().round(2),
+            "лучший_месяц": np.array(months)[monthly_cashback.argmax(axis=2).ravel()],
+        }
+    )
+    logger.info("Оценено вариантов кэшбэка: %s (%s наборов × %s ставок)", len(result), len(candidate_sets), len(rates))
+    return result.sort_values("кэшбэк", ascending=False, kind="stable", ignore_index=True)
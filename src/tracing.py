@@ -0,0 +1,214 @@
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, Optional, TypeVar, cast
+
+from pandas import DataFrame
+
+from src import app_logger
+from src.config import TRACE_LOG_FILE, TRACING_ENABLED
+
+# Структурированные записи трассировки: одна запись JSON в строке файла
+logger = app_logger.get_logger(TRACE_LOG_FILE, log_format="%(message)s")
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class Span:
+    """
+    Этап обработки: время выполнения, количество строк на входе и выходе, попадания в кэши.
+    """
+
+    def __init__(self, stage: str, rows_in: Optional[int] = None, parent: Optional["Span"] = None) -> None:
+        self.stage = stage
+        self.parent = parent.stage if parent is not None else None
+        self.rows_in = rows_in
+        self.rows_out: Optional[int] = None
+        self.cache_hits = 0
+        self.fields: Dict[str, Any] = {}
+        self.started = datetime.now()
+        self.duration = 0.0
+        self.error: Optional[str] = None
+
+    def to_record(self) -> Dict[str, Any]:
+        """
+        Преобразует этап в запись трассировки.
+
+        :return: словарь для записи в JSON
+        """
+        return {
+            "type": "span",
+            "run_id": run_id,
+            "stage": self.stage,
+            "parent": self.parent,
+            "started": self.started.isoformat(timespec="milliseconds"),
+            "duration_ms": round(self.duration * 1000, 3),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "cache_hits": self.cache_hits,
+            "status": "ok" if self.error is None else "error",
+            "error": self.error,
+            **self.fields,
+        }
+
+
+# Текущий этап (для вложенных этапов и отметок о попаданиях в кэш)
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+# Идентификатор запуска и сводка по этапам за запуск (этап → счётчики)
+run_id = uuid.uuid4().hex
+run_summary: Dict[str, Dict[str, Any]] = {}
+summary_lock = threading.Lock()
+
+
+def count_rows(value: Any) -> Optional[int]:
+    """
+    Возвращает количество строк DataFrame.
+
+    :param value: значение
+    :return: количество строк или None, если значение не DataFrame
+    """
+    return len(value) if isinstance(value, DataFrame) else None
+
+
+@contextmanager
+def trace_span(stage: str, rows_in: Optional[int] = None) -> Iterator[Span]:
+    """
+    Измеряет этап обработки и записывает его в файл трассировки (TRACE_LOG_FILE) и в сводку запуска.
+
+    :param stage: имя этапа
+    :param rows_in: количество строк на входе
+    :return: этап (rows_out, cache_hits и fields можно заполнить внутри блока)
+    """
+    span = Span(stage, rows_in, current_span.get())
+    token = current_span.set(span)
+    start_time = time.perf_counter()
+    try:
+        yield span
+    except Exception as e:
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        span.duration = time.perf_counter() - start_time
+        current_span.reset(token)
+        record_span(span)
+
+
+def record_span(span: Span) -> None:
+    """
+    Записывает этап в файл трассировки и добавляет его в сводку запуска.
+
+    :param span: завершённый этап
+    :return: None
+    """
+    with summary_lock:
+        stage = run_summary.setdefault(
+            span.stage,
+            {"calls": 0, "errors": 0, "duration_ms": 0.0, "max_ms": 0.0, "rows_in": 0, "rows_out": 0, "cache_hits": 0},
+        )
+        stage["calls"] += 1
+        stage["errors"] += span.error is not None
+        stage["duration_ms"] = round(stage["duration_ms"] + span.duration * 1000, 3)
+        stage["max_ms"] = max(stage["max_ms"], round(span.duration * 1000, 3))
+        stage["rows_in"] += span.rows_in or 0
+        stage["rows_out"] += span.rows_out or 0
+        stage["cache_hits"] += span.cache_hits
+    logger.info("%s", json.dumps(span.to_record(), ensure_ascii=False, default=str))
+
+
+def traced(stage: Optional[str] = None) -> Callable[[F], F]:
+    """
+    Декоратор: каждый вызов функции записывается как этап трассировки.
+    Строки на входе — первый аргумент-DataFrame, на выходе — результат, если это DataFrame
+    (функция может задать их сама через annotate_span).
+
+    :param stage: имя этапа (по умолчанию — имя функции)
+    :return: декоратор
+    """
+
+    def my_decorator(func: F) -> F:
+        name = stage or func.__name__
+
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not TRACING_ENABLED:
+                return func(*args, **kwargs)
+            frames = [value for value in (*args, *kwargs.values()) if isinstance(value, DataFrame)]
+            with trace_span(name, count_rows(frames[0]) if frames else None) as span:
+                result = func(*args, **kwargs)
+                if span.rows_out is None:
+                    span.rows_out = count_rows(result)
+                return result
+
+        return cast(F, wrapper)
+
+    return my_decorator
+
+
+def annotate_span(**fields: Any) -> None:
+    """
+    Дополняет текущий этап: rows_in, rows_out или произвольные поля записи.
+
+    :param fields: значения полей
+    :return: None
+    """
+    span = current_span.get()
+    if span is None:
+        return
+    for name, value in fields.items():
+        if name in ("rows_in", "rows_out"):
+            setattr(span, name, value)
+        else:
+            span.fields[name] = value
+
+
+def add_cache_hits(count: int = 1) -> None:
+    """
+    Отмечает попадания в кэш в текущем этапе.
+
+    :param count: количество попаданий
+    :return: None
+    """
+    span = current_span.get()
+    if span is not None:
+        # отметки могут приходить из потоков run_concurrently
+        with summary_lock:
+            span.cache_hits += count
+
+
+def start_run() -> str:
+    """
+    Начинает новый запуск: новый идентификатор и пустая сводка по этапам.
+
+    :return: идентификатор запуска
+    """
+    global run_id
+    with summary_lock:
+        run_id = uuid.uuid4().hex
+        run_summary.clear()
+    return run_id
+
+
+def get_run_summary() -> Dict[str, Any]:
+    """
+    Возвращает сводку по этапам текущего запуска.
+
+    :return: словарь: run_id и stages (этап → calls, errors, duration_ms, max_ms, rows_in, rows_out, cache_hits)
+    """
+    with summary_lock:
+        return {"run_id": run_id, "stages": {name: dict(stage) for name, stage in run_summary.items()}}
+
+
+def log_run_summary() -> Dict[str, Any]:
+    """
+    Записывает сводку по этапам текущего запуска в файл трассировки.
+
+    :return: сводка (см. get_run_summary)
+    """
+    summary = get_run_summary()
+    logger.info("%s", json.dumps({"type": "summary", **summary}, ensure_ascii=False, default=str))
+    return summary
@@ -1,16 +1,56 @@
+import contextvars
 import json
 import os
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import date, datetime, timedelta
-from typing import Any, Dict, List, Union
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union, cast
 
+import numpy as np
 import pandas as pd
 import requests
 from dotenv import load_dotenv
 from pandas import DataFrame
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from src import app_logger
-from src.config import DATA_DIR, LIST_OPERATION, URL_EXCHANGE, URL_EXCHANGE_SP_500
+from src.cache import TTLCache, load_frame_cache, save_frame_cache
+from src.config import (
+    API_CIRCUIT_FAILURES,
+    API_CIRCUIT_RESET,
+    API_DEADLINE,
+    API_DEFAULT_TIMEOUT,
+    API_MAX_WORKERS,
+    API_POOL_SIZE,
+    API_RETRY_BACKOFF,
+    API_RETRY_STATUSES,
+    API_RETRY_TOTAL,
+    API_TIMEOUTS,
+    CSV_CHUNK_SIZE,
+    DATA_DIR,
+    EXCHANGE_RATE_CACHE_SIZE,
+    EXCHANGE_RATE_HISTORY_FILE,
+    EXCHANGE_RATE_STORE_FILE,
+    EXCHANGE_RATE_TTL,
+    LIST_OPERATION,
+    MONTH_COLUMN,
+    OPERATION_CATEGORY_COLUMNS,
+    OPERATION_DATE_COLUMNS,
+    OPERATION_NUMERIC_COLUMNS,
+    PAYMENT_DATE_COLUMN,
+    RATE_HISTORY_COLUMNS,
+    URL_EXCHANGE,
+    URL_EXCHANGE_SP_500,
+    URL_EXCHANGE_SP_500_BATCH,
+    WEEKDAY_COLUMN,
+    YEAR_COLUMN,
+)
+from src.tracing import add_cache_hits, annotate_span, traced
+from src.writer import get_output_writer, serialize, write_file_atomic
 
 # import yfinance as yf
 
@@ -21,9 +61,22 @@ logger = app_logger.get_logger("utils.log")
 # Загрузка переменных из .env-файла
 load_dotenv()
 
+# Кэш курсов валют, ключ — (из какой валюты, в какую валюту, дата курса)
+rate_cache = TTLCache(EXCHANGE_RATE_CACHE_SIZE, EXCHANGE_RATE_TTL)
 
+# Общая HTTP-сессия (пул соединений) и размыкатели цепи для внешних API
+http_session: Optional[requests.Session] = None
+circuit_breakers: Dict[str, "CircuitBreaker"] = {}
+http_lock = threading.Lock()
+
+
+@traced()
 def get_list_operation(
-    path_filename: str, list_operation: list, filter_str: str = "OK", name_field: str = "Статус"
+    path_filename: str,
+    list_operation: list,
+    filter_str: str = "OK",
+    name_field: str = "Статус",
+    use_cache: bool = False,
 ) -> DataFrame:
     """
     Функция читает файл CSV или Excel, и передает полученный FataFrame
@@ -31,6 +84,8 @@ def get_list_operation(
     :param list_operation: список обязательных полей
     :param filter_str: статус операции, по умолчанию "OK"
     :param name_field: имя колонки, по умолчанию "Статус"
+    :param use_cache: использовать кэш разобранного файла (каталог .cache рядом с файлом).
+        Кэш пересобирается только при изменении исходного файла.
     :return: DataFrame словарь с данными
     """
     result_df: DataFrame = pd.DataFrame()
@@ -48,13 +103,31 @@ def get_list_operation(
             logger.error(f"Файл {os.path.basename(path_filename)} не соответствует расширению CSV или XLSX,XLX")
             return result_df
 
+        start_time = time.perf_counter()
+
+        # Попытка взять уже разобранные данные из кэша
+        cache_params = {"columns": list(list_operation), "filter_str": filter_str, "name_field": name_field}
+        if use_cache:
+            cached_df, fingerprint = load_frame_cache(path_filename, cache_params)
+            if cached_df is not None:
+                add_cache_hits()
+                annotate_span(rows_in=len(cached_df))
+                logger.info(
+                    "Данные файла %s загружены из кэша за %.3f с",
+                    os.path.basename(path_filename),
+                    time.perf_counter() - start_time,
+                )
+                return normalize_operations(cached_df)
+
         # Выбор способа открытия файла
         if extension == ".CSV":
-            result_df = pd.read_csv(path_filename, delimiter=",")
+            # CSV читается блоками, фильтр по статусу применяется к каждому блоку
+            result_df = read_csv_chunked(path_filename, list_operation, filter_str, name_field)
         else:
-            result_df = pd.read_excel(path_filename, engine="openpyxl")
+            result_df = apply_operation_schema(pd.read_excel(path_filename, engine="openpyxl"), list_operation)
+        annotate_span(rows_in=len(result_df))
 
-        logger.info(f"Чтение данных из файла {os.path.basename(path_filename)} ")
+        logger.info("Чтение данных из файла %s ", os.path.basename(path_filename))
 
         # Прверим, что все колонки присутствуют
         index_column = list_operation
@@ -68,7 +141,19 @@ def get_list_operation(
             return result_df
 
         # фильтруем полученный df по столбцу с заданным параметром
-        result_df = result_df.loc[result_df[name_field] == filter_str]
+        if extension != ".CSV":
+            result_df = result_df.loc[result_df[name_field] == filter_str]
+
+        # Дата платежа разбирается один раз, данные сортируются по ней
+        result_df = normalize_operations(result_df)
+
+        if use_cache:
+            save_frame_cache(path_filename, cache_params, result_df, fingerprint)
+        logger.info(
+            "Данные файла %s прочитаны без кэша за %.3f с",
+            os.path.basename(path_filename),
+            time.perf_counter() - start_time,
+        )
 
         logger.info("Получение DataFrame")
         return result_df
@@ -82,6 +167,180 @@ def get_list_operation(
         return result_df
 
 
+def get_operation_schema(list_operation: list) -> Dict[str, Any]:
+    """
+    Формирует схему типов для колонок файла операций на основе списка обязательных полей.
+
+    :param list_operation: список обязательных полей (например, LIST_OPERATION[1])
+    :return: словарь с ключами:
+        "dtype" — типы колонок для pd.read_csv (числа, категории и строки с датами),
+        "dates" — колонки с датами и их формат
+    """
+    dtype: Dict[str, str] = {}
+    dates: Dict[str, str] = {}
+    for column in list_operation:
+        if column in OPERATION_NUMERIC_COLUMNS:
+            dtype[column] = "float64"
+        elif column in OPERATION_CATEGORY_COLUMNS:
+            dtype[column] = "category"
+        elif column in OPERATION_DATE_COLUMNS:
+            # даты читаются строкой и разбираются один раз по известному формату
+            dtype[column] = "str"
+            dates[column] = OPERATION_DATE_COLUMNS[column]
+    return {"dtype": dtype, "dates": dates}
+
+
+def to_float_column(column: pd.Series) -> pd.Series:
+    """
+    Приводит колонку к float64 без ошибок на отдельных значениях. Текстовые значения разбираются
+    как в CSV-файле: десятичная запятая, пробелы между разрядами ("1 234,50" → 1234.5).
+    Значения, которые не удалось разобрать, заменяются на NaN и записываются в лог.
+
+    :param column: колонка DataFrame
+    :return: колонка типа float64
+    """
+    values = column
+    if values.dtype == object:
+        values = values.astype("str").str.replace(r"[\s\u00a0\u202f]", "", regex=True).str.replace(",", ".")
+        values = values.where(column.notna())
+    result = pd.to_numeric(values, errors="coerce").astype("float64")
+
+    count_invalid = int((result.isna() & column.notna()).sum())
+    if count_invalid:
+        logger.warning("Колонка %s: не удалось разобрать чисел: %s", column.name, count_invalid)
+    return result
+
+
+def apply_operation_schema(df: DataFrame, list_operation: list) -> DataFrame:
+    """
+    Приводит колонки DataFrame операций к схеме из get_operation_schema: те же типы,
+    что и при чтении CSV-файла (числа, категории, разобранные даты).
+    Некорректные числа и даты заменяются на NaN/NaT, остальные строки сохраняются.
+
+    :param df: DataFrame с операциями (например, прочитанный из Excel)
+    :param list_operation: список обязательных полей
+    :return: новый DataFrame с приведёнными типами
+    """
+    schema = get_operation_schema(list_operation)
+    dict_columns = {}
+    for column, column_type in schema["dtype"].items():
+        if column not in df.columns or column in schema["dates"]:
+            continue
+        if column_type == "float64":
+            dict_columns[column] = to_float_column(df[column])
+        else:
+            dict_columns[column] = df[column].astype(column_type)
+    for column, date_format in schema["dates"].items():
+        if column in df.columns and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            dict_columns[column] = pd.to_datetime(df[column].astype("str"), format=date_format, errors="coerce")
+    return df.assign(**dict_columns)
+
+
+def read_csv_chunked(
+    path_filename: str,
+    list_operation: list,
+    filter_str: str = "OK",
+    name_field: str = "Статус",
+    chunk_size: int = CSV_CHUNK_SIZE,
+) -> DataFrame:
+    """
+    Потоковое чтение CSV-файла операций блоками по chunk_size строк.
+
+    Каждый блок читается по схеме из get_operation_schema (суммы с десятичной запятой, категории, даты),
+    и сразу фильтруется по статусу, поэтому в памяти одновременно хранится не больше одного блока
+    исходных данных.
+
+    :param path_filename: путь к файлу CSV
+    :param list_operation: список обязательных полей
+    :param filter_str: статус операции, по умолчанию "OK"
+    :param name_field: имя колонки, по умолчанию "Статус"
+    :param chunk_size: количество строк в блоке
+    :return: DataFrame с отфильтрованными операциями
+    """
+    schema = get_operation_schema(list_operation)
+    list_chunks: List[DataFrame] = []
+
+    with pd.read_csv(path_filename, delimiter=",", decimal=",", dtype=schema["dtype"], chunksize=chunk_size) as reader:
+        for chunk in reader:
+            if name_field in chunk.columns:
+                chunk = chunk.loc[chunk[name_field] == filter_str]
+            dict_dates = {
+                column: pd.to_datetime(chunk[column], format=date_format, errors="coerce")
+                for column, date_format in schema["dates"].items()
+                if column in chunk.columns
+            }
+            list_chunks.append(chunk.assign(**dict_dates))
+
+    if not list_chunks:
+        # файл только с заголовками
+        return pd.read_csv(path_filename, delimiter=",", nrows=0)
+
+    # Категории в разных блоках могут отличаться — приводим к общему набору, чтобы сохранить тип category
+    for column in schema["dtype"]:
+        if column in list_chunks[0].columns and schema["dtype"][column] == "category":
+            categories = pd.api.types.union_categoricals([chunk[column] for chunk in list_chunks]).categories
+            for chunk in list_chunks:
+                chunk[column] = chunk[column].cat.set_categories(categories)
+
+    result_df: DataFrame = pd.concat(list_chunks)
+    return result_df
+
+
+def is_normalized_operations(df: DataFrame) -> bool:
+    """
+    Проверяет, что DataFrame уже нормализован функцией normalize_operations.
+
+    :param df: DataFrame с операциями
+    :return: True, если дата платежа имеет тип datetime64, есть колонки год/месяц/день недели
+        и индекс — отсортированные даты платежа
+    """
+    return (
+        PAYMENT_DATE_COLUMN in df.columns
+        and pd.api.types.is_datetime64_any_dtype(df[PAYMENT_DATE_COLUMN])
+        and all(column in df.columns for column in (YEAR_COLUMN, MONTH_COLUMN, WEEKDAY_COLUMN))
+        and isinstance(df.index, pd.DatetimeIndex)
+        and df.index.is_monotonic_increasing
+    )
+
+
+def normalize_operations(df: DataFrame) -> DataFrame:
+    """
+    Нормализует DataFrame с операциями:
+        - колонка "Дата платежа" приводится к datetime64 (формат ДД.ММ.ГГГГ), операции без даты исключаются;
+        - добавляются целочисленные колонки год, месяц и день недели (0 — понедельник);
+        - строки сортируются по дате платежа, индекс — дата платежа.
+
+    Уже нормализованный DataFrame возвращается без изменений и без копирования,
+    исходный DataFrame не изменяется.
+
+    :param df: DataFrame с операциями
+    :return: нормализованный DataFrame (или исходный, если в нём нет колонки "Дата платежа")
+    """
+    if PAYMENT_DATE_COLUMN not in df.columns or is_normalized_operations(df):
+        return df
+
+    dates = df[PAYMENT_DATE_COLUMN]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, format=OPERATION_DATE_COLUMNS[PAYMENT_DATE_COLUMN], errors="coerce")
+
+    date_values = dates.to_numpy()
+    valid_rows = np.flatnonzero(dates.notna().to_numpy())
+    if len(valid_rows) < len(df):
+        logger.warning("Исключено операций без даты платежа: %s", len(df) - len(valid_rows))
+
+    # Устойчивая сортировка по дате сохраняет исходный порядок операций внутри дня
+    order = valid_rows[np.argsort(date_values[valid_rows], kind="stable")]
+
+    result_df = df.take(order)
+    result_df.index = pd.DatetimeIndex(date_values[order])
+    result_df[PAYMENT_DATE_COLUMN] = result_df.index
+    result_df[YEAR_COLUMN] = result_df.index.year.astype("int16")
+    result_df[MONTH_COLUMN] = result_df.index.month.astype("int8")
+    result_df[WEEKDAY_COLUMN] = result_df.index.weekday.astype("int8")
+
+    return result_df
+
+
 def get_period_operation(str_date: str, range_data: str = "M") -> list:
     """
     Получает период и возвращает список даты с и по.
@@ -139,7 +398,8 @@ def filter_by_date(df: pd.DataFrame, list_period: List) -> DataFrame:
     """
     Фильтрует данные по периоду и возвращает список словарей.
 
-    :param df: DataFrame с колонкой "Дата платежа" в формате ДД.ММ.ГГГГ
+    :param df: DataFrame с колонкой "Дата платежа" (нормализованный normalize_operations
+        или с датами в формате ДД.ММ.ГГГГ — тогда нормализуется копия, исходный df не изменяется)
     :param list_period: список с периодами дат
     :return: список словарей (записи DataFrame)
     #"""
@@ -147,30 +407,273 @@ def filter_by_date(df: pd.DataFrame, list_period: List) -> DataFrame:
     data_from_ts = pd.Timestamp(list_period[0])
     data_to_ts = pd.Timestamp(list_period[1])
 
-    # Преобразование столбца "Дата платежа" в datetime
+    # Приведение столбца "Дата платежа" к datetime (для нормализованного df — без изменений)
     try:
-        df.loc[:, "Дата платежа"] = pd.to_datetime(
-            df.loc[:, "Дата платежа"], format="%d.%m.%Y", errors="coerce"  # некорректные значения → NaT
-        )
+        if PAYMENT_DATE_COLUMN not in df.columns:
+            raise KeyError(PAYMENT_DATE_COLUMN)
+        df = normalize_operations(df)
     except Exception as e:
         logger.error(f"Ошибка при преобразовании столбца 'Дата платежа': {e}")
         # return list_dict
         return pd.DataFrame()
 
-    # Фильтрация
-    mask = (df["Дата платежа"] >= data_from_ts) & (df["Дата платежа"] < data_to_ts)
-    filtered_df = df.loc[mask]
+    # Фильтрация: бинарный поиск границ периода по отсортированному индексу дат
+    return slice_by_period(df, data_from_ts, data_to_ts)
+
+
+def slice_by_period(df: DataFrame, data_from: Any, data_to: Any) -> DataFrame:
+    """
+    Возвращает операции за период [data_from, data_to) из нормализованного DataFrame.
+
+    Индекс нормализованного DataFrame — отсортированные даты платежа, поэтому границы периода
+    находятся бинарным поиском (searchsorted), а результат — непрерывный срез строк без копирования данных.
+
+    :param df: DataFrame, нормализованный функцией normalize_operations
+    :param data_from: начало периода (включительно)
+    :param data_to: конец периода (не включительно)
+    :return: срез DataFrame за период
+    """
+    index = pd.DatetimeIndex(df.index)
+    start = index.searchsorted(pd.Timestamp(data_from), side="left")
+    stop = index.searchsorted(pd.Timestamp(data_to), side="left")
+    return df.iloc[start:stop]
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Запрос не выполнен: размыкатель цепи для API разомкнут после серии ошибок."""
+
+
+class CircuitBreaker:
+    """
+    Размыкатель цепи: после max_failures ошибок подряд запросы к API блокируются на reset_timeout секунд,
+    затем пропускается один пробный запрос (полуоткрытое состояние). Пока он выполняется, остальные запросы
+    блокируются; успешный пробный запрос замыкает цепь, ошибка снова размыкает её на reset_timeout секунд.
+    """
+
+    def __init__(self, max_failures: int = API_CIRCUIT_FAILURES, reset_timeout: float = API_CIRCUIT_RESET) -> None:
+        """
+        :param max_failures: количество ошибок подряд, после которого цепь размыкается
+        :param reset_timeout: время в секундах, на которое блокируются запросы
+        """
+        self.max_failures = max_failures
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """
+        Состояние цепи: "closed" (замкнута), "open" (разомкнута) или "half_open" (выполняется пробный запрос).
+
+        :return: название состояния
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half_open" if self.probe_in_flight else "open"
+
+    def allow(self) -> bool:
+        """
+        Проверяет, можно ли выполнить запрос. После истечения времени блокировки разрешается только один
+        пробный запрос, он должен завершиться вызовом record_success или record_failure.
+
+        :return: True, если цепь замкнута или запрос пропущен как пробный
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.probe_in_flight or time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        """
+        Отмечает успешный запрос — цепь замыкается.
+
+        :return: None
+        """
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """
+        Отмечает ошибку запроса, при достижении max_failures или ошибке пробного запроса цепь размыкается.
+
+        :return: None
+        """
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.max_failures or self.probe_in_flight:
+                self.opened_at = time.monotonic()
+                self.probe_in_flight = False
+
+
+def get_http_session() -> requests.Session:
+    """
+    Возвращает общую HTTP-сессию с пулом соединений (keep-alive) и повторными попытками с нарастающей задержкой.
+
+    :return: экземпляр requests.Session
+    """
+    global http_session
+    with http_lock:
+        if http_session is None:
+            retry = Retry(
+                total=API_RETRY_TOTAL,
+                backoff_factor=API_RETRY_BACKOFF,
+                status_forcelist=API_RETRY_STATUSES,
+                allowed_methods=["GET"],
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=API_POOL_SIZE, pool_maxsize=API_POOL_SIZE, max_retries=retry)
+            http_session = requests.Session()
+            http_session.mount("https://", adapter)
+            http_session.mount("http://", adapter)
+        return http_session
+
+
+def close_http_session() -> None:
+    """
+    Закрывает общую HTTP-сессию и сбрасывает размыкатели цепи.
+
+    :return: None
+    """
+    global http_session
+    with http_lock:
+        if http_session is not None:
+            http_session.close()
+            http_session = None
+        circuit_breakers.clear()
+
+
+def get_request_timeout(endpoint: str, expires_at: Optional[float] = None) -> Tuple[float, float]:
+    """
+    Возвращает таймауты (подключение, чтение) запроса к API endpoint.
+    Если задан срок expires_at, таймауты уменьшаются так, чтобы первая попытка и все повторы (API_RETRY_TOTAL)
+    с паузами между ними уложились в оставшееся время.
+
+    :param endpoint: имя API (ключ в API_TIMEOUTS)
+    :param expires_at: срок ожидания ответа по time.monotonic() (None — без ограничения)
+    :return: кортеж (таймаут подключения, таймаут чтения) в секундах
+    :raises requests.exceptions.Timeout: если срок уже истёк
+    """
+    connect_timeout, read_timeout = API_TIMEOUTS.get(endpoint, API_DEFAULT_TIMEOUT)
+    if expires_at is None:
+        return connect_timeout, read_timeout
 
-    return filtered_df
+    remaining = expires_at - time.monotonic()
+    if remaining <= 0:
+        raise requests.exceptions.Timeout(f"Истекло время ожидания ответа API {endpoint}")
+    backoff_total = sum(API_RETRY_BACKOFF * 2**number for number in range(API_RETRY_TOTAL))
+    attempt_timeout = max((remaining - backoff_total) / (API_RETRY_TOTAL + 1), 0.05)
+    return min(connect_timeout, attempt_timeout), min(read_timeout, attempt_timeout)
 
 
-def get_exchange_rate(carrency_code: str, target_currency: str = "RUB") -> float:
+def http_get(
+    endpoint: str, url: str, params: Optional[Dict[str, Any]] = None, expires_at: Optional[float] = None
+) -> requests.Response:
+    """
+    Выполняет GET-запрос к внешнему API через общую сессию с таймаутом для API endpoint.
+
+    :param endpoint: имя API (ключ в API_TIMEOUTS, например "exchange" или "sp_500")
+    :param url: адрес запроса
+    :param params: параметры запроса
+    :param expires_at: срок ожидания ответа по time.monotonic() (см. get_request_timeout)
+    :return: ответ requests.Response
+    :raises CircuitOpenError: если цепь для API разомкнута
+    :raises requests.exceptions.RequestException: при ошибке соединения или таймауте
+    """
+    timeout = get_request_timeout(endpoint, expires_at)
+    with http_lock:
+        breaker = circuit_breakers.setdefault(endpoint, CircuitBreaker())
+    if not breaker.allow():
+        raise CircuitOpenError(f"API {endpoint} временно недоступно (размыкатель цепи)")
+
+    try:
+        response = get_http_session().get(url, params=params, timeout=timeout)
+    except Exception:
+        # любая ошибка завершает и пробный запрос, иначе цепь осталась бы полуоткрытой
+        breaker.record_failure()
+        raise
+
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
+
+
+def load_rate_store(file_path: str = EXCHANGE_RATE_STORE_FILE) -> int:
+    """
+    Загружает в кэш курсы валют, сохранённые предыдущими запусками программы.
+    Устаревшие (по EXCHANGE_RATE_TTL) курсы пропускаются.
+
+    :param file_path: путь к JSON-файлу с курсами
+    :return: количество загруженных курсов
+    """
+    if not os.path.isfile(file_path):
+        return 0
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            dict_store = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"Ошибка чтения файла курсов {file_path}: {e}")
+        return 0
+
+    count = 0
+    for key, item in dict_store.items():
+        if EXCHANGE_RATE_TTL is None or time.time() - item["time"] < EXCHANGE_RATE_TTL:
+            rate_cache.set(tuple(key.split("|")), item["rate"], created=item["time"])
+            count += 1
+    logger.info("Загружено курсов валют из %s: %s", file_path, count)
+    return count
+
+
+def save_rate_store(file_path: str = EXCHANGE_RATE_STORE_FILE) -> None:
+    """
+    Сохраняет актуальные курсы валют из кэша в файл для следующих запусков программы.
+
+    :param file_path: путь к JSON-файлу с курсами
+    :return: None
+    """
+    dict_store = {
+        "|".join(cast(Tuple[str, ...], key)): {"rate": rate, "time": created}
+        for key, rate, created in rate_cache.items()
+    }
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump(dict_store, f, ensure_ascii=False, indent=4)
+    except (IOError, OSError) as e:
+        logger.error(f"Ошибка при записи файла курсов {file_path}: {e}")
+
+
+def log_rate_cache_stats() -> Dict[str, int]:
+    """
+    Записывает в лог счётчики попаданий и промахов кэша курсов валют.
+
+    :return: словарь с полями hits, misses, size
+    """
+    stats = rate_cache.stats()
+    logger.info(
+        "Кэш курсов валют: попаданий %s, промахов %s, записей %s", stats["hits"], stats["misses"], stats["size"]
+    )
+    return stats
+
+
+def get_exchange_rate(carrency_code: str, target_currency: str = "RUB", expires_at: Optional[float] = None) -> float:
     """
     Для получения текущего курса валют
     принимает на вход название валюты, если валюта была не RUB, происходит обращение к внешнему API для получения
     текущего курса валют в рублях.
+    Полученный курс кэшируется на текущую дату (см. rate_cache), повторные вызовы не обращаются к API.
     :param carrency_code: из какой валюты
     :param target_currency: в какую валюту
+    :param expires_at: срок ожидания ответа API по time.monotonic() (None — таймауты API_TIMEOUTS)
     :return: сумму в рублях по курсу, тип данных —float.
     """
     carrency_code = carrency_code.upper()
@@ -178,7 +681,17 @@ def get_exchange_rate(carrency_code: str, target_currency: str = "RUB") -> float
         if carrency_code == target_currency:
             return 1
         else:
-            response = requests.get(f"{URL_EXCHANGE}{os.getenv('API_KEY')}/pair/{carrency_code}/{target_currency}")
+            cache_key = (carrency_code, target_currency, date.today().isoformat())
+            cached_rate = rate_cache.get(cache_key)
+            if cached_rate is not None:
+                add_cache_hits()
+                return float(cached_rate)
+
+            response = http_get(
+                "exchange",
+                f"{URL_EXCHANGE}{os.getenv('API_KEY')}/pair/{carrency_code}/{target_currency}",
+                expires_at=expires_at,
+            )
             # response.raise_for_status()
             # data = response.json()
             # return {
@@ -193,7 +706,9 @@ def get_exchange_rate(carrency_code: str, target_currency: str = "RUB") -> float
             if response.status_code == 200:
                 try:
                     # return float(response.json()["result"])
-                    return float(response.json()["conversion_rate"])
+                    rate = float(response.json()["conversion_rate"])
+                    rate_cache.set(cache_key, rate)
+                    return rate
                 except json.decoder.JSONDecodeError as e:
                     logger.error(f"Ошибка при получении курса валюты: {e}")
                     return 0
@@ -206,66 +721,262 @@ def get_exchange_rate(carrency_code: str, target_currency: str = "RUB") -> float
         return 0
 
 
-def conversion_to_single_currency(df: pd.DataFrame, target_currency: str = "RUB") -> pd.DataFrame:
+def load_rate_history(file_path: str = EXCHANGE_RATE_HISTORY_FILE) -> DataFrame:
+    """
+    Загружает из CSV-файла исторические курсы валют.
+
+    :param file_path: путь к файлу с колонками RATE_HISTORY_COLUMNS
+        (дата курса ГГГГ-ММ-ДД, валюта, целевая валюта, курс)
+    :return: DataFrame с курсами, отсортированный по дате; пустой DataFrame, если файла нет
+    """
+    date_col, currency_col, target_col, rate_col = RATE_HISTORY_COLUMNS
+    empty_history = pd.DataFrame(
+        {
+            date_col: pd.Series(dtype="datetime64[ns]"),
+            currency_col: pd.Series(dtype=object),
+            target_col: pd.Series(dtype=object),
+            rate_col: pd.Series(dtype=float),
+        }
+    )
+    if not os.path.isfile(file_path):
+        logger.info("Файл исторических курсов %s не найден", file_path)
+        return empty_history
+
+    try:
+        history = pd.read_csv(file_path, dtype={currency_col: str, target_col: str, rate_col: float})
+        history[date_col] = pd.to_datetime(history[date_col], format="%Y-%m-%d")
+    except Exception as e:
+        logger.error(f"Ошибка чтения файла исторических курсов {file_path}: {e}")
+        return empty_history
+
+    result: DataFrame = history[RATE_HISTORY_COLUMNS].sort_values(date_col, kind="stable", ignore_index=True)
+    logger.info("Загружено исторических курсов из %s: %s", file_path, len(result))
+    return result
+
+
+def save_rate_history(history: DataFrame, file_path: str = EXCHANGE_RATE_HISTORY_FILE) -> None:
+    """
+    Сохраняет исторические курсы валют в CSV-файл (повторяющиеся записи удаляются).
+
+    :param history: DataFrame с колонками RATE_HISTORY_COLUMNS
+    :param file_path: путь к файлу
+    :return: None
+    """
+    history = history.drop_duplicates(subset=RATE_HISTORY_COLUMNS[:3], keep="last")
+    history = history.sort_values(RATE_HISTORY_COLUMNS[0], kind="stable")
+    try:
+        history.to_csv(file_path, index=False, date_format="%Y-%m-%d")
+        logger.info("Исторические курсы записаны в %s: %s записей", file_path, len(history))
+    except (IOError, OSError) as e:
+        logger.error(f"Ошибка при записи файла исторических курсов {file_path}: {e}")
+
+
+def get_exchange_rates_on_date(rate_date: date, target_currency: str = "RUB") -> Dict[str, float]:
+    """
+    Получает через API курсы всех валют к целевой валюте на указанную дату (один запрос на дату).
+
+    :param rate_date: дата курса
+    :param target_currency: целевая валюта
+    :return: словарь {валюта: курс к целевой валюте}; пустой словарь при ошибке
+    """
+    url = (
+        f"{URL_EXCHANGE}{os.getenv('API_KEY')}/history/{target_currency}/"
+        f"{rate_date.year}/{rate_date.month}/{rate_date.day}"
+    )
+    try:
+        response = http_get("exchange", url)
+        if response.status_code != 200:
+            logger.error(f"Ошибка получения курсов на {rate_date}: статус - код {response.status_code}")
+            return {}
+        # API возвращает, сколько единиц каждой валюты дают за единицу целевой валюты
+        conversion_rates = response.json()["conversion_rates"]
+        return {currency: 1 / float(value) for currency, value in conversion_rates.items() if float(value) > 0}
+    except Exception as e:
+        logger.error(f"Ошибка получения курсов на {rate_date}: {e}")
+        return {}
+
+
+def fill_rate_history(
+    df: DataFrame,
+    target_currency: str = "RUB",
+    history: Optional[DataFrame] = None,
+    file_path: Optional[str] = EXCHANGE_RATE_HISTORY_FILE,
+) -> DataFrame:
+    """
+    Дополняет исторические курсы курсами на даты платежей операций в иностранной валюте.
+    Через API запрашиваются только даты, которых ещё нет в истории (запросы выполняются параллельно).
+
+    :param df: DataFrame с операциями (колонки "Дата платежа" и LIST_OPERATION[2])
+    :param target_currency: целевая валюта
+    :param history: уже загруженные курсы (по умолчанию — из file_path)
+    :param file_path: файл исторических курсов; None — не читать и не сохранять файл
+    :return: DataFrame с историческими курсами
+    """
+    date_col, currency_col, target_col, rate_col = RATE_HISTORY_COLUMNS
+    if history is None:
+        history = load_rate_history(file_path or "")
+
+    dates = get_payment_dates(df)
+    currencies: pd.Series = df[str(LIST_OPERATION[2])]
+    foreign_rows = currencies.notna() & (currencies != target_currency) & dates.notna()
+    needed_dates = set(dates[foreign_rows].dt.normalize())
+    known_dates = set(history.loc[history[target_col] == target_currency, date_col])
+    missing_dates = sorted(needed_dates - known_dates)
+    if not missing_dates:
+        return history
+
+    logger.info("Запрос исторических курсов в %s за %s дат", target_currency, len(missing_dates))
+    dict_rates = run_concurrently(
+        {day: partial(get_exchange_rates_on_date, day.date(), target_currency) for day in missing_dates}
+    )
+    list_rows = [
+        {date_col: day, currency_col: currency, target_col: target_currency, rate_col: rate}
+        for day, rates in dict_rates.items()
+        if rates
+        for currency, rate in rates.items()
+    ]
+    if list_rows:
+        history = pd.concat([history, pd.DataFrame(list_rows)], ignore_index=True)
+        history = history.sort_values(date_col, kind="stable", ignore_index=True)
+        if file_path:
+            save_rate_history(history, file_path)
+    return history
+
+
+def get_payment_dates(df: DataFrame) -> pd.Series:
+    """
+    Возвращает колонку "Дата платежа" в виде datetime (для ненормализованных данных — с разбором строк).
+
+    :param df: DataFrame с операциями
+    :return: Series с датами платежа (NaT для некорректных дат)
+    """
+    dates = df[PAYMENT_DATE_COLUMN]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, format=OPERATION_DATE_COLUMNS[PAYMENT_DATE_COLUMN], errors="coerce")
+    return dates
+
+
+def get_history_rates(df: DataFrame, rate_history: DataFrame, target_currency: str = "RUB") -> pd.Series:
+    """
+    Подбирает для каждой операции курс на дату платежа (последний известный курс на эту дату или раньше)
+    одним as-of соединением с таблицей исторических курсов.
+
+    :param df: DataFrame с операциями (колонки "Дата платежа" и LIST_OPERATION[2])
+    :param rate_history: исторические курсы (колонки RATE_HISTORY_COLUMNS)
+    :param target_currency: целевая валюта
+    :return: Series с курсом для каждой строки df (NaN — курс неизвестен, 1 — операция уже в целевой валюте)
+    """
+    date_col, currency_col, target_col, rate_col = RATE_HISTORY_COLUMNS
+    currencies = df[LIST_OPERATION[2]].astype(object)
+
+    left = pd.DataFrame(
+        {
+            "date": get_payment_dates(df).to_numpy().astype("datetime64[ns]"),
+            "currency": currencies.to_numpy(),
+            "row": np.arange(len(df)),
+        }
+    )
+    left = left.loc[left["date"].notna() & left["currency"].notna()].sort_values("date", kind="stable")
+
+    right = rate_history.loc[rate_history[target_col] == target_currency, [date_col, currency_col, rate_col]]
+    right = pd.DataFrame(
+        {
+            "date": right[date_col].to_numpy().astype("datetime64[ns]"),
+            "currency": right[currency_col].to_numpy().astype(object),
+            "rate": right[rate_col].to_numpy().astype(float),
+        }
+    ).sort_values("date", kind="stable")
+
+    merged = pd.merge_asof(left, right, on="date", by="currency", direction="backward")
+
+    rates = np.full(len(df), np.nan)
+    rates[merged["row"].to_numpy()] = merged["rate"].to_numpy()
+    rates[(currencies == target_currency).to_numpy()] = 1.0
+    return pd.Series(rates, index=df.index)
+
+
+@traced()
+def conversion_to_single_currency(
+    df: pd.DataFrame, target_currency: Union[str, List[str]] = "RUB", rate_history: Optional[DataFrame] = None
+) -> pd.DataFrame:
     """
     Преобразует суммы платежей в единую валюту (по умолчанию — RUB).
+    Курс запрашивается один раз для каждой валюты в данных, затем курсы сопоставляются
+    со всеми строками и суммы пересчитываются одной операцией (без цикла по валютам).
     :param df: DataFrame с транзакциями. Должен содержать столбцы:
         - LIST_OPERATION[2] — код валюты (например, 'USD', 'EUR')
         - LIST_OPERATION[3] — сумма платежа (числовой тип)
     :param target_currency: целевая валюта для конвертации (по умолчанию 'RUB')
-    :return: DataFrame с пересчитанными суммами в целевой валюте
+        или список валют (например, ["RUB", "USD", "EUR"]) — тогда добавляется колонка для каждой валюты
+    :param rate_history: исторические курсы (см. load_rate_history, fill_rate_history). Если переданы —
+        каждая операция пересчитывается по курсу на дату платежа, без обращения к API
+    :return: DataFrame с пересчитанными суммами в целевой валюте (колонки "<сумма>_<валюта>").
+        Исходный df не изменяется и не копируется целиком — новые колонки присоединяются к нему.
     """
     #
-    currency_col = LIST_OPERATION[2]
+    currency_col = str(LIST_OPERATION[2])
     amount_col = str(LIST_OPERATION[3])
+    list_targets = [target_currency] if isinstance(target_currency, str) else list(target_currency)
 
     # Убедимся, что сумма — числовая
-    if not pd.api.types.is_numeric_dtype(df[amount_col]):
-        # try:
-        df[amount_col] = pd.to_numeric(df[amount_col], errors="coerce")
-        # except Exception as e:
-        #     logger.error(f"Не удалось преобразовать столбец '{amount_col}' в число: {e}")
-        #     return pd.DataFrame()
-
-    # Создаём новый столбец для сумм  (dropna() исключает строки без указанной валюты)
-    new_amount_col = f"{amount_col}_{target_currency}"
-    # df[new_amount_col] = df[amount_col].copy()
-    df = df.copy()
-    df[new_amount_col] = df[amount_col]
-    # df = df.assign(**{new_amount_col: df[amount_col]})
-
-    # Получаем уникальные валюты в данных
-    unique_currencies = df["Валюта платежа"].dropna().unique()
-
-    for currency in unique_currencies:
-        if currency == target_currency:
-            # Если валюта уже в RUB — ничего не делаем
-            continue
-
-        try:
-            # Получаем курс конвертации (get_exchange_rate возвращает число)
-            rate = get_exchange_rate(currency, target_currency)
-            if pd.isna(rate) or rate <= 0:
-                logger.error(f"Недопустимый курс для валюты {currency}: {rate}")
-
-            # Конвертируем суммы для данной валюты
-            mask = df[currency_col] == currency
-            df.loc[mask, new_amount_col] = df.loc[mask, amount_col] * rate
-
-        except Exception as e:
-            logger.error(f"Ошибка при конвертации валюты {currency}: {e}")
-            # Оставляем исходные значения для проблемных строк
+    dict_columns: Dict[str, pd.Series] = {}
+    amounts = df[amount_col]
+    if not pd.api.types.is_numeric_dtype(amounts):
+        amounts = pd.to_numeric(amounts, errors="coerce")
+        dict_columns[amount_col] = amounts
+
+    # Уникальные валюты в данных (dropna() исключает строки без указанной валюты)
+    currencies = df[currency_col]
+    unique_currencies = currencies.dropna().unique()
+
+    for target in list_targets:
+        if rate_history is not None:
+            # Курс на дату платежа для каждой операции
+            rates = get_history_rates(df, rate_history, target)
+            if rates.isna().any():
+                logger.error(f"Нет исторического курса в {target} для {int(rates.isna().sum())} операций")
+            dict_columns[f"{amount_col}_{target}"] = (amounts * rates).where(rates.notna(), amounts)
             continue
 
-    return df
-
-
-def get_data_from_expensess(df: pd.DataFrame) -> Dict:
+        # Таблица курсов: валюта → курс к целевой валюте
+        dict_rates: Dict[Any, float] = {}
+        for currency in unique_currencies:
+            if currency == target:
+                dict_rates[currency] = 1.0
+                continue
+            try:
+                # Получаем курс конвертации (get_exchange_rate возвращает число)
+                rate = get_exchange_rate(currency, target)
+                if pd.isna(rate) or rate <= 0:
+                    logger.error(f"Недопустимый курс для валюты {currency}: {rate}")
+                dict_rates[currency] = rate
+            except Exception as e:
+                logger.error(f"Ошибка при конвертации валюты {currency}: {e}")
+                # Оставляем исходные значения для проблемных строк
+                continue
+
+        # Курс для каждой строки; строки без курса (ошибка, нет валюты) сохраняют исходную сумму
+        rates = currencies.map(dict_rates).astype(float)
+        dict_columns[f"{amount_col}_{target}"] = (amounts * rates).where(rates.notna(), amounts)
+
+    # Присоединяем новые колонки без копирования остальных данных
+    replaced_columns = [column for column in dict_columns if column in df.columns]
+    base_df = df.drop(columns=replaced_columns) if replaced_columns else df
+    result_df: DataFrame = pd.concat([base_df, pd.DataFrame(dict_columns, index=df.index)], axis=1, copy=False)
+    if replaced_columns:
+        result_df = result_df[list(df.columns) + [c for c in dict_columns if c not in df.columns]]
+
+    return result_df
+
+
+def get_data_by_categories(df: pd.DataFrame, top_count: int = 7) -> Dict:
     """
-    Формирование раздела «Расходы»: суммирует отрицательные значения в колонке суммы (в RUB).
+    Формирование разделов «Расходы» и «Поступления» за один проход по данным:
+    суммы в RUB группируются сразу по знаку операции и категории, разделы строятся по агрегату.
 
-    :param df: DataFrame с колонкой суммы в RUB (например, 'Сумма_RUB')
-    :return: список словарей с итоговыми расходами
+    :param df: DataFrame с колонкой суммы в RUB (например, 'Сумма_RUB') и колонкой категории
+    :param top_count: количество категорий расходов с наибольшими тратами, остальные попадают в «Остальное»
+    :return: словарь {"expenses": {...}, "income": {...}}; пустой словарь, если нет колонки суммы
     """
     # Название колонки с суммой в RUB
     new_amount_col = f"{LIST_OPERATION[3]}_RUB"
@@ -274,65 +985,54 @@ def get_data_from_expensess(df: pd.DataFrame) -> Dict:
     # Проверка наличия колонки
     if new_amount_col not in df.columns:
         logger.error(f"Колонка '{new_amount_col}' не найдена в DataFrame")
-        # raise KeyError(f"Колонка '{new_amount_col}' не найдена в DataFrame")
         return {}
 
-    # Убедимся, что колонка — числовая
-    if not pd.api.types.is_numeric_dtype(df[new_amount_col]):
-        # try:
-        df[new_amount_col] = pd.to_numeric(df[new_amount_col], errors="coerce")
-        # except Exception as e:
-        #     logger.error(f"Не удалось преобразовать колонку '{new_amount_col}' в число: {e}")
-        #     # raise ValueError(f"Не удалось преобразовать колонку '{new_amount_col}' в число: {e}")
-        #     return {}
-
-    # Фильтруем отрицательные значения (расходы) и суммируем
-    expenses = df.loc[df[new_amount_col] < 0, new_amount_col]
-    sum_amount = expenses.sum()
-
-    # вычисляем Сумму трат по каждой категориям, т.е. получаем уникальные категории
-    unique_categories = df[df[new_amount_col] < 0]["Категория"].dropna().unique()
-
-    result_list = []
-    for category in unique_categories:
-        df_category = df.loc[(df[new_amount_col] < 0) & (df[category_col] == category), new_amount_col]
-        sum_amount_category = df_category.sum()
-        result_list.append(
-            {
-                "category": category,
-                "amount": round(sum_amount_category * (-1)),
-            }
-        )
-
-    # берем только первые 7 категорий, остальные в категорию <<Остальное>>
-    # Сортируем список по убыванию
-    sorted_list = sorted(result_list, key=lambda x: x["amount"], reverse=True)
+    # Убедимся, что колонка — числовая (исходный df не изменяется)
+    amounts = df[new_amount_col]
+    if not pd.api.types.is_numeric_dtype(amounts):
+        amounts = pd.to_numeric(amounts, errors="coerce")
+
+    # Один проход: сумма по паре (знак операции, категория); строки без категории входят только в общие суммы
+    signs = np.sign(amounts.to_numpy(dtype=float))
+    grouped = amounts.groupby([signs, df[category_col]], sort=False, dropna=False, observed=True).sum()
+    dict_sections: Dict[str, Any] = {}
+    for section, sign in (("expenses", -1.0), ("income", 1.0)):
+        sums = grouped[grouped.index.get_level_values(0) == sign].droplevel(0)
+        total_amount = round(sums.sum() * sign)
+        # суммы округляются до рублей и сортируются по убыванию (при равенстве — в порядке появления)
+        list_main = [
+            {"category": category, "amount": round(amount * sign)}
+            for category, amount in sums[sums.index.notna()].items()
+        ]
+        dict_sections[section] = {
+            "total_amount": total_amount,
+            "main": sorted(list_main, key=lambda x: x["amount"], reverse=True),
+        }
 
-    if len(sorted_list) > 7:
-        # осатвляем первые
-        top_7 = sorted_list[:7]
+    # берем только первые top_count категорий расходов, остальные в категорию <<Остальное>>
+    list_expenses = dict_sections["expenses"]["main"]
+    if len(list_expenses) > top_count:
+        rest_amount = sum(item["amount"] for item in list_expenses[top_count:])
+        dict_sections["expenses"]["main"] = list_expenses[:top_count] + [
+            {"category": "Остальное", "amount": round(rest_amount)}
+        ]
 
-        # Берём остальные (после 7‑го) и суммируем поле `amount`
-        rest = sorted_list[7:]
-        if rest:
-            total_amount = sum(item["amount"] for item in rest)
-            # Формируем итоговую запись
-            summed_item = {"category": "Остальное", "amount": round(total_amount)}  # округляем до целого
+    return dict_sections
 
-            top_7.append(summed_item)
 
-    else:
-        top_7 = sorted_list
+def get_data_from_expensess(df: pd.DataFrame) -> Dict:
+    """
+    Формирование раздела «Расходы»: суммирует отрицательные значения в колонке суммы (в RUB).
 
-    # Формируем итоговый словарь
-    result = {
-        "expenses": {
-            "total_amount": round(sum_amount * (-1)),  # общая сумма расходов (положительная)
-            "main": top_7,  # топ-7 категорий + «Остальное»
-        }
-    }
+    :param df: DataFrame с колонкой суммы в RUB (например, 'Сумма_RUB')
+    :return: список словарей с итоговыми расходами
+    """
+    dict_sections = get_data_by_categories(df)
+    if not dict_sections:
+        return {}
 
-    return result
+    # Формируем итоговый словарь: общая сумма расходов (положительная) и топ-7 категорий + «Остальное»
+    return {"expenses": dict_sections["expenses"]}
 
 
 def get_data_from_income(df: pd.DataFrame) -> Dict:
@@ -342,55 +1042,12 @@ def get_data_from_income(df: pd.DataFrame) -> Dict:
     :param df: DataFrame с колонкой суммы в RUB (например, 'Сумма_RUB')
     :return: список словарей с итоговыми поступлениями
     """
-    # Название колонки с суммой в RUB
-    new_amount_col = f"{LIST_OPERATION[3]}_RUB"
-    category_col = LIST_OPERATION[4]
-
-    # Проверка наличия колонки
-    if new_amount_col not in df.columns:
-        logger.error(f"Колонка '{new_amount_col}' не найдена в DataFrame")
-        # raise KeyError(f"Колонка '{new_amount_col}' не найдена в DataFrame")
+    dict_sections = get_data_by_categories(df)
+    if not dict_sections:
         return {}
 
-    # Убедимся, что колонка — числовая
-    if not pd.api.types.is_numeric_dtype(df[new_amount_col]):
-        # try:
-        df[new_amount_col] = pd.to_numeric(df[new_amount_col], errors="coerce")
-        # except Exception as e:
-        #     logger.error(f"Не удалось преобразовать колонку '{new_amount_col}' в число: {e}")
-        #     # raise ValueError(f"Не удалось преобразовать колонку '{new_amount_col}' в число: {e}")
-        #     return {}
-
-    # Фильтруем Положительные значения (доходы) и суммируем
-    income = df.loc[df[new_amount_col] > 0, new_amount_col]
-    sum_amount = income.sum()
-
-    # вычисляем Сумму трат по каждой категориям, т.е. получаем уникальные категории
-    unique_categories = df[df[new_amount_col] > 0]["Категория"].dropna().unique()
-
-    result_list = []
-    for category in unique_categories:
-        df_category = df.loc[(df[new_amount_col] > 0) & (df[category_col] == category), new_amount_col]
-        sum_amount_category = df_category.sum()
-        result_list.append(
-            {
-                "category": category,
-                "amount": round(sum_amount_category),
-            }
-        )
-
-    # Сортируем список по убыванию
-    sorted_list = sorted(result_list, key=lambda x: x["amount"], reverse=True)
-
-    # Формируем итоговый словарь
-    result = {
-        "income": {
-            "total_amount": round(sum_amount),  # общая сумма расходов (положительная)
-            "main": sorted_list,  # топ-7 категорий + «Остальное»
-        }
-    }
-
-    return result
+    # Формируем итоговый словарь: общая сумма поступлений и категории по убыванию
+    return {"income": dict_sections["income"]}
 
 
 def get_user_settings(file_path: str) -> Dict:
@@ -418,12 +1075,48 @@ def get_user_settings(file_path: str) -> Dict:
     return data
 
 
-def get_currency_rates(dict_user: Dict) -> List[Dict]:
+def run_concurrently(
+    tasks: Dict[Any, Callable[[], Any]], max_workers: int = API_MAX_WORKERS, deadline: float = API_DEADLINE
+) -> Dict[Any, Any]:
+    """
+    Выполняет задачи (обычно запросы к внешним API) параллельно в пуле потоков с общим ограничением времени.
+
+    :param tasks: словарь {ключ: функция без аргументов}
+    :param max_workers: максимальное количество одновременно выполняемых задач
+    :param deadline: общее время ожидания всех задач в секундах
+    :return: словарь {ключ: результат} только для задач, успешно завершившихся до истечения deadline.
+        Ошибки и превышение времени записываются в лог, результаты остальных задач сохраняются.
+    """
+    results: Dict[Any, Any] = {}
+    if not tasks:
+        return results
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tasks))))
+    # Каждая задача выполняется в копии контекста вызывающего потока (текущий этап трассировки)
+    futures = {executor.submit(contextvars.copy_context().run, func): key for key, func in tasks.items()}
+    done, not_done = wait(futures, timeout=deadline)
+
+    for future in done:
+        key = futures[future]
+        try:
+            results[key] = future.result()
+        except Exception as e:
+            logger.error(f"Ошибка при выполнении задачи {key}: {e}")
+    for future in not_done:
+        logger.error(f"Превышено время ожидания ({deadline} с) для задачи {futures[future]}")
+
+    # Не ждём зависшие задачи: они завершатся по таймауту HTTP-запроса
+    executor.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+def get_currency_rates(dict_user: Dict, deadline: float = API_DEADLINE) -> List[Dict]:
     """
-    Функция получает курсы валют.
+    Функция получает курсы валют (запросы по всем валютам выполняются параллельно).
 
     :param dict_user: словарь с настройками пользователя, должен содержать:
         - "user_currencies": список валют (например, ["USD", "EUR"])
+    :param deadline: общее время ожидания курсов в секундах
     :return: список словарей с полями 'currency' и 'rate'
     """
     stock_data: list[dict[str, Any]] = []  # Результат: данные по валютам
@@ -434,25 +1127,106 @@ def get_currency_rates(dict_user: Dict) -> List[Dict]:
         logger.error("Ошибка: список валют 'user_currencies' не указан в настройках.")
         return stock_data
 
-    # Получение курсов для каждой валюты
+    # Получение курсов для каждой валюты (валюты с ошибкой пропускаются)
+    expires_at = time.monotonic() + deadline
+    dict_rates = run_concurrently(
+        {currency: partial(get_exchange_rate, currency, expires_at=expires_at) for currency in currencies},
+        deadline=deadline,
+    )
     for currency in currencies:
-        try:
-            exchange_rate = get_exchange_rate(currency)
-            stock_data.append({"currency": currency, "rate": exchange_rate})
-        except Exception as e:
-            logger.error(f"Ошибка при получении курса для {currency}: {e}")
-            continue  # Продолжаем обработку остальных валют
+        if currency in dict_rates:
+            stock_data.append({"currency": currency, "rate": dict_rates[currency]})
 
     return stock_data
 
 
-def get_stock_price_sp_500(dict_user: dict) -> List[Dict]:
+def get_stock_quote(symbol: str, api_key: str, expires_at: Optional[float] = None) -> Optional[float]:
+    """
+    Получает через API FMP текущую цену акции в долларах.
+
+    :param symbol: тикер акции (например, "AAPL")
+    :param api_key: ключ API FMP
+    :param expires_at: срок ожидания ответа API по time.monotonic() (None — таймауты API_TIMEOUTS)
+    :return: цена в USD или None, если цену получить не удалось
+    """
+    params = {"symbol": symbol, "apikey": api_key}
+
+    try:
+        response = http_get("sp_500", URL_EXCHANGE_SP_500, params=params, expires_at=expires_at)
+
+        # Логируем URL для отладки
+        # logger.info(f"Запрос к API: {response.url}")
+
+        # Проверка HTTP‑статуса
+        if response.status_code == 200:
+            data = response.json()
+
+            # FMP возвращает список объектов (даже для одного тикера)
+            if isinstance(data, list) and len(data) > 0:
+                quote = data[0]  # Первый элемент списка — данные по акции
+                try:
+                    return float(quote["price"])
+                except (KeyError, ValueError, TypeError) as e:
+                    logger.error(f"Ошибка извлечения цены для {symbol}: {e}")
+            else:
+                logger.warning("Данные по акции %s не найдены в ответе API.", symbol)
+        else:
+            error_msg = f"HTTP {response.status_code}: {response.text}"
+            logger.error(f"HTTP‑ошибка для {symbol}: {error_msg}")
+
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Ошибка запроса для {symbol}: {e}")
+    except Exception as e:
+        logger.critical(f"Неожиданная ошибка для {symbol}: {e}")
+
+    return None
+
+
+def get_stock_quotes_batch(symbols: List[str], api_key: str, expires_at: Optional[float] = None) -> Dict[str, float]:
+    """
+    Получает через API FMP текущие цены нескольких акций одним запросом (quote-short).
+
+    :param symbols: список тикеров (например, ["AAPL", "MSFT"])
+    :param api_key: ключ API FMP
+    :param expires_at: срок ожидания ответа API по time.monotonic() (None — таймауты API_TIMEOUTS)
+    :return: словарь {тикер: цена в USD}; пустой словарь, если запрос не удался
+    """
+    try:
+        response = http_get(
+            "sp_500",
+            f"{URL_EXCHANGE_SP_500_BATCH}{','.join(symbols)}",
+            params={"apikey": api_key},
+            expires_at=expires_at,
+        )
+        if response.status_code != 200:
+            logger.error(f"HTTP‑ошибка пакетного запроса котировок: HTTP {response.status_code}: {response.text}")
+            return {}
+
+        data = response.json()
+        if not isinstance(data, list):
+            logger.error(f"Неожиданный ответ пакетного запроса котировок: {data}")
+            return {}
+        return {str(quote["symbol"]).upper(): float(quote["price"]) for quote in data if quote.get("symbol")}
+
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Ошибка пакетного запроса котировок: {e}")
+    except Exception as e:
+        logger.error(f"Ошибка разбора пакетного ответа котировок: {e}")
+    return {}
+
+
+def get_stock_price_sp_500(dict_user: dict, deadline: float = API_DEADLINE) -> List[Dict]:
     """
     Функция получает через API FMP текущие цены указанных акций.
     Возвращает только тикер (stock) и цену (price).
+    Котировки запрашиваются одним пакетным запросом параллельно с курсом доллара;
+    тикеры, которых нет в пакетном ответе, запрашиваются по одному (тоже параллельно).
+    Оба этапа укладываются в общий срок deadline: запасному этапу достаётся оставшееся время,
+    котировки, полученные до истечения срока, возвращаются.
 
     :param dict_user: словарь с настройками пользователя, должен содержать:
         - "user_stocks": список тикеров акций (например, ["AAPL", "MSFT"])
+    :param deadline: общее время ожидания котировок в секундах
     :return: список словарей с полями 'stock' и 'price'
     """
     stock_data: list[dict[str, Any]] = []  # Результат: данные по акциям
@@ -469,67 +1243,73 @@ def get_stock_price_sp_500(dict_user: dict) -> List[Dict]:
         logger.error("Ошибка: список акций 'user_stocks' не указан в настройках.")
         return stock_data
 
-    for stock in stocks:
-        # Нормализуем тикер
-        symbol = stock.strip().upper()
-
-        params = {"symbol": symbol, "apikey": api_key}
-
-        try:
-            response = requests.get(URL_EXCHANGE_SP_500, params=params, timeout=10)
-
-            # Логируем URL для отладки
-            # logger.info(f"Запрос к API: {response.url}")
+    # Нормализуем тикеры
+    symbols = [stock.strip().upper() for stock in stocks]
+
+    expires_at = time.monotonic() + deadline
+    results = run_concurrently(
+        {
+            "quotes": partial(get_stock_quotes_batch, symbols, api_key, expires_at=expires_at),
+            "rate": partial(get_exchange_rate, "USD", expires_at=expires_at),
+        },
+        deadline=deadline,
+    )
+    dict_prices: Dict[str, float] = results.get("quotes", {})
+    exchange_rate = results.get("rate", 0)
+
+    # Запасной вариант: запрос по одному тикеру для тех, что не вернул пакетный запрос
+    missing_symbols = [symbol for symbol in symbols if symbol not in dict_prices]
+    remaining = expires_at - time.monotonic()
+    if missing_symbols and remaining <= 0:
+        logger.warning("Истекло время ожидания, котировки %s не запрашиваются", missing_symbols)
+    elif missing_symbols:
+        logger.warning("Пакетный запрос не вернул котировки %s, запрашиваем по одной", missing_symbols)
+        dict_single = run_concurrently(
+            {symbol: partial(get_stock_quote, symbol, api_key, expires_at=expires_at) for symbol in missing_symbols},
+            deadline=remaining,
+        )
+        dict_prices.update({symbol: price for symbol, price in dict_single.items() if price is not None})
 
-            # Проверка HTTP‑статуса
-            if response.status_code == 200:
-                data = response.json()
-
-                # FMP возвращает список объектов (даже для одного тикера)
-                if isinstance(data, list) and len(data) > 0:
-                    quote = data[0]  # Первый элемент списка — данные по акции
-                    try:
-                        exchange_rate = get_exchange_rate("USD")
-                        price_from = quote["price"]
-                        price = round(float(price_from * exchange_rate))
-                        stock_data.append(
-                            {
-                                "stock": symbol,
-                                # 'price_from': price_from,
-                                # 'exchange_rate': exchange_rate,
-                                "price": price,
-                            }
-                        )
-                        logger.info(f"Акция {symbol}: цена {price}")
-                    except (KeyError, ValueError) as e:
-                        logger.error(f"Ошибка извлечения цены для {symbol}: {e}")
-                else:
-                    logger.warning(f"Данные по акции {symbol} не найдены в ответе API.")
-            else:
-                error_msg = f"HTTP {response.status_code}: {response.text}"
-                logger.error(f"HTTP‑ошибка для {symbol}: {error_msg}")
+    # Пересчёт в рубли одной операцией для всех акций
+    prices_usd = pd.Series({symbol: dict_prices[symbol] for symbol in symbols if symbol in dict_prices}, dtype=float)
+    prices_rub = (prices_usd * exchange_rate).round()
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Ошибка запроса для {symbol}: {e}")
-        except Exception as e:
-            logger.critical(f"Неожиданная ошибка для {symbol}: {e}")
+    for symbol, price in prices_rub.items():
+        stock_data.append({"stock": symbol, "price": int(price)})
+        logger.info("Акция %s: цена %s", symbol, int(price))
 
     return stock_data
 
 
-def write_json(dict_wr: Union[Dict[str, Any], List[Dict[Any, Any]]], name_file: str = "answer.json") -> None:
+def write_json(
+    dict_wr: Union[Dict[str, Any], List[Dict[Any, Any]]],
+    name_file: str = "answer.json",
+    serializer: Optional[str] = None,
+) -> None:
     """
     Выводит в JSON‑файл все полученные данные по разделам.
 
+    Файл записывается целиком через временный файл. Если включена фоновая запись
+    (start_output_writer), данные только ставятся в очередь, а повторные записи в тот же файл
+    объединяются.
+
     :param dict_wr: словарь с данными для записи. Ключи должны быть строками.
+    :param name_file: имя файла в каталоге данных
+    :param serializer: формат записи ("pretty", "compact", "orjson"), по умолчанию — OUTPUT_SERIALIZER
     :return: None
     """
     file_path = os.path.join(DATA_DIR, name_file)
 
     try:
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(dict_wr, f, ensure_ascii=False, indent=4)
-        logger.info(f"Данные успешно записаны в {file_path}")
+        # данные сериализуются сразу: последующие изменения словаря не попадут в файл
+        payload = serialize(dict_wr, serializer)
+        writer = get_output_writer()
+        if writer is not None:
+            writer.submit(file_path, payload)
+            logger.info("Данные поставлены в очередь на запись в %s", file_path)
+        else:
+            write_file_atomic(file_path, payload)
+            logger.info("Данные успешно записаны в %s", file_path)
     except (IOError, OSError) as e:
         logger.error(f"Ошибка при записи файла {file_path}: {e}")
         raise
@@ -538,3 +1318,29 @@ def write_json(dict_wr: Union[Dict[str, Any], List[Dict[Any, Any]]], name_file:
         raise
 
     return None
+
+
+def write_json_lines(records: Iterable[Dict[str, Any]], name_file: str = "answers.jsonl") -> int:
+    """
+    Записывает записи в файл формата JSON Lines (одна запись — одна строка) по мере их получения.
+
+    :param records: записи (итерируемый объект, например генератор)
+    :param name_file: имя файла в каталоге данных
+    :return: количество записанных записей
+    """
+    file_path = os.path.join(DATA_DIR, name_file)
+    count = 0
+    try:
+        with open(file_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+        logger.info("Записано %s записей в %s", count, file_path)
+    except (IOError, OSError) as e:
+        logger.error(f"Ошибка при записи файла {file_path}: {e}")
+        raise
+    except TypeError as e:
+        logger.error(f"Неподдерживаемый тип данных в записи: {e}")
+        raise
+
+    return count
@@ -1,26 +1,41 @@
 import os.path
+from functools import partial
+from typing import Iterator, List, Optional, Tuple
 
 import pandas as pd
 from pandas import DataFrame
 
 from src import app_logger
-from src.config import DATA_DIR
+from src.aggregates import AGGREGATE_VALUES, PrefixSumIndex, build_daily_aggregates, get_period_aggregates
+from src.config import API_DEADLINE, COUNT_COLUMN, DATA_DIR, LIST_OPERATION
+from src.tracing import annotate_span, traced
 from src.utils import (
     conversion_to_single_currency,
     filter_by_date,
     get_currency_rates,
-    get_data_from_expensess,
-    get_data_from_income,
+    get_data_by_categories,
     get_period_operation,
     get_stock_price_sp_500,
     get_user_settings,
+    log_rate_cache_stats,
+    run_concurrently,
+    slice_by_period,
     write_json,
+    write_json_lines,
 )
 
 logger = app_logger.get_logger("views.log")
 
 
-def events_operations(df: DataFrame, str_date: str, range_data: str = "M") -> dict:
+@traced()
+def events_operations(
+    df: DataFrame,
+    str_date: str,
+    range_data: str = "M",
+    rate_history: Optional[DataFrame] = None,
+    aggregates: Optional[DataFrame] = None,
+    prefix_index: Optional[PrefixSumIndex] = None,
+) -> dict:
     """Реализует набор функций и главную функцию, принимающую на вход строку с датой и второй необязательный параметр
     — диапазон данных.
     @param str_date: дата в строков виде
@@ -31,7 +46,12 @@ def events_operations(df: DataFrame, str_date: str, range_data: str = "M") -> di
         M - месяц, на который приходится дата;
         Y - год, на который приходится дата;
         ALL - все данные до указанной даты.
-    @param range_data:
+    @param rate_history: исторические курсы валют (см. load_rate_history) — суммы пересчитываются
+        по курсу на дату платежа; по умолчанию — по текущему курсу
+    @param aggregates: дневные агрегаты операций (см. build_daily_aggregates) — разделы «Расходы»
+        и «Поступления» считаются по ним, без прохода по всем операциям
+    @param prefix_index: индекс нарастающих итогов (см. get_prefix_sum_index) — итоги за период
+        получаются вычитанием двух строк индекса (используется, если не заданы исторические курсы)
     return: JSON-ответ, который содержит следующие данные:
         «Расходы»:
             Общая сумма расходов.
@@ -59,36 +79,34 @@ def events_operations(df: DataFrame, str_date: str, range_data: str = "M") -> di
     # # Обработка полученных данных
     # фильтрация данных по периоду
     list_period = get_period_operation(str_date, range_data)
-    result_df_p = filter_by_date(df, list_period)
+    if prefix_index is not None and rate_history is None:
+        result_df_p = prefix_index.get_period_aggregates(list_period[0], list_period[1])
+    elif aggregates is None:
+        result_df_p = filter_by_date(df, list_period)
+    elif rate_history is None:
+        # по текущему курсу достаточно свернуть агрегаты за период до категорий и валют
+        result_df_p = get_period_aggregates(aggregates, list_period[0], list_period[1])
+    else:
+        # для пересчёта по курсу на дату платежа нужны агрегаты по дням
+        result_df_p = slice_by_period(aggregates, list_period[0], list_period[1])
+    annotate_span(rows_out=len(result_df_p))
 
     # получаем сумму платежа в рублях
-    result_df = conversion_to_single_currency(result_df_p, "RUB")
+    result_df = conversion_to_single_currency(result_df_p, "RUB", rate_history=rate_history)
     if result_df is None:
         logger.error("Не удачная попытка конвертации суммы платежа в RUB")
         return None
 
-    # формирование раздела «Расходы»:
-    result_dict = get_data_from_expensess(result_df)
-
-    # раздел «Поступления»:
-    # из df получаем сумму поступлений по категориям и общую
-    result_dict["income"] = get_data_from_income(result_df)
+    # разделы «Расходы» и «Поступления» формируются за один проход по данным
+    dict_sections = get_data_by_categories(result_df)
+    result_dict = {"expenses": dict_sections["expenses"]} if dict_sections else {}
+    result_dict["income"] = {"income": dict_sections["income"]} if dict_sections else {}
 
     #######
-    dict_settings = get_user_settings(os.path.join(DATA_DIR, "user_settings.json"))
-
-    if dict_settings == {}:
-        logger.error("Файл с настройками для пользователя пуст или не существует (подробнее в файле utils.log)")
-    else:
-        # раздел «Курс валют»:
-        list_receipt = get_currency_rates(dict_settings)
-        result_dict["currency_rates"] = list_receipt
-
-        # раздел «Стоимость акций из S&P 500>>
-        list_receipt = get_stock_price_sp_500(dict_settings)
-        result_dict["stock_prices"] = list_receipt
+    # разделы «Курс валют» и «Стоимость акций из S&P 500» на текущую дату
+    result_dict.update(get_market_data())
 
-    # получаем через api данные акций (указанных в list_settings) на дату текущую
+    log_rate_cache_stats()
 
     #######
     # выводим в json файл все полученные данные по разделам
@@ -98,3 +116,102 @@ def events_operations(df: DataFrame, str_date: str, range_data: str = "M") -> di
     print("Завершение работы функции - получен файл answer.json")
     logger.info("Завершение работы функции - получен answer.json")
     return result_dict
+
+
+def get_market_data() -> dict:
+    """
+    Формирует разделы «Курс валют» и «Стоимость акций из S&P 500» по настройкам пользователя.
+
+    :return: словарь с ключами currency_rates и stock_prices; пустой словарь, если настроек нет
+    """
+    dict_settings = get_user_settings(os.path.join(DATA_DIR, "user_settings.json"))
+
+    if dict_settings == {}:
+        logger.error("Файл с настройками для пользователя пуст или не существует (подробнее в файле utils.log)")
+        return {}
+
+    # разделы запрашиваются параллельно; каждый раздел укладывается в API_DEADLINE (все этапы вместе),
+    # общее ожидание чуть больше, чтобы получить и частичные результаты разделов
+    dict_market = run_concurrently(
+        {
+            "currency_rates": partial(get_currency_rates, dict_settings, deadline=API_DEADLINE),
+            "stock_prices": partial(get_stock_price_sp_500, dict_settings, deadline=API_DEADLINE),
+        },
+        deadline=API_DEADLINE + 1,
+    )
+    return {
+        "currency_rates": dict_market.get("currency_rates", []),
+        "stock_prices": dict_market.get("stock_prices", []),
+    }
+
+
+def iter_events_operations(
+    df: DataFrame, list_requests: List[Tuple[str, str]], prefix_index: Optional[PrefixSumIndex] = None
+) -> Iterator[dict]:
+    """
+    Формирует ответы страницы «События» сразу для нескольких пар (дата, диапазон).
+
+    Общее для всех ответов считается один раз: индекс нарастающих итогов по операциям, курсы валют
+    (по одному пересчёту на ключ агрегата), настройки пользователя, курсы и котировки на текущую дату.
+    Итоги за все периоды получаются одной векторной операцией над индексом. Суммы пересчитываются
+    по текущему курсу; при равных суммах порядок категорий может отличаться от events_operations.
+
+    :param df: DataFrame с операциями
+    :param list_requests: список пар (дата в формате ДД.ММ.ГГГГ, диапазон W/M/Y/ALL)
+    :param prefix_index: готовый индекс нарастающих итогов (по умолчанию строится по df)
+    :return: генератор словарей {"date", "range", разделы ответа events_operations}
+    """
+    if df is None or not isinstance(df, pd.DataFrame):
+        logger.error("df должен быть pandas.DataFrame")
+        return
+
+    logger.info("Пакетное формирование раздела События: %s запросов", len(list_requests))
+    if prefix_index is None:
+        prefix_index = PrefixSumIndex.from_aggregates(build_daily_aggregates(df))
+
+    # курс к рублю для каждого ключа индекса (валюты без курса сохраняют исходную сумму)
+    amount_col = str(LIST_OPERATION[3])
+    rates_df = conversion_to_single_currency(prefix_index.keys.assign(**{amount_col: 1.0}), "RUB")
+    rates = rates_df[f"{amount_col}_RUB"].to_numpy(dtype=float)
+
+    list_periods = [get_period_operation(str_date, range_data) for str_date, range_data in list_requests]
+    totals = prefix_index.get_periods_totals(list_periods)
+    amounts_rub = totals[AGGREGATE_VALUES.index(amount_col)] * rates
+    counts = totals[AGGREGATE_VALUES.index(COUNT_COLUMN)]
+
+    dict_market = get_market_data()
+    for position, (str_date, range_data) in enumerate(list_requests):
+        has_operations = counts[position] > 0.5
+        period_df = prefix_index.keys.loc[has_operations].assign(
+            **{f"{amount_col}_RUB": amounts_rub[position, has_operations]}
+        )
+        dict_sections = get_data_by_categories(period_df)
+        yield {
+            "date": str_date,
+            "range": range_data,
+            "expenses": dict_sections["expenses"],
+            "income": {"income": dict_sections["income"]},
+            **dict_market,
+        }
+
+
+def events_operations_batch(
+    df: DataFrame,
+    list_requests: List[Tuple[str, str]],
+    name_file: str = "answers.jsonl",
+    prefix_index: Optional[PrefixSumIndex] = None,
+) -> int:
+    """
+    Формирует ответы страницы «События» для нескольких пар (дата, диапазон) и записывает их
+    в файл JSON Lines по мере формирования (см. iter_events_operations).
+
+    :param df: DataFrame с операциями
+    :param list_requests: список пар (дата в формате ДД.ММ.ГГГГ, диапазон W/M/Y/ALL)
+    :param name_file: имя файла JSON Lines в каталоге данных
+    :param prefix_index: готовый индекс нарастающих итогов (по умолчанию строится по df)
+    :return: количество записанных ответов
+    """
+    count = write_json_lines(iter_events_operations(df, list_requests, prefix_index), name_file)
+    log_rate_cache_stats()
+    logger.info("Завершение пакетного формирования раздела События - получен %s", name_file)
+    return count
@@ -0,0 +1,260 @@
+import atexit
+import importlib.util
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from pandas import DataFrame
+
+from src import app_logger
+from src.config import OUTPUT_SERIALIZER
+
+# Настройка логирования
+logger = app_logger.get_logger("writer.log")
+
+# orjson используется только при установленном пакете
+ORJSON_AVAILABLE = importlib.util.find_spec("orjson") is not None
+
+
+def serialize_pretty(data: Any) -> bytes:
+    """
+    JSON с отступами (прежний формат файлов с результатами).
+
+    :param data: данные для записи
+    :return: данные в кодировке UTF-8
+    """
+    return json.dumps(data, ensure_ascii=False, indent=4).encode("utf-8")
+
+
+def serialize_compact(data: Any) -> bytes:
+    """
+    JSON без отступов и пробелов-разделителей.
+
+    :param data: данные для записи
+    :return: данные в кодировке UTF-8
+    """
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def serialize_orjson(data: Any) -> bytes:
+    """
+    Компактный JSON, закодированный пакетом orjson (numpy-значения сериализуются напрямую).
+
+    :param data: данные для записи
+    :return: данные в кодировке UTF-8
+    """
+    import orjson
+
+    result: bytes = orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY)
+    return result
+
+
+# Доступные форматы записи: имя → функция сериализации
+SERIALIZERS: Dict[str, Callable[[Any], bytes]] = {"pretty": serialize_pretty, "compact": serialize_compact}
+if ORJSON_AVAILABLE:
+    SERIALIZERS["orjson"] = serialize_orjson
+
+
+def register_serializer(name: str, serializer: Callable[[Any], bytes]) -> None:
+    """
+    Добавляет формат записи.
+
+    :param name: имя формата
+    :param serializer: функция, преобразующая данные в байты
+    :return: None
+    """
+    SERIALIZERS[name] = serializer
+
+
+def serialize(data: Any, serializer: Optional[str] = None) -> bytes:
+    """
+    Преобразует данные в байты выбранным форматом (по умолчанию — OUTPUT_SERIALIZER).
+    Если формат недоступен (например, не установлен orjson), используется компактный JSON.
+
+    :param data: данные для записи
+    :param serializer: имя формата
+    :return: данные в байтах
+    """
+    name = serializer or OUTPUT_SERIALIZER
+    if name not in SERIALIZERS:
+        logger.warning("Формат записи '%s' недоступен, используется 'compact'", name)
+        name = "compact"
+    return SERIALIZERS[name](data)
+
+
+def write_file_atomic(file_path: str, payload: bytes) -> None:
+    """
+    Записывает файл целиком через временный файл и переименование:
+    читатель видит либо прежнее, либо новое содержимое, но не частично записанное.
+
+    :param file_path: путь к файлу
+    :param payload: содержимое файла
+    :return: None
+    """
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class OutputWriter:
+    """
+    Фоновая запись файлов с результатами: запись выполняется отдельным потоком,
+    повторные записи в один и тот же файл до его сохранения объединяются — записывается последняя.
+    """
+
+    def __init__(self) -> None:
+        self.written = 0
+        self.coalesced = 0
+        self.errors = 0
+        self._pending: "OrderedDict[str, bytes]" = OrderedDict()
+        self._in_progress = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="output-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, file_path: str, payload: bytes) -> None:
+        """
+        Ставит файл в очередь на запись (заменяет ещё не записанное содержимое этого файла).
+
+        :param file_path: путь к файлу
+        :param payload: содержимое файла
+        :return: None
+        """
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Фоновая запись файлов остановлена")
+            if file_path in self._pending:
+                self.coalesced += 1
+            self._pending[file_path] = payload
+            self._condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Ожидает записи всех файлов из очереди.
+
+        :param timeout: максимальное время ожидания в секундах (None — без ограничения)
+        :return: True, если очередь пуста
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending and not self._in_progress, timeout)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Записывает оставшиеся файлы и останавливает поток записи.
+
+        :param timeout: максимальное время ожидания в секундах
+        :return: None
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        logger.info("Фоновая запись остановлена: записано %s, объединено %s", self.written, self.coalesced)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                file_path, payload = self._pending.popitem(last=False)
+                self._in_progress += 1
+            try:
+                write_file_atomic(file_path, payload)
+                self.written += 1
+                logger.info("Данные успешно записаны в %s", file_path)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Ошибка при записи файла {file_path}: {e}")
+            finally:
+                with self._condition:
+                    self._in_progress -= 1
+                    self._condition.notify_all()
+
+
+output_writer: Optional[OutputWriter] = None
+writer_lock = threading.Lock()
+# дописывание в файлы JSON Lines из нескольких потоков не должно перемешивать блоки
+append_lock = threading.Lock()
+
+
+def start_output_writer() -> OutputWriter:
+    """
+    Включает фоновую запись файлов с результатами (write_json перестаёт ждать записи на диск).
+    Оставшиеся файлы записываются при завершении программы.
+
+    :return: OutputWriter
+    """
+    global output_writer
+    with writer_lock:
+        if output_writer is None:
+            output_writer = OutputWriter()
+            atexit.register(stop_output_writer)
+        return output_writer
+
+
+def get_output_writer() -> Optional[OutputWriter]:
+    """
+    Возвращает запущенный фоновый писатель.
+
+    :return: OutputWriter или None, если фоновая запись не включена
+    """
+    return output_writer
+
+
+def stop_output_writer() -> None:
+    """
+    Записывает оставшиеся файлы и выключает фоновую запись.
+
+    :return: None
+    """
+    global output_writer
+    with writer_lock:
+        writer, output_writer = output_writer, None
+    if writer is not None:
+        writer.close()
+        atexit.unregister(stop_output_writer)
+
+
+def append_json_lines(file_path: str, df: DataFrame, metadata: Dict[str, Any], chunk_size: int) -> int:
+    """
+    Дописывает строки DataFrame в файл JSON Lines блоками по chunk_size строк
+    (без преобразования всего DataFrame в список словарей). К каждой записи добавляются поля metadata.
+
+    :param file_path: путь к файлу
+    :param df: DataFrame с записями
+    :param metadata: поля, одинаковые для всех записей (например, сведения о запуске)
+    :param chunk_size: количество строк в блоке
+    :return: количество записанных строк
+    """
+    with append_lock, open(file_path, "a", encoding="utf-8") as f:
+        for start in range(0, len(df), chunk_size):
+            chunk = df.iloc[start : start + chunk_size].assign(**metadata)
+            f.write(chunk.to_json(orient="records", lines=True, force_ascii=False, date_format="iso"))
+    return len(df)
+
+
+def write_parquet_part(dir_path: str, df: DataFrame, metadata: Dict[str, Any]) -> str:
+    """
+    Записывает DataFrame новым файлом parquet в каталог набора данных (прежние файлы не изменяются).
+    К каждой строке добавляются поля metadata.
+
+    :param dir_path: каталог набора данных
+    :param df: DataFrame с записями
+    :param metadata: поля, одинаковые для всех записей; metadata["run_id"] входит в имя файла
+    :return: путь к записанному файлу
+    """
+    os.makedirs(dir_path, exist_ok=True)
+    file_path = os.path.join(dir_path, f"part-{metadata['run_id']}.parquet")
+    tmp_path = f"{file_path}.tmp"
+    df.assign(**metadata).to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, file_path)
+    return file_path
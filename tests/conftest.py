@@ -1,6 +1,35 @@
 import pandas as pd
 import pytest
 
+from src.reports import clear_report_caches
+from src.utils import close_http_session, rate_cache
+from tests.stub_server import StubApiServer
+
+
+@pytest.fixture(autouse=True)
+def reset_api_state():
+    """Фикстура: каждый тест начинается с пустых кэшей курсов валют и отчётов и новой HTTP-сессии."""
+    rate_cache.clear()
+    clear_report_caches()
+    close_http_session()
+    yield
+    rate_cache.clear()
+    clear_report_caches()
+    close_http_session()
+
+
+@pytest.fixture
+def stub_api(monkeypatch):
+    """Фикстура: локальный сервер-заглушка вместо API курсов валют и котировок акций."""
+    server = StubApiServer().start()
+    monkeypatch.setattr("src.utils.URL_EXCHANGE", f"{server.url}/v6/")
+    monkeypatch.setattr("src.utils.URL_EXCHANGE_SP_500", f"{server.url}/stable/stock-peers?")
+    monkeypatch.setattr("src.utils.URL_EXCHANGE_SP_500_BATCH", f"{server.url}/api/v3/quote-short/")
+    monkeypatch.setenv("API_KEY", "test")
+    monkeypatch.setenv("API_KEY_SP_500", "test")
+    yield server
+    server.stop()
+
 
 @pytest.fixture(scope="module")
 def test_transactions():
@@ -0,0 +1,94 @@
+"""Локальный HTTP-сервер-заглушка для API курсов валют и котировок акций (тесты и замеры без сети)."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Курсы валют к рублю и цены акций в долларах, которые отдаёт заглушка
+STUB_RATES = {"USD": 80.0, "EUR": 90.0, "CNY": 11.0}
+STUB_PRICES = {"AAPL": 200.0, "AMZN": 180.0, "GOOGL": 150.0, "MSFT": 400.0, "TSLA": 250.0}
+
+
+class StubApiHandler(BaseHTTPRequestHandler):
+    """
+    Обработчик запросов: /v6/<key>/pair/<из>/<в>, /v6/<key>/history/<в>/<год>/<месяц>/<день>,
+    /stable/stock-peers?symbol=..., /quote-short/<тикеры>.
+    """
+
+    protocol_version = "HTTP/1.1"  # keep-alive, чтобы проверять переиспользование соединений
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        with self.server.lock:
+            self.server.requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        if self.server.fail_status:
+            self.send_json({"error": "stub failure"}, self.server.fail_status)
+        elif "quote-short" in parts and self.server.batch_status:
+            self.send_json({"error": "batch unavailable"}, self.server.batch_status)
+        elif "pair" in parts:
+            currency = parts[parts.index("pair") + 1]
+            self.send_json({"result": "success", "conversion_rate": STUB_RATES.get(currency, 1.0)})
+        elif "history" in parts:
+            # курсы на дату: сколько единиц валюты дают за единицу целевой (RUB)
+            self.send_json({"result": "success", "conversion_rates": {c: 1 / r for c, r in STUB_RATES.items()}})
+        elif "quote-short" in parts:
+            symbols = parts[parts.index("quote-short") + 1].split(",")
+            self.send_json([{"symbol": s, "price": STUB_PRICES[s]} for s in symbols if s in STUB_PRICES])
+        elif parts[-1] == "stock-peers":
+            symbol = parse_qs(url.query).get("symbol", [""])[0]
+            self.send_json([{"symbol": symbol, "price": STUB_PRICES[symbol]}] if symbol in STUB_PRICES else [])
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def send_json(self, data, status: int = 200) -> None:
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubApiServer(ThreadingHTTPServer):
+    """Сервер-заглушка со счётчиками соединений и запросов."""
+
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.0) -> None:
+        super().__init__(("127.0.0.1", 0), StubApiHandler)
+        self.latency = latency
+        self.fail_status = 0
+        self.batch_status = 0
+        self.connections = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+
+    def handle_error(self, request, client_address) -> None:
+        pass  # клиент мог закрыть соединение по таймауту
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "StubApiServer":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
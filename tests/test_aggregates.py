@@ -0,0 +1,138 @@
+import os
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from src.aggregates import (
+    PrefixSumIndex,
+    append_daily_aggregates,
+    build_daily_aggregates,
+    get_period_aggregates,
+    get_prefix_sum_index,
+)
+from src.views import events_operations
+
+
+@pytest.fixture
+def operations():
+    return pd.DataFrame(
+        {
+            "Дата платежа": ["03.01.2021", "01.01.2021", "01.01.2021", "02.01.2021", "03.01.2021", "05.01.2021"],
+            "Категория": ["Еда", "Еда", "Еда", "Зарплата", None, "Еда"],
+            "Валюта платежа": ["RUB", "RUB", "USD", "RUB", "RUB", "RUB"],
+            "Сумма платежа": [-100.0, -50.0, -2.0, 1000.0, -30.0, 0.0],
+            "Кэшбэк": [1.0, None, 0.0, 0.0, 0.0, 0.0],
+        }
+    )
+
+
+def test_build_daily_aggregates(operations):
+    aggregates = build_daily_aggregates(operations)
+
+    # нулевая сумма не учитывается; операции без категории сохраняются
+    assert len(aggregates) == 5
+    assert aggregates.index.is_monotonic_increasing
+    first_day = aggregates.loc["2021-01-01"]
+    assert first_day["Сумма платежа"].tolist() == [-50.0, -2.0]
+    assert aggregates["количество"].sum() == 5
+    assert aggregates["Кэшбэк"].sum() == 1.0
+
+
+def test_append_daily_aggregates(operations):
+    expected = build_daily_aggregates(operations)
+    new_operations = pd.DataFrame(
+        {
+            "Дата платежа": ["01.01.2021", "10.01.2021"],
+            "Категория": ["Еда", "Еда"],
+            "Валюта платежа": ["RUB", "RUB"],
+            "Сумма платежа": [-5.0, -7.0],
+            "Кэшбэк": [0.0, 0.0],
+        }
+    )
+    result = append_daily_aggregates(expected, new_operations)
+    full = build_daily_aggregates(pd.concat([operations, new_operations]))
+
+    pd.testing.assert_frame_equal(result, full)
+    assert result.loc["2021-01-01", "количество"].tolist() == [2, 1]
+    # исходные агрегаты не изменяются
+    assert len(expected) == 5
+
+
+def test_get_period_aggregates(operations):
+    period = get_period_aggregates(build_daily_aggregates(operations), "2021-01-01", "2021-01-03")
+
+    assert len(period) == 3
+    assert period["Сумма платежа"].sum() == 948.0
+
+
+@patch("src.views.get_user_settings", return_value={})
+@patch("src.utils.get_exchange_rate", return_value=80.0)
+def test_events_operations_from_aggregates(mock_rate, mock_settings, operations):
+    expected = events_operations(operations, "04.01.2021", "M")
+    result = events_operations(operations, "04.01.2021", "M", aggregates=build_daily_aggregates(operations))
+
+    assert result == expected
+    assert result["expenses"]["total_amount"] == 340
+
+
+def sort_period(df):
+    return df.sort_values(["Категория", "Валюта платежа", "знак"], na_position="last").reset_index(drop=True)
+
+
+@pytest.mark.parametrize(
+    "data_from, data_to",
+    [
+        ("2021-01-01", "2021-01-03"),
+        ("2021-01-02", "2021-01-02"),
+        ("1800-01-01", "2030-01-01"),
+        ("2021-01-03", "2021-01-04"),
+    ],
+)
+def test_prefix_sum_index_matches_aggregates(operations, data_from, data_to):
+    aggregates = build_daily_aggregates(operations)
+    index = PrefixSumIndex.from_aggregates(aggregates)
+
+    expected = sort_period(get_period_aggregates(aggregates, data_from, data_to))
+    result = sort_period(index.get_period_aggregates(data_from, data_to))
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_prefix_sum_index_cache(tmp_path, operations):
+    path_file = str(tmp_path / "operations.xlsx")
+    operations.to_excel(path_file, index=False)
+
+    index = get_prefix_sum_index(path_file, operations, list(operations.columns))
+    with patch("src.aggregates.build_daily_aggregates") as mock_build:
+        cached = get_prefix_sum_index(path_file, operations, list(operations.columns))
+    mock_build.assert_not_called()
+    pd.testing.assert_frame_equal(
+        sort_period(cached.get_period_aggregates("2021-01-01", "2021-01-04")),
+        sort_period(index.get_period_aggregates("2021-01-01", "2021-01-04")),
+    )
+
+    # индекс по другому DataFrame из того же файла не берётся из кэша и не подменяет сохранённый
+    partial_index = get_prefix_sum_index(path_file, operations.iloc[:1], list(operations.columns))
+    assert partial_index.get_period_aggregates("1800-01-01", "2030-01-01")["количество"].sum() == 1
+    with patch("src.aggregates.build_daily_aggregates") as mock_build:
+        cached = get_prefix_sum_index(path_file, operations, list(operations.columns))
+    mock_build.assert_not_called()
+    pd.testing.assert_frame_equal(
+        sort_period(cached.get_period_aggregates("1800-01-01", "2030-01-01")),
+        sort_period(index.get_period_aggregates("1800-01-01", "2030-01-01")),
+    )
+
+    # при изменении исходного файла индекс пересобирается
+    operations.iloc[:2].to_excel(path_file, index=False)
+    os.utime(path_file, ns=(1, 1))
+    rebuilt = get_prefix_sum_index(path_file, operations.iloc[:2], list(operations.columns))
+    assert rebuilt.get_period_aggregates("1800-01-01", "2030-01-01")["количество"].sum() == 2
+
+
+@patch("src.views.get_user_settings", return_value={})
+@patch("src.utils.get_exchange_rate", return_value=80.0)
+def test_events_operations_from_prefix_index(mock_rate, mock_settings, operations):
+    index = PrefixSumIndex.from_aggregates(build_daily_aggregates(operations))
+    for range_data in ("W", "M", "ALL"):
+        expected = events_operations(operations, "04.01.2021", range_data)
+        assert events_operations(operations, "04.01.2021", range_data, prefix_index=index) == expected
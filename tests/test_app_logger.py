@@ -1,8 +1,17 @@
 import logging
 import os
+from logging.handlers import RotatingFileHandler
 from unittest.mock import patch
 
-from src.app_logger import get_file_handler, get_logger, get_stream_handler, s_log_format
+from src.app_logger import (
+    get_file_handler,
+    get_logger,
+    get_stream_handler,
+    queue_handler,
+    s_log_format,
+    start_log_listener,
+    stop_log_listener,
+)
 from src.config import PARENT_DIR
 
 path_file = os.path.join(PARENT_DIR, "tmp")
@@ -77,3 +86,41 @@ def test_file_handler_creation():
         assert os.path.exists(log_file)
     finally:
         handler.close()
+
+
+def test_log_listener_writes_in_background(tmp_path):
+    log_file = str(tmp_path / "queue_test.log")
+    logger = get_logger(log_file)
+    start_log_listener()
+    try:
+        assert queue_handler in logger.handlers
+        assert not any(isinstance(h, logging.FileHandler) for h in logger.handlers)
+        logger.info("Сообщение %s из очереди", 1)
+    finally:
+        stop_log_listener()
+
+    # после остановки записи из очереди записаны, логгеру возвращён файловый обработчик
+    with open(log_file, encoding="utf-8") as f:
+        assert "Сообщение 1 из очереди" in f.read()
+    assert queue_handler not in logger.handlers
+    assert any(isinstance(h, logging.FileHandler) for h in logger.handlers)
+
+
+def test_get_logger_configures_once(tmp_path):
+    log_file = str(tmp_path / "once.log")
+    logger = get_logger(log_file)
+    assert get_logger(log_file) is logger
+    assert len(logger.handlers) == 1
+    # обработчик одного файла общий для всех, кто его запрашивает
+    assert get_file_handler(log_file) is logger.handlers[0]
+
+
+def test_file_handler_rotation_by_size(tmp_path):
+    log_file = tmp_path / "logs" / "rotate.log"
+    with patch("src.app_logger.LOG_MAX_BYTES", 200), patch("src.app_logger.LOG_BACKUP_COUNT", 2):
+        logger = get_logger(str(log_file))
+    for i in range(20):
+        logger.info("Сообщение номер %s", i)
+
+    assert isinstance(logger.handlers[0], RotatingFileHandler)
+    assert sorted(p.name for p in log_file.parent.iterdir()) == ["rotate.log", "rotate.log.1", "rotate.log.2"]
@@ -0,0 +1,60 @@
+from unittest.mock import patch
+
+import pandas as pd
+
+from benchmarks.bench_pipeline import (
+    OPERATION_COLUMNS,
+    compare_results,
+    ensure_dataset,
+    generate_operations,
+    parse_size,
+    run_benchmarks,
+)
+from src.utils import get_list_operation
+
+
+def test_parse_size():
+    assert [parse_size(size) for size in ["10k", "1M", "10m", "1.5k", "500"]] == [
+        10_000,
+        1_000_000,
+        10_000_000,
+        1_500,
+        500,
+    ]
+
+
+def test_generated_file_matches_schema(tmp_path):
+    df = generate_operations(1000)
+    assert list(df.columns) == OPERATION_COLUMNS
+    assert (df["Сумма платежа"] < 0).any() and (df["Сумма платежа"] > 0).any()
+
+    # файл записывается блоками
+    with patch("benchmarks.bench_pipeline.GENERATE_CHUNK_SIZE", 300):
+        path_filename = ensure_dataset(1000, str(tmp_path))
+    assert len(pd.read_csv(path_filename)) == 1000
+
+    result = get_list_operation(path_filename, OPERATION_COLUMNS)
+    assert 0 < len(result) < 1000 and (result["Статус"] == "OK").all()
+    assert pd.api.types.is_datetime64_any_dtype(result["Дата платежа"])
+    assert pd.api.types.is_float_dtype(result["Сумма платежа"])
+
+
+def test_run_and_compare_benchmarks(tmp_path):
+    results = run_benchmarks(["400"], repeat=1, data_dir=str(tmp_path))
+
+    functions = results["sizes"]["400"]
+    assert set(functions) == {
+        "get_list_operation",
+        "get_list_operation_cached",
+        "filter_by_date",
+        "conversion_to_single_currency",
+        "get_data_from_expensess",
+        "get_profitable_cashback",
+        "spending_by_weekday",
+    }
+    assert all(len(result["times_s"]) == 1 for result in functions.values())
+
+    slower = {"sizes": {"400": {name: {"best_s": result["best_s"] * 2} for name, result in functions.items()}}}
+    comparison = compare_results(results, slower)
+    assert len(comparison) == len(functions)
+    assert all(row["regression"] and row["ratio"] == 2.0 for row in comparison if row["baseline_s"])
@@ -0,0 +1,170 @@
+import os
+import time
+from unittest.mock import patch
+
+import pandas as pd
+
+from src.cache import (
+    TTLCache,
+    file_hash_cache,
+    get_file_fingerprint,
+    get_file_hash,
+    get_frame_fingerprint,
+    get_params_key,
+    load_frame_cache,
+    save_frame_cache,
+)
+
+PARAMS = {"columns": ["Название"], "filter_str": "OK"}
+
+
+def write_source(path_file, text):
+    with open(path_file, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_get_file_fingerprint(tmp_path):
+    path_file = str(tmp_path / "data.csv")
+    write_source(path_file, "a,b\n1,2\n")
+    fingerprint = get_file_fingerprint(path_file)
+    assert fingerprint["size"] == 8
+    assert len(fingerprint["sha256"]) == 64
+    assert get_file_fingerprint(path_file, with_hash=False)["sha256"] is None
+
+
+def test_get_file_hash_memoized(tmp_path):
+    path_file = str(tmp_path / "data.csv")
+    write_source(path_file, "a,b\n1,2\n")
+    file_hash_cache.clear()
+
+    first_hash = get_file_hash(path_file)
+    # кэши нескольких частей одного файла не читают его заново
+    for number in range(3):
+        load_frame_cache(path_file, {**PARAMS, "part": number})
+    assert (file_hash_cache.stats()["misses"], file_hash_cache.stats()["hits"]) == (1, 3)
+
+    # изменённый файл хэшируется заново
+    write_source(path_file, "a,b\n1,3\n")
+    os.utime(path_file, ns=(time.time_ns(), time.time_ns() + 10**9))
+    assert get_file_hash(path_file) != first_hash
+    assert file_hash_cache.stats()["misses"] == 2
+
+
+def test_get_params_key_stable():
+    assert get_params_key({"a": 1, "b": 2}) == get_params_key({"b": 2, "a": 1})
+    assert get_params_key({"a": 1}) != get_params_key({"a": 2})
+
+
+def test_load_frame_cache_miss_and_hit(tmp_path):
+    path_file = str(tmp_path / "data.csv")
+    write_source(path_file, "a\n1\n")
+    df = pd.DataFrame({"Название": ["А", "Б"]})
+
+    cached_df, fingerprint = load_frame_cache(path_file, PARAMS)
+    assert cached_df is None
+    assert fingerprint["sha256"] is not None
+
+    save_frame_cache(path_file, PARAMS, df, fingerprint)
+    cached_df, _ = load_frame_cache(path_file, PARAMS)
+    pd.testing.assert_frame_equal(cached_df, df)
+
+
+def test_load_frame_cache_touch_without_changes(tmp_path):
+    path_file = str(tmp_path / "data.csv")
+    write_source(path_file, "a\n1\n")
+    df = pd.DataFrame({"Название": ["А"]})
+    _, fingerprint = load_frame_cache(path_file, PARAMS)
+    save_frame_cache(path_file, PARAMS, df, fingerprint)
+
+    # Меняется только время изменения — кэш остаётся актуальным
+    stat = os.stat(path_file)
+    os.utime(path_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    cached_df, _ = load_frame_cache(path_file, PARAMS)
+    assert cached_df is not None
+
+
+def test_save_frame_cache_removes_stale_data(tmp_path):
+    path_file = str(tmp_path / "data.csv")
+    write_source(path_file, "a\n1\n")
+    _, fingerprint = load_frame_cache(path_file, PARAMS)
+    save_frame_cache(path_file, PARAMS, pd.DataFrame({"Название": ["А"]}), fingerprint)
+
+    write_source(path_file, "a\n1\n2\n")
+    cached_df, fingerprint = load_frame_cache(path_file, PARAMS)
+    assert cached_df is None
+    save_frame_cache(path_file, PARAMS, pd.DataFrame({"Название": ["А", "Б"]}), fingerprint)
+
+    data_files = [name for name in os.listdir(tmp_path / ".cache") if not name.endswith(".json")]
+    assert len(data_files) == 1
+
+
+@patch("src.cache.PARQUET_AVAILABLE", False)
+def test_save_frame_cache_pickle_fallback(tmp_path):
+    path_file = str(tmp_path / "data.csv")
+    write_source(path_file, "a\n1\n")
+    _, fingerprint = load_frame_cache(path_file, PARAMS)
+    save_frame_cache(path_file, PARAMS, pd.DataFrame({"Название": ["А"]}), fingerprint)
+    assert any(name.endswith(".pickle") for name in os.listdir(tmp_path / ".cache"))
+
+
+def test_get_frame_fingerprint_sample():
+    df = pd.DataFrame({"Сумма": range(10_000), "Категория": ["Кафе", "Такси"] * 5_000})
+    fingerprint = get_frame_fingerprint(df, sample_size=100)
+    assert get_frame_fingerprint(df.copy(), sample_size=100) == fingerprint
+
+    # первая и последняя строки, размер и колонки всегда входят в «отпечаток»
+    for changed in [df.assign(Сумма=df["Сумма"].where(df.index != 0, -1)), df.iloc[:-1], df.rename(columns=str.upper)]:
+        assert get_frame_fingerprint(changed, sample_size=100) != fingerprint
+    changed = df.copy()
+    changed.iloc[-1, 0] = -1
+    assert get_frame_fingerprint(changed, sample_size=100) != fingerprint
+    assert get_frame_fingerprint(df.iloc[:0]) != get_frame_fingerprint(df.iloc[:0, :1])
+
+
+def test_get_frame_fingerprint_middle_row():
+    df = pd.DataFrame(
+        {
+            "Сумма": [float(number) for number in range(10_000)],
+            "Описание": ["Кафе", "Такси"] * 5_000,
+            "Категория": pd.Categorical(["Кафе", "Такси"] * 5_000),
+        },
+        index=pd.date_range("2025-01-01", periods=10_000, freq="h"),
+    )
+    fingerprint = get_frame_fingerprint(df, sample_size=100)
+
+    # строка 4321 не попадает в выборку из 100 строк, но любое изменение значения меняет «отпечаток»
+    for column, value in [("Сумма", -1.0), ("Описание", "Кафе"), ("Категория", "Кафе")]:
+        changed = df.copy()
+        changed.iloc[4321, changed.columns.get_loc(column)] = value
+        assert get_frame_fingerprint(changed, sample_size=100) != fingerprint
+    # перестановка строк и изменение индекса
+    assert get_frame_fingerprint(df.iloc[[1, 0, *range(2, 10_000)]], sample_size=100) != fingerprint
+    changed = df.copy()
+    changed.index = changed.index.where(changed.index != changed.index[4321], pd.Timestamp("2030-01-01"))
+    assert get_frame_fingerprint(changed, sample_size=100) != fingerprint
+
+
+def test_ttl_cache_hits_and_misses():
+    cache = TTLCache(maxsize=2)
+    assert cache.get("USD") is None
+    cache.set("USD", 90.0)
+    assert cache.get("USD") == 90.0
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_ttl_cache_lru_eviction():
+    cache = TTLCache(maxsize=2)
+    cache.set("USD", 90.0)
+    cache.set("EUR", 100.0)
+    cache.get("USD")  # USD использовался последним
+    cache.set("CNY", 12.0)
+    assert cache.get("EUR") is None
+    assert cache.get("USD") == 90.0
+    assert len(cache) == 2
+
+
+def test_ttl_cache_expired():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("USD", 90.0, created=time.time() - 61)
+    assert cache.get("USD") is None
+    assert cache.items() == []
@@ -0,0 +1,44 @@
+import json
+import pstats
+import tracemalloc
+
+import pandas as pd
+
+from src.profiling import PipelineProfiler
+
+
+def build_frame(rows):
+    return pd.DataFrame({"Сумма платежа": range(rows)}).groupby(pd.Series(range(rows)) % 7).sum()
+
+
+def test_profiler_writes_reports(tmp_path):
+    profiler = PipelineProfiler(top_n=5)
+    with profiler.stage("малый"):
+        build_frame(10)
+    with profiler.stage("большой"):
+        data = [bytearray(1024) for _ in range(2048)]
+        del data
+
+    paths = profiler.write_report(str(tmp_path))
+
+    assert not tracemalloc.is_tracing()
+    with open(paths["json"], encoding="utf-8") as f:
+        report = json.load(f)
+    stages = {stage["stage"]: stage for stage in report["stages"]}
+    assert list(stages) == ["малый", "большой"]
+    # пиковая память этапа учитывает освобождённые внутри этапа объекты
+    assert stages["большой"]["memory_peak_mb"] >= 2
+    assert stages["большой"]["memory_retained_mb"] < 1
+
+    with open(paths["txt"], encoding="utf-8") as f:
+        text = f.read()
+    assert "=== Этап малый ===" in text and "build_frame" in text
+    assert any("build_frame" in func[2] for func in pstats.Stats(paths["prof"]).stats)
+
+
+def test_profiler_disabled(tmp_path):
+    profiler = PipelineProfiler(enabled=False)
+    with profiler.stage("этап"):
+        build_frame(10)
+    assert profiler.write_report(str(tmp_path)) == {}
+    assert list(tmp_path.iterdir()) == []
@@ -1,9 +1,18 @@
+import inspect
+import json
+import os
 from unittest.mock import Mock, patch
 
 import pandas as pd
 import pytest
 
-from src.reports import decorator_write_with_args, spending_by_weekday
+from src.reports import (
+    clear_report_caches,
+    decorator_cache_report,
+    decorator_write_with_args,
+    spending_by_weekday,
+    spending_by_weekday_rolling,
+)
 
 
 @pytest.mark.parametrize("date_input, expected_result", [("invalid-date-format", True), ("2023-09-04", False)])
@@ -161,3 +170,194 @@ def test_decorator_write_with_args(mocked_write_json, sample_data):
 
     # Проверяем, что функция write_json была вызвана
     mocked_write_json.assert_called_once()
+
+
+# Тесты расчёта средних трат по дням недели для диапазона дат
+@patch("src.utils.get_exchange_rate", return_value=80.0)
+def test_spending_by_weekday_rolling(mocked_rate):
+    transactions = pd.DataFrame(
+        {
+            "Дата платежа": ["04.09.2023", "04.09.2023", "05.09.2023", "11.09.2023", "02.12.2023", "06.09.2023"],
+            "Сумма платежа": [-100.0, -300.0, -10.0, -1.5, -50.0, 500.0],
+            "Валюта платежа": ["RUB", "RUB", "RUB", "USD", "RUB", "RUB"],
+        }
+    )
+    result = spending_by_weekday_rolling(transactions, "10.09.2023", "05.12.2023")
+
+    assert list(result.columns) == ["дата", "день_недели", "средние_траты"]
+    # результат совпадает с spending_by_weekday для каждой даты диапазона
+    # (исходная функция без трассировки, записи в файл и кэша отчётов)
+    compute_spending_by_weekday = inspect.unwrap(spending_by_weekday)
+    for anchor in ("10.09.2023", "11.09.2023", "04.12.2023", "05.12.2023"):
+        expected = compute_spending_by_weekday(transactions, anchor).reset_index(drop=True)
+        day_result = result.loc[result["дата"] == pd.to_datetime(anchor, format="%d.%m.%Y")]
+        pd.testing.assert_frame_equal(
+            day_result[["день_недели", "средние_траты"]].reset_index(drop=True), expected, check_dtype=False
+        )
+
+    first_day = result.loc[result["дата"] == "2023-09-11"]
+    assert first_day.set_index("день_недели")["средние_траты"].to_dict() == {"Понедельник": 173.33, "Вторник": 10.0}
+
+
+@patch("src.reports.write_json")
+def test_spending_by_weekday_unwrap(mocked_write_json, test_transactions):
+    compute_spending_by_weekday = inspect.unwrap(spending_by_weekday)
+    assert not hasattr(compute_spending_by_weekday, "__wrapped__")
+
+    clear_report_caches()
+    pd.testing.assert_frame_equal(
+        compute_spending_by_weekday(test_transactions, "30.09.2023"),
+        spending_by_weekday(test_transactions, "30.09.2023"),
+    )
+    # исходная функция не записывает отчёт
+    mocked_write_json.assert_called_once()
+
+
+def test_spending_by_weekday_rolling_invalid_date(test_transactions):
+    result = spending_by_weekday_rolling(test_transactions, "2023-09-01", "01.10.2023")
+    assert result.empty
+    assert list(result.columns) == ["дата", "день_недели", "средние_траты"]
+
+
+# Тесты записи отчётов в JSON Lines и parquet
+def test_decorator_jsonl_sink(tmp_path, sample_data):
+    report = decorator_write_with_args("weekday.json", sink="jsonl", chunk_size=2)(lambda df, date=None: df.head(3))
+
+    with patch("src.reports.DATA_DIR", str(tmp_path)):
+        report(sample_data, date="01.01.2025")
+        report(sample_data)
+
+    with open(tmp_path / "weekday.jsonl", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+
+    # отчёты дописываются, а не перезаписывают друг друга
+    assert len(records) == 6
+    assert records[0]["Категория"] == "Продукты"
+    assert records[0]["run_function"] == "<lambda>"
+    assert json.loads(records[0]["run_args"]) == {"args": ["DataFrame[5x5]"], "kwargs": {"date": "01.01.2025"}}
+    assert len({record["run_id"] for record in records}) == 2
+    assert all(record["run_duration"] >= 0 for record in records)
+
+
+def test_decorator_parquet_sink(tmp_path, sample_data):
+    pytest.importorskip("pyarrow")
+    report = decorator_write_with_args("weekday.json", sink="parquet")(lambda df: df)
+
+    with patch("src.reports.DATA_DIR", str(tmp_path)):
+        report(sample_data)
+        report(sample_data.head(2))
+
+    result = pd.read_parquet(tmp_path / "weekday")
+    assert len(result) == 7
+    assert result["run_id"].nunique() == 2
+
+
+# Тесты кэширующего декоратора
+def test_decorator_cache_report_hit_and_miss(sample_data):
+    calls = []
+
+    @decorator_cache_report(maxsize=4)
+    def report(df, date=None):
+        calls.append(date)
+        return df.head(2)
+
+    first = report(sample_data, date="01.02.2025")
+    second = report(sample_data.copy(), date="01.02.2025")
+    pd.testing.assert_frame_equal(first, second)
+    assert len(calls) == 1
+
+    # изменились данные или аргументы — отчёт строится заново
+    changed = sample_data.copy()
+    changed.loc[0, "Кэшбэк"] = 1.0
+    report(changed, date="01.02.2025")
+    report(sample_data, date="02.02.2025")
+    assert len(calls) == 3
+
+
+def test_decorator_cache_report_middle_row_change(tmp_path):
+    calls = []
+
+    @decorator_cache_report(disk=True)
+    def report(df):
+        calls.append(len(df))
+        return df.groupby("Категория", as_index=False)["Сумма платежа"].sum()
+
+    df = pd.DataFrame({"Категория": ["Кафе", "Такси"] * 5_000, "Сумма платежа": [-1.0] * 10_000})
+    changed = df.copy()
+    changed.loc[4321, "Сумма платежа"] = -1001.0
+
+    with patch("src.reports.REPORT_CACHE_DIR", str(tmp_path)):
+        first = report(df)
+        clear_report_caches()
+        second = report(changed)
+
+    assert len(calls) == 2
+    assert first["Сумма платежа"].sum() - second["Сумма платежа"].sum() == 1000.0
+
+
+def test_decorator_cache_report_eviction(sample_data):
+    calls = []
+
+    @decorator_cache_report(maxsize=2)
+    def report(df, date=None):
+        calls.append(date)
+        return df
+
+    for date in ["01.02.2025", "02.02.2025", "03.02.2025", "01.02.2025"]:
+        report(sample_data, date=date)
+    assert len(calls) == 4
+    report(sample_data, date="03.02.2025")
+    assert len(calls) == 4
+
+
+def test_decorator_cache_report_disk(tmp_path, sample_data):
+    calls = []
+
+    @decorator_cache_report(disk=True)
+    def report(df):
+        calls.append(len(df))
+        return df.groupby("Категория", as_index=False)["Кэшбэк"].sum()
+
+    with patch("src.reports.REPORT_CACHE_DIR", str(tmp_path)):
+        first = report(sample_data)
+        clear_report_caches()
+        second = report(sample_data)
+
+    pd.testing.assert_frame_equal(first, second)
+    assert len(calls) == 1
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_decorator_cache_report_skips_empty_results(sample_data):
+    calls = []
+
+    @decorator_cache_report()
+    def report(df):
+        calls.append(len(df))
+        return df.iloc[:0]
+
+    report(sample_data)
+    report(sample_data)
+    assert len(calls) == 2
+
+
+def test_decorator_cache_report_disk_limits(tmp_path, sample_data):
+    calls = []
+
+    @decorator_cache_report(disk=True)
+    def report(df, date=None):
+        calls.append(date)
+        return df
+
+    with patch("src.reports.REPORT_CACHE_DIR", str(tmp_path)), patch("src.reports.REPORT_CACHE_DISK_MAX_FILES", 2):
+        for date in ["01.02.2025", "02.02.2025", "03.02.2025"]:
+            report(sample_data, date=date)
+        # остаются самые новые файлы
+        assert len(list(tmp_path.iterdir())) == 2
+
+        # устаревший файл не используется
+        clear_report_caches()
+        for path in tmp_path.iterdir():
+            os.utime(path, (0, 0))
+        report(sample_data, date="03.02.2025")
+    assert calls == ["01.02.2025", "02.02.2025", "03.02.2025", "03.02.2025"]
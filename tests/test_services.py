@@ -2,7 +2,15 @@ from unittest.mock import patch
 
 import pandas as pd
 
-from src.services import get_profitable_cashback
+from src.services import (
+    get_best_cashback_category,
+    get_candidate_sets,
+    get_cashback_pivot,
+    get_profitable_cashback,
+    get_spend_pivot,
+    get_top_cashback_categories,
+    simulate_cashback,
+)
 
 
 @patch("src.services.write_json")
@@ -88,3 +96,59 @@ def test_write_json_failure(sample_data):
 
             # Проверка вызова метода critical
             mock_critical.assert_called_once()
+
+
+# Тесты сводной таблицы кэшбэка по всем месяцам
+@patch("src.services.write_json")
+def test_cashback_pivot_matches_month_scan(mock_write_json, sample_data):
+    pivot = get_cashback_pivot(sample_data)
+
+    assert list(pivot.index) == [(2025, 1)]  # февраль без положительного кэшбэка в таблицу не попадает
+    for str_month in ("01", "02"):
+        expected = get_profitable_cashback(sample_data, "2025", str_month)
+        result = get_profitable_cashback(sample_data, "2025", str_month, cashback_pivot=pivot)
+        assert list(result.items()) == list(expected.items())
+
+
+def test_best_and_top_cashback_categories():
+    data = pd.DataFrame(
+        {
+            "Дата платежа": ["01.01.2024", "02.01.2024", "05.02.2024", "10.03.2024", "11.03.2024", "01.05.2024"],
+            "Кэшбэк": [10.0, 25.0, 40.0, 5.0, 0.0, 100.0],
+            "Категория": ["Такси", "Кафе", "Такси", "Аптеки", "Кафе", "Кафе"],
+        }
+    )
+    pivot = get_cashback_pivot(data)
+
+    assert get_best_cashback_category(pivot, "2024", "01") == {"Кафе": 25.0}
+    assert get_best_cashback_category(pivot, "2024", "04") == {}
+    assert get_top_cashback_categories(pivot, "2024-01", "2024-03", top_n=2) == {"Такси": 50.0, "Кафе": 25.0}
+    assert get_top_cashback_categories(pivot, "2024-01", "2024-12") == {"Кафе": 125.0, "Такси": 50.0, "Аптеки": 5.0}
+    assert get_top_cashback_categories(pivot, "2024-13", "2024-12") == {}
+
+
+# Тест симулятора повышенного кэшбэка
+def test_simulate_cashback():
+    data = pd.DataFrame(
+        {
+            "Дата платежа": ["01.01.2024", "02.01.2024", "05.02.2024", "10.02.2024", "11.02.2024"],
+            "Сумма платежа": [-1000.0, -200.0, -500.0, -300.0, 5000.0],
+            "Кэшбэк": [0.0, 0.0, 0.0, 0.0, 0.0],
+            "Категория": ["Такси", "Кафе", "Такси", "Аптеки", "Пополнения"],
+        }
+    )
+    spend_pivot = get_spend_pivot(data)
+    assert spend_pivot.loc[(2024, 2), "Такси"] == 500.0
+    assert "Пополнения" not in spend_pivot.columns
+
+    candidate_sets = get_candidate_sets(["Кафе", "Такси", "Аптеки"], 2) + [("Кафе", "Нет такой категории")]
+    result = simulate_cashback(spend_pivot, candidate_sets, [0.05, 0.1])
+
+    assert len(result) == 8
+    best = result.iloc[0]
+    assert (best["категории"], best["ставка"], best["кэшбэк"]) == ("Такси, Аптеки", 0.1, 180.0)
+    assert best["кэшбэк_в_месяц"] == 90.0
+    assert best["лучший_месяц"] == "2024-01"
+    unknown = result.loc[(result["категории"] == "Кафе, Нет такой категории") & (result["ставка"] == 0.05)]
+    assert unknown["кэшбэк"].item() == 10.0
+    assert simulate_cashback(spend_pivot, [], [0.05]).empty
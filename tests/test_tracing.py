@@ -0,0 +1,111 @@
+import json
+from datetime import date
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from src.tracing import add_cache_hits, get_run_summary, log_run_summary, start_run, traced
+from src.utils import conversion_to_single_currency, get_currency_rates, get_list_operation, rate_cache
+
+
+def get_trace_records(caplog):
+    return [json.loads(record.getMessage()) for record in caplog.records if record.name == "trace.jsonl"]
+
+
+@traced("загрузка")
+def load(df):
+    add_cache_hits(2)
+    return df.head(1)
+
+
+@traced()
+def pipeline(df):
+    return load(df)
+
+
+@traced()
+def failing(df):
+    raise ValueError("нет данных")
+
+
+def test_traced_span_records(caplog):
+    caplog.set_level("INFO")
+    run_id = start_run()
+    pipeline(pd.DataFrame({"a": [1, 2, 3]}))
+
+    inner, outer = get_trace_records(caplog)
+    assert (inner["stage"], inner["parent"], inner["rows_in"], inner["rows_out"]) == ("загрузка", "pipeline", 3, 1)
+    assert inner["cache_hits"] == 2 and inner["status"] == "ok" and inner["run_id"] == run_id
+    # попадания в кэш учитываются только во вложенном этапе
+    assert (outer["stage"], outer["parent"], outer["cache_hits"]) == ("pipeline", None, 0)
+    assert outer["duration_ms"] >= inner["duration_ms"]
+
+
+def test_traced_error_and_summary(caplog):
+    caplog.set_level("INFO")
+    start_run()
+    for _ in range(2):
+        pipeline(pd.DataFrame({"a": [1, 2]}))
+    with pytest.raises(ValueError):
+        failing(pd.DataFrame())
+
+    assert get_trace_records(caplog)[-1]["error"] == "ValueError: нет данных"
+    stages = get_run_summary()["stages"]
+    assert (stages["pipeline"]["calls"], stages["pipeline"]["rows_in"], stages["pipeline"]["rows_out"]) == (2, 4, 2)
+    assert stages["загрузка"]["cache_hits"] == 4
+    assert (stages["failing"]["calls"], stages["failing"]["errors"]) == (1, 1)
+
+    summary = log_run_summary()
+    assert get_trace_records(caplog)[-1] == json.loads(json.dumps({"type": "summary", **summary}))
+
+
+def test_tracing_disabled(caplog):
+    caplog.set_level("INFO")
+    start_run()
+    with patch("src.tracing.TRACING_ENABLED", False):
+        pipeline(pd.DataFrame({"a": [1]}))
+    assert get_trace_records(caplog) == []
+    assert get_run_summary()["stages"] == {}
+
+
+@patch("src.utils.get_exchange_rate", return_value=80.0)
+def test_conversion_span(mocked_rate, caplog):
+    caplog.set_level("INFO")
+    start_run()
+    df = pd.DataFrame({"Сумма платежа": [-100.0, -2.0], "Валюта платежа": ["RUB", "USD"]})
+    conversion_to_single_currency(df, "RUB")
+
+    (record,) = get_trace_records(caplog)
+    assert (record["stage"], record["rows_in"], record["rows_out"]) == ("conversion_to_single_currency", 2, 2)
+
+
+# Попадания в кэш курсов из потоков run_concurrently учитываются в этапе вызывающего потока
+def test_cache_hits_concurrent_path(caplog):
+    caplog.set_level("INFO")
+    start_run()
+    rate_cache.clear()
+    for currency, rate in (("USD", 80.0), ("EUR", 90.0)):
+        rate_cache.set((currency, "RUB", date.today().isoformat()), rate)
+
+    with patch("src.utils.http_get") as mocked_http_get:
+        traced("курсы")(get_currency_rates)({"user_currencies": ["USD", "EUR"]})
+    rate_cache.clear()
+
+    mocked_http_get.assert_not_called()
+    (record,) = get_trace_records(caplog)
+    assert (record["stage"], record["cache_hits"]) == ("курсы", 2)
+
+
+def test_list_operation_cache_hit_rows(tmp_path, caplog):
+    path_file = str(tmp_path / "operations.xlsx")
+    pd.DataFrame({"Название": ["А", "Б", "В"], "Статус": ["OK", "OK", "FAILED"]}).to_excel(path_file, index=False)
+    get_list_operation(path_file, ["Название", "Статус"], use_cache=True)
+
+    caplog.set_level("INFO")
+    caplog.clear()
+    start_run()
+    get_list_operation(path_file, ["Название", "Статус"], use_cache=True)
+
+    (record,) = [record for record in get_trace_records(caplog) if record["stage"] == "get_list_operation"]
+    assert (record["cache_hits"], record["rows_in"], record["rows_out"]) == (1, 2, 2)
@@ -2,23 +2,47 @@ import json
 import os
 import shutil
 import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 from unittest.mock import patch
 
+import numpy as np
 import pandas as pd
 import pytest
+import requests
 
 from src.utils import (
+    CircuitBreaker,
+    CircuitOpenError,
     conversion_to_single_currency,
+    fill_rate_history,
     filter_by_date,
     get_currency_rates,
+    get_data_by_categories,
     get_data_from_expensess,
     get_data_from_income,
     get_exchange_rate,
+    get_history_rates,
     get_list_operation,
+    get_operation_schema,
     get_period_operation,
+    get_request_timeout,
     get_stock_price_sp_500,
+    get_stock_quotes_batch,
     get_user_settings,
+    http_get,
+    is_normalized_operations,
+    load_rate_history,
+    load_rate_store,
+    normalize_operations,
+    rate_cache,
+    read_csv_chunked,
+    run_concurrently,
+    save_rate_history,
+    save_rate_store,
+    slice_by_period,
     write_json,
 )
 
@@ -203,7 +227,7 @@ def test_filter_by_date_with_incorrect_date_format():
 
 
 # Тестируем функцию get_exchange_rate с заглушкой
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_get_exchange_rate_success(mock_get):
     mock_response = mock_get.return_value
     mock_response.status_code = 200
@@ -214,7 +238,7 @@ def test_get_exchange_rate_success(mock_get):
     assert result == 1.2
 
 
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_get_exchange_rate_failure(mock_get):
     mock_response = mock_get.return_value
     mock_response.status_code = 404
@@ -226,7 +250,7 @@ def test_get_exchange_rate_failure(mock_get):
 
 
 # Тест на ошибку JSON (JSONDecodeError)
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_get_exchange_rate_json_error(mock_get):
     mock_response = mock_get.return_value
     mock_response.status_code = 200
@@ -257,7 +281,7 @@ def test_conversion_to_single_currency(mock_get_exchange_rate):
     assert "Сумма платежа_RUB" in result.columns
 
 
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_conversion_to_single_currency_fail_convert(mock_get_exchange_rate):
     # Готовим тестовый DataFrame с некорректными значениями в денежном столбце
     df_input = pd.DataFrame(
@@ -369,6 +393,25 @@ def test_get_data_from_expensess_grouping():
     assert result["expenses"]["main"][-1]["amount"] == expected_sum, 'Сумма группы "Остальное" неверна!'
 
 
+# Тестируем формирование обоих разделов за один проход
+def test_get_data_by_categories():
+    df_input = pd.DataFrame(
+        {
+            "Категория": pd.Categorical(["Еда", "Зарплата", "Еда", None, "Кафе", "Зарплата", "Кафе"]),
+            "Сумма платежа_RUB": [-100.4, 1000.0, -50.0, -30.0, -200.4, 500.6, 0.0],
+        }
+    )
+    result = get_data_by_categories(df_input, top_count=1)
+
+    # строки без категории учитываются только в общей сумме
+    assert result["expenses"] == {
+        "total_amount": 381,
+        "main": [{"category": "Кафе", "amount": 200}, {"category": "Остальное", "amount": 150}],
+    }
+    assert result["income"] == {"total_amount": 1501, "main": [{"category": "Зарплата", "amount": 1501}]}
+    assert get_data_by_categories(pd.DataFrame({"Категория": ["Еда"]})) == {}
+
+
 # Тестируем функцию get_data_from_income
 def test_get_data_from_income():
     df_input = pd.DataFrame(
@@ -451,7 +494,8 @@ def test_get_currency_rates():
 
 
 # Тестируем функцию get_stock_price_sp_500 с заглушкой
-@patch("requests.get")
+@patch.dict(os.environ, {"API_KEY_SP_500": "test"})
+@patch("requests.Session.get")
 def test_get_stock_price_sp_500(mock_get):
     mock_response = mock_get.return_value
     mock_response.status_code = 200
@@ -472,3 +516,501 @@ def test_write_json():
     with open(output_path, "r") as f:
         content = f.read()
         assert '"key": "value"' in content
+
+
+# Тестируем кэш разобранного файла в get_list_operation
+def test_get_list_operation_use_cache(tmp_path):
+    path_file = str(tmp_path / "operations.xlsx")
+    df_test = pd.DataFrame({"Название": ["Продукт А", "Продукт B"], "Статус": ["OK", "FAILED"]})
+    df_test.to_excel(path_file, index=False)
+
+    first = get_list_operation(path_file, ["Название", "Статус"], use_cache=True)
+    assert len(first) == 1
+    assert os.path.isdir(tmp_path / ".cache")
+
+    # Повторная загрузка не должна разбирать Excel-файл
+    with patch("src.utils.pd.read_excel") as mock_read_excel:
+        second = get_list_operation(path_file, ["Название", "Статус"], use_cache=True)
+        mock_read_excel.assert_not_called()
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_get_list_operation_cache_rebuild_on_change(tmp_path):
+    path_file = str(tmp_path / "operations.xlsx")
+    pd.DataFrame({"Название": ["А"], "Статус": ["OK"]}).to_excel(path_file, index=False)
+    get_list_operation(path_file, ["Название", "Статус"], use_cache=True)
+
+    # Изменяем исходный файл — кэш должен пересобраться
+    pd.DataFrame({"Название": ["А", "Б"], "Статус": ["OK", "OK"]}).to_excel(path_file, index=False)
+    result = get_list_operation(path_file, ["Название", "Статус"], use_cache=True)
+    assert list(result["Название"]) == ["А", "Б"]
+
+
+# Тестируем потоковое чтение CSV по схеме
+CSV_OPERATIONS = (
+    "Дата платежа,Статус,Сумма платежа,Валюта платежа,Категория\n"
+    '31.12.2021,OK,"-160,89",RUB,Супермаркеты\n'
+    '30.12.2021,FAILED,"-64,00",RUB,Супермаркеты\n'
+    '29.12.2021,OK,"1000,50",USD,Пополнения\n'
+    '28.12.2021,OK,"-20,00",EUR,Кафе\n'
+)
+CSV_COLUMNS = ["Дата платежа", "Статус", "Сумма платежа", "Валюта платежа", "Категория"]
+
+
+def test_get_operation_schema():
+    schema = get_operation_schema(CSV_COLUMNS)
+    assert schema["dtype"]["Сумма платежа"] == "float64"
+    assert schema["dtype"]["Категория"] == "category"
+    assert schema["dates"] == {"Дата платежа": "%d.%m.%Y"}
+    assert "Статус" not in schema["dtype"]
+
+
+def test_read_csv_chunked(tmp_path):
+    path_file = tmp_path / "operations.csv"
+    path_file.write_text(CSV_OPERATIONS, encoding="utf-8")
+
+    result = read_csv_chunked(str(path_file), CSV_COLUMNS, chunk_size=2)
+
+    assert list(result["Сумма платежа"]) == [-160.89, 1000.5, -20.0]
+    assert pd.api.types.is_datetime64_any_dtype(result["Дата платежа"])
+    assert isinstance(result["Категория"].dtype, pd.CategoricalDtype)
+    assert set(result["Валюта платежа"].cat.categories) == {"RUB", "USD", "EUR"}
+    assert (result["Статус"] == "OK").all()
+
+
+def test_get_list_operation_csv_decimal_comma(tmp_path):
+    path_file = tmp_path / "operations.csv"
+    path_file.write_text(CSV_OPERATIONS, encoding="utf-8")
+
+    result = get_list_operation(str(path_file), CSV_COLUMNS)
+
+    assert len(result) == 3
+    assert pd.api.types.is_float_dtype(result["Сумма платежа"])
+
+
+def test_get_list_operation_excel_schema(tmp_path):
+    path_csv = tmp_path / "operations.csv"
+    path_csv.write_text(CSV_OPERATIONS, encoding="utf-8")
+    # в Excel-файле даты записаны текстом, как в выгрузке банка
+    path_excel = str(tmp_path / "operations.xlsx")
+    pd.read_csv(path_csv, decimal=",", dtype={"Дата платежа": "str"}).to_excel(path_excel, index=False)
+
+    result_csv = get_list_operation(str(path_csv), CSV_COLUMNS)
+    result_excel = get_list_operation(path_excel, CSV_COLUMNS)
+
+    # оба формата возвращают одинаковые типы колонок
+    pd.testing.assert_series_equal(result_excel.dtypes, result_csv.dtypes)
+    assert list(result_excel["Сумма платежа"]) == list(result_csv["Сумма платежа"])
+
+
+def test_get_list_operation_excel_text_numbers(tmp_path):
+    path_excel = str(tmp_path / "operations.xlsx")
+    pd.DataFrame(
+        {
+            "Дата платежа": ["31.12.2021", "30.12.2021", "29.12.2021", "28.12.2021"],
+            "Статус": ["OK", "OK", "OK", "OK"],
+            "Сумма платежа": ["1 234,50", -64.0, "нет данных", "-20,00"],
+            "Валюта платежа": ["RUB", "RUB", "USD", "EUR"],
+            "Категория": ["Супермаркеты", "Супермаркеты", "Пополнения", "Кафе"],
+        }
+    ).to_excel(path_excel, index=False)
+
+    result = get_list_operation(path_excel, CSV_COLUMNS)
+
+    # текстовые числа разбираются как в CSV, нечисловое значение не отменяет загрузку файла
+    assert pd.api.types.is_float_dtype(result["Сумма платежа"])
+    assert result["Сумма платежа"].fillna(0).tolist() == [-20.0, 0.0, -64.0, 1234.5]
+
+
+# Тестируем нормализацию DataFrame с операциями
+def test_normalize_operations():
+    df_input = pd.DataFrame({"Дата платежа": ["03.01.2025", "01.01.2025", None], "Сумма платежа": [-1, -2, -3]})
+
+    result = normalize_operations(df_input)
+
+    assert is_normalized_operations(result)
+    assert list(result["Сумма платежа"]) == [-2, -1]  # отсортировано, строка без даты исключена
+    assert list(result["год"]) == [2025, 2025]
+    assert list(result["месяц"]) == [1, 1]
+    assert list(result["день_недели"]) == [2, 4]
+    # исходный DataFrame не изменился
+    assert df_input["Дата платежа"].tolist() == ["03.01.2025", "01.01.2025", None]
+
+
+def test_normalize_operations_idempotent():
+    df_input = pd.DataFrame({"Дата платежа": ["01.01.2025"], "Сумма платежа": [-1]})
+    normalized = normalize_operations(df_input)
+    assert normalize_operations(normalized) is normalized
+
+
+def test_normalize_operations_without_date_column():
+    df_input = pd.DataFrame({"Название": ["Test"]})
+    assert normalize_operations(df_input) is df_input
+
+
+def test_filter_by_date_does_not_modify_input():
+    df_input = pd.DataFrame([{"Дата платежа": "01.01.2025"}, {"Дата платежа": "01.02.2025"}])
+    filter_by_date(df_input, ["2025-01-01", "2025-01-31"])
+    assert df_input["Дата платежа"].tolist() == ["01.01.2025", "01.02.2025"]
+
+
+def test_get_list_operation_normalized(tmp_path):
+    path_file = tmp_path / "operations.csv"
+    path_file.write_text(CSV_OPERATIONS, encoding="utf-8")
+
+    result = get_list_operation(str(path_file), CSV_COLUMNS)
+
+    assert is_normalized_operations(result)
+    assert list(result["Сумма платежа"]) == [-20.0, 1000.5, -160.89]
+
+
+# Тестируем срез по периоду бинарным поиском
+def test_slice_by_period_bounds():
+    df_input = normalize_operations(
+        pd.DataFrame(
+            {
+                "Дата платежа": ["31.12.2024", "01.01.2025", "15.01.2025", "31.01.2025", "01.02.2025"],
+                "Сумма платежа": [-1.0, -2.0, -3.0, -4.0, -5.0],
+            }
+        )
+    )
+
+    result = slice_by_period(df_input, "2025-01-01", "2025-02-01")
+
+    # начало включается, конец — нет
+    assert list(result["Сумма платежа"]) == [-2.0, -3.0, -4.0]
+    assert slice_by_period(df_input, "2026-01-01", "2026-02-01").empty
+
+
+def test_filter_by_date_without_copy():
+    df_input = normalize_operations(
+        pd.DataFrame({"Дата платежа": ["01.01.2025", "02.01.2025", "03.01.2025"], "Сумма платежа": [-1.0, -2.0, -3.0]})
+    )
+
+    result = filter_by_date(df_input, [date(2025, 1, 2), date(2025, 1, 4)])
+
+    assert list(result["Сумма платежа"]) == [-2.0, -3.0]
+    assert np.shares_memory(result["Сумма платежа"].to_numpy(), df_input["Сумма платежа"].to_numpy())
+
+
+# Тестируем кэш курсов валют
+@patch("requests.Session.get")
+def test_get_exchange_rate_cached(mock_get):
+    mock_response = mock_get.return_value
+    mock_response.status_code = 200
+    mock_response.json.return_value = {"conversion_rate": 90.5}
+
+    assert get_exchange_rate("USD") == 90.5
+    assert get_exchange_rate("usd") == 90.5
+    mock_get.assert_called_once()
+    assert rate_cache.stats()["hits"] == 1
+
+
+@patch("requests.Session.get")
+def test_get_exchange_rate_error_not_cached(mock_get):
+    mock_get.return_value.status_code = 500
+    assert get_exchange_rate("USD") == 0
+    assert get_exchange_rate("USD") == 0
+    assert mock_get.call_count == 2
+
+
+@patch("requests.Session.get")
+def test_rate_store_roundtrip(mock_get, tmp_path):
+    mock_response = mock_get.return_value
+    mock_response.status_code = 200
+    mock_response.json.return_value = {"conversion_rate": 100.0}
+    store_path = str(tmp_path / "rates.json")
+
+    get_exchange_rate("EUR")
+    save_rate_store(store_path)
+    rate_cache.clear()
+
+    # Новый «запуск» берёт курс из файла без обращения к API
+    assert load_rate_store(store_path) == 1
+    assert get_exchange_rate("EUR") == 100.0
+    mock_get.assert_called_once()
+
+
+def test_load_rate_store_missing_file(tmp_path):
+    assert load_rate_store(str(tmp_path / "nonexistent.json")) == 0
+
+
+# Тестируем HTTP-клиент на локальном сервере-заглушке
+def test_http_session_reuses_connection(stub_api):
+    assert get_exchange_rate("USD") == 80.0
+    assert get_exchange_rate("EUR") == 90.0
+    assert get_stock_price_sp_500({"user_stocks": ["AAPL"]}) == [{"stock": "AAPL", "price": 16000}]
+
+    # Все запросы прошли через одно соединение из пула
+    assert stub_api.requests == 3
+    assert stub_api.connections == 1
+
+
+def test_http_get_timeout(stub_api):
+    stub_api.latency = 0.5
+    with patch.dict("src.utils.API_TIMEOUTS", {"exchange": (0.5, 0.1)}), patch("src.utils.API_RETRY_TOTAL", 0):
+        assert get_exchange_rate("USD") == 0
+
+
+def test_http_get_retry_on_server_error(stub_api):
+    stub_api.fail_status = 503
+    with patch("src.utils.API_RETRY_BACKOFF", 0):
+        response = http_get("exchange", f"{stub_api.url}/v6/test/pair/USD/RUB")
+    assert response.status_code == 503
+    assert stub_api.requests == 3  # первая попытка и два повтора
+
+
+def test_circuit_breaker_opens(stub_api):
+    stub_api.fail_status = 500
+    with patch("src.utils.API_RETRY_TOTAL", 0), patch("src.utils.circuit_breakers", {}) as breakers:
+        breakers["exchange"] = CircuitBreaker(max_failures=2, reset_timeout=60)
+        for _ in range(2):
+            http_get("exchange", f"{stub_api.url}/v6/test/pair/USD/RUB")
+        with pytest.raises(CircuitOpenError):
+            http_get("exchange", f"{stub_api.url}/v6/test/pair/USD/RUB")
+    assert stub_api.requests == 2
+
+
+def test_circuit_breaker_half_open():
+    breaker = CircuitBreaker(max_failures=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()  # время блокировки истекло — пробный запрос разрешён
+    breaker.record_success()
+    assert breaker.failures == 0
+
+
+def test_circuit_breaker_single_probe():
+    breaker = CircuitBreaker(max_failures=1, reset_timeout=0.1)
+    breaker.record_failure()
+    assert not breaker.allow() and breaker.state == "open"
+    time.sleep(0.15)
+
+    # два запроса одновременно после истечения блокировки: пропускается только один пробный
+    barrier = threading.Barrier(2, timeout=5)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        allowed = list(executor.map(lambda _: barrier.wait() is not None and breaker.allow(), range(2)))
+    assert sorted(allowed) == [False, True]
+    assert breaker.state == "half_open" and not breaker.allow()
+
+    # ошибка пробного запроса снова размыкает цепь с новым временем блокировки
+    opened_at = breaker.opened_at
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.opened_at > opened_at
+    assert not breaker.allow()
+    time.sleep(0.15)
+
+    # успешный пробный запрос замыкает цепь
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow() and breaker.allow()
+
+
+# Тестируем параллельное выполнение запросов
+def test_run_concurrently_keeps_partial_results():
+    def fail():
+        raise ValueError("ошибка API")
+
+    result = run_concurrently({"USD": lambda: 80.0, "EUR": fail, "CNY": lambda: 11.0})
+    assert result == {"USD": 80.0, "CNY": 11.0}
+
+
+def test_run_concurrently_deadline():
+    start = time.perf_counter()
+    result = run_concurrently({"fast": lambda: 1, "slow": lambda: time.sleep(1) or 2}, deadline=0.2)
+    assert result == {"fast": 1}
+    assert time.perf_counter() - start < 0.9
+
+
+def test_stock_prices_fetched_concurrently(stub_api):
+    stub_api.latency = 0.2
+    user_settings = {"user_stocks": ["AAPL", "AMZN", "GOOGL", "MSFT", "TSLA"]}
+
+    start = time.perf_counter()
+    result = get_stock_price_sp_500(user_settings)
+    elapsed = time.perf_counter() - start
+
+    assert [item["stock"] for item in result] == user_settings["user_stocks"]
+    assert result[0]["price"] == 16000  # 200 USD * 80 RUB
+    # 6 запросов (5 котировок и курс доллара) по 0.2 с последовательно заняли бы 1.2 с
+    assert elapsed < 0.8
+
+
+def test_stock_prices_partial_results(stub_api):
+    result = get_stock_price_sp_500({"user_stocks": ["AAPL", "UNKNOWN"]})
+    assert result == [{"stock": "AAPL", "price": 16000}]
+
+
+def test_get_currency_rates_stub(stub_api):
+    result = get_currency_rates({"user_currencies": ["USD", "EUR"]})
+    assert result == [{"currency": "USD", "rate": 80.0}, {"currency": "EUR", "rate": 90.0}]
+
+
+# Тестируем общий срок ожидания котировок: запасной этап получает только оставшееся время
+@patch("src.utils.get_exchange_rate", return_value=80.0)
+@patch("src.utils.get_stock_quotes_batch", side_effect=lambda *args, **kwargs: time.sleep(0.3) or {"AAPL": 200.0})
+@patch("src.utils.get_stock_quote", side_effect=lambda *args, **kwargs: time.sleep(2) or 400.0)
+def test_stock_prices_shared_deadline(mocked_quote, mocked_batch, mocked_rate, monkeypatch):
+    monkeypatch.setenv("API_KEY_SP_500", "test")
+    start = time.monotonic()
+    result = get_stock_price_sp_500({"user_stocks": ["AAPL", "MSFT"]}, deadline=0.6)
+
+    assert result == [{"stock": "AAPL", "price": 16000}]
+    # все этапы получили один и тот же срок, отсчитанный от начала
+    expires_at = mocked_batch.call_args.kwargs["expires_at"]
+    assert mocked_quote.call_args.kwargs["expires_at"] == expires_at == mocked_rate.call_args.kwargs["expires_at"]
+    assert expires_at == pytest.approx(start + 0.6, abs=0.05)
+
+
+@patch("src.utils.get_stock_quote")
+@patch("src.utils.get_exchange_rate", return_value=80.0)
+@patch("src.utils.get_stock_quotes_batch", side_effect=lambda *args, **kwargs: time.sleep(0.3) or {"AAPL": 200.0})
+def test_stock_prices_deadline_expired(mocked_batch, mocked_rate, mocked_quote, monkeypatch):
+    monkeypatch.setenv("API_KEY_SP_500", "test")
+    result = get_stock_price_sp_500({"user_stocks": ["AAPL", "MSFT"]}, deadline=0.2)
+
+    # пакет не успел, запасной этап не запускается после истечения срока
+    assert result == []
+    mocked_quote.assert_not_called()
+
+
+# Тестируем таймауты запроса в пределах срока
+@patch("src.utils.API_RETRY_BACKOFF", 0.5)
+@patch("src.utils.API_RETRY_TOTAL", 2)
+def test_get_request_timeout():
+    assert get_request_timeout("exchange") == (3.05, 10)
+    # 3 попытки и паузы 0.5 + 1.0 с должны уложиться в 7.5 с
+    connect_timeout, read_timeout = get_request_timeout("exchange", time.monotonic() + 7.5)
+    assert connect_timeout == pytest.approx(2.0, abs=0.01) and read_timeout == connect_timeout
+    assert get_request_timeout("exchange", time.monotonic() + 100) == (3.05, 10)
+    with pytest.raises(requests.exceptions.Timeout):
+        get_request_timeout("exchange", time.monotonic() - 1)
+
+
+# Тестируем пакетный запрос котировок
+def test_get_stock_quotes_batch(stub_api):
+    result = get_stock_quotes_batch(["AAPL", "MSFT"], "test")
+    assert result == {"AAPL": 200.0, "MSFT": 400.0}
+    assert stub_api.requests == 1
+
+
+def test_stock_prices_single_batch_request(stub_api):
+    user_settings = {"user_stocks": ["AAPL", "AMZN", "GOOGL", "MSFT", "TSLA"]}
+    result = get_stock_price_sp_500(user_settings)
+
+    assert len(result) == 5
+    assert result[-1] == {"stock": "TSLA", "price": 20000}
+    assert stub_api.requests == 2  # пакет котировок и курс доллара
+
+
+def test_stock_prices_batch_fallback(stub_api):
+    stub_api.batch_status = 404
+    result = get_stock_price_sp_500({"user_stocks": ["AAPL", "MSFT"]})
+
+    assert result == [{"stock": "AAPL", "price": 16000}, {"stock": "MSFT", "price": 32000}]
+    assert stub_api.requests == 4  # пакет (ошибка), курс доллара и две котировки по одной
+
+
+# Тестируем конвертацию в несколько валют одной операцией
+def test_conversion_to_several_currencies():
+    rates = {("USD", "RUB"): 80.0, ("RUB", "USD"): 0.0125, ("USD", "EUR"): 0.9, ("RUB", "EUR"): 0.01}
+    df_input = pd.DataFrame({"Валюта платежа": ["USD", "RUB", None], "Сумма платежа": [10.0, 800.0, 5.0]})
+
+    with patch("src.utils.get_exchange_rate", side_effect=lambda c, t="RUB": rates[(c, t)]) as mock_rate:
+        result = conversion_to_single_currency(df_input, ["RUB", "USD", "EUR"])
+
+    assert list(result["Сумма платежа_RUB"]) == [800.0, 800.0, 5.0]
+    assert list(result["Сумма платежа_USD"]) == [10.0, 10.0, 5.0]
+    assert list(result["Сумма платежа_EUR"]) == [9.0, 8.0, 5.0]
+    # курс запрашивается один раз на пару валют
+    assert mock_rate.call_count == 4
+    # исходный DataFrame не изменён, а его колонки не копировались
+    assert list(df_input.columns) == ["Валюта платежа", "Сумма платежа"]
+    assert np.shares_memory(result["Валюта платежа"].to_numpy(), df_input["Валюта платежа"].to_numpy())
+
+
+@patch("src.utils.get_exchange_rate", return_value=80.0)
+def test_conversion_to_single_currency_categorical(mock_rate):
+    df_input = pd.DataFrame(
+        {"Валюта платежа": pd.Categorical(["USD", "RUB", "USD"]), "Сумма платежа": [1.0, 2.0, 3.0]}
+    )
+    result = conversion_to_single_currency(df_input)
+    assert list(result["Сумма платежа_RUB"]) == [80.0, 2.0, 240.0]
+    mock_rate.assert_called_once_with("USD", "RUB")
+
+
+# Тестируем пересчёт по историческим курсам на дату платежа
+RATE_HISTORY = pd.DataFrame(
+    {
+        "Дата курса": pd.to_datetime(["2021-01-01", "2021-01-10", "2021-01-01"]),
+        "Валюта": ["USD", "USD", "EUR"],
+        "Целевая валюта": ["RUB", "RUB", "RUB"],
+        "Курс": [70.0, 75.0, 90.0],
+    }
+)
+
+
+def test_get_history_rates_as_of():
+    df_input = pd.DataFrame(
+        {
+            "Дата платежа": ["12.01.2021", "05.01.2021", "10.01.2021", "31.12.2020", "05.01.2021", "05.01.2021"],
+            "Валюта платежа": ["USD", "USD", "USD", "USD", "RUB", "CNY"],
+        }
+    )
+    rates = get_history_rates(df_input, RATE_HISTORY)
+    # последний курс на дату платежа или раньше; до начала истории и без курса — NaN; рубли — 1
+    assert rates.tolist()[:3] == [75.0, 70.0, 75.0]
+    assert np.isnan(rates.iloc[3]) and np.isnan(rates.iloc[5])
+    assert rates.iloc[4] == 1.0
+
+
+@patch("src.utils.get_exchange_rate")
+def test_conversion_with_rate_history(mock_rate):
+    df_input = normalize_operations(
+        pd.DataFrame(
+            {
+                "Дата платежа": ["11.01.2021", "02.01.2021", "02.01.2021", "02.01.2021"],
+                "Валюта платежа": pd.Categorical(["USD", "USD", "EUR", "CNY"]),
+                "Сумма платежа": [-10.0, -10.0, -1.0, -5.0],
+            }
+        )
+    )
+    result = conversion_to_single_currency(df_input, "RUB", rate_history=RATE_HISTORY)
+
+    # строки отсортированы по дате при нормализации; без курса сумма остаётся исходной
+    assert sorted(result["Сумма платежа_RUB"].tolist()) == [-750.0, -700.0, -90.0, -5.0]
+    mock_rate.assert_not_called()
+
+
+def test_rate_history_roundtrip():
+    file_path = os.path.join(TEST_DATA_DIR, "rates_history.csv")
+    assert load_rate_history(file_path).empty
+
+    save_rate_history(pd.concat([RATE_HISTORY, RATE_HISTORY]), file_path)
+    history = load_rate_history(file_path)
+
+    assert len(history) == 3
+    assert history["Дата курса"].is_monotonic_increasing
+    assert (
+        get_history_rates(pd.DataFrame({"Дата платежа": ["15.01.2021"], "Валюта платежа": ["USD"]}), history)[0]
+        == 75.0
+    )
+
+
+def test_fill_rate_history(stub_api):
+    file_path = os.path.join(TEST_DATA_DIR, "rates_history_api.csv")
+    df_input = pd.DataFrame(
+        {
+            "Дата платежа": ["01.02.2021", "01.02.2021", "03.02.2021", "04.02.2021"],
+            "Валюта платежа": ["USD", "EUR", "USD", "RUB"],
+        }
+    )
+    history = fill_rate_history(df_input, "RUB", file_path=file_path)
+
+    # по одному запросу на каждую дату с операциями в иностранной валюте
+    assert stub_api.requests == 2
+    assert get_history_rates(df_input, history).round(6).tolist() == [80.0, 90.0, 80.0, 1.0]
+
+    # повторный вызов берёт курсы из файла
+    fill_rate_history(df_input, "RUB", file_path=file_path)
+    assert stub_api.requests == 2
+    assert len(load_rate_history(file_path)) == len(history)
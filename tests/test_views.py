@@ -1,9 +1,11 @@
+import json
+import threading
 from unittest.mock import patch
 
 import pandas as pd
 import pytest
 
-from src.views import events_operations
+from src.views import events_operations, events_operations_batch
 
 
 # Тестовые данные
@@ -148,3 +150,59 @@ def test_events_operations_invalid_dataframe_type(mocked_conversion, mocked_curr
 
     # Проверяем, что результат соответствует сообщению об ошибке
     assert result == "Нет данных"
+
+
+# Тест на параллельное получение курсов валют и котировок акций:
+# каждый раздел ждёт другой на барьере, при последовательном запросе барьер не будет пройден
+@patch("src.views.write_json")
+@patch("src.views.conversion_to_single_currency", side_effect=lambda df, *args, **kwargs: df)
+def test_events_operations_concurrent_market_data(mocked_conversion, mocked_write_json, sample_data_views):
+    barrier = threading.Barrier(2, timeout=5)
+
+    def wait_for(value):
+        return lambda *args, **kwargs: barrier.wait() is not None and value
+
+    with (
+        patch("src.views.get_currency_rates", side_effect=wait_for([{"currency": "USD"}])),
+        patch("src.views.get_stock_price_sp_500", side_effect=wait_for([{"stock": "AAPL"}])),
+    ):
+        result = events_operations(sample_data_views, "02.01.2025")
+
+    assert result["currency_rates"] == [{"currency": "USD"}]
+    assert result["stock_prices"] == [{"stock": "AAPL"}]
+
+
+# Тест пакетного формирования раздела События
+@patch("src.views.write_json")
+@patch("src.views.get_stock_price_sp_500", return_value=[{"stock": "AAPL", "price": 100}])
+@patch("src.views.get_currency_rates", return_value=[{"currency": "USD", "rate": 80.0}])
+@patch("src.views.get_user_settings", return_value={"user_currencies": ["USD"], "user_stocks": ["AAPL"]})
+@patch("src.utils.get_exchange_rate", return_value=80.0)
+def test_events_operations_batch(
+    mocked_rate, mocked_settings, mocked_currency_rates, mocked_stock_price, mocked_write_json, tmp_path
+):
+    df = pd.DataFrame(
+        {
+            "Дата платежа": ["01.01.2025", "02.01.2025", "10.01.2025", "20.02.2025", "21.02.2025"],
+            "Сумма платежа": [-100.0, 200.0, -3.5, -10.0, -1.25],
+            "Категория": ["Продукты", "Зарплата", "Кафе", "Продукты", "Такси"],
+            "Валюта платежа": ["RUB", "RUB", "USD", "RUB", "USD"],
+            "Кэшбэк": [1.0, 0.0, 0.0, 0.0, 0.0],
+        }
+    )
+    list_requests = [("05.01.2025", "W"), ("15.01.2025", "M"), ("25.02.2025", "Y"), ("25.02.2025", "ALL")]
+
+    with patch("src.utils.DATA_DIR", str(tmp_path)):
+        count = events_operations_batch(df, list_requests, "answers.jsonl")
+
+    with open(tmp_path / "answers.jsonl", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+
+    assert count == len(records) == 4
+    # настройки, курсы и котировки запрашиваются один раз на весь пакет
+    mocked_settings.assert_called_once()
+    mocked_currency_rates.assert_called_once()
+    for record, (str_date, range_data) in zip(records, list_requests):
+        assert (record.pop("date"), record.pop("range")) == (str_date, range_data)
+        assert record == events_operations(df, str_date, range_data)
+    assert records[1]["expenses"]["total_amount"] == 380
@@ -0,0 +1,66 @@
+import json
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from src import writer
+from src.utils import write_json
+from src.writer import OutputWriter, serialize, start_output_writer, stop_output_writer, write_file_atomic
+
+DATA = {"категория": "Кафе", "сумма": [1, 2.5]}
+
+
+def test_serializers():
+    assert serialize(DATA, "pretty").decode("utf-8") == json.dumps(DATA, ensure_ascii=False, indent=4)
+    assert serialize(DATA, "compact") == '{"категория":"Кафе","сумма":[1,2.5]}'.encode("utf-8")
+    # недоступный формат заменяется компактным JSON
+    assert serialize(DATA, "нет такого") == serialize(DATA, "compact")
+    with pytest.raises(TypeError):
+        serialize({"key": object()}, "compact")
+
+
+def test_write_file_atomic(tmp_path):
+    file_path = str(tmp_path / "answer.json")
+    write_file_atomic(file_path, b"old")
+    write_file_atomic(file_path, b"new")
+    assert (tmp_path / "answer.json").read_bytes() == b"new"
+    assert [path.name for path in tmp_path.iterdir()] == ["answer.json"]
+
+
+def test_output_writer_coalesces(tmp_path):
+    file_path = str(tmp_path / "answer.json")
+    started, release = threading.Event(), threading.Event()
+
+    def slow_write(path, payload):
+        started.set()
+        release.wait(5)
+        write_file_atomic(path, payload)
+
+    output = OutputWriter()
+    with patch("src.writer.write_file_atomic", side_effect=slow_write):
+        output.submit(file_path, b"0")
+        assert started.wait(5)
+        for number in range(1, 6):
+            output.submit(file_path, str(number).encode())
+        release.set()
+        assert output.flush(5)
+    output.close()
+
+    assert (tmp_path / "answer.json").read_bytes() == b"5"
+    assert (output.written, output.coalesced) == (2, 4)
+
+
+def test_write_json_in_background(tmp_path):
+    start_output_writer()
+    try:
+        with patch("src.utils.DATA_DIR", str(tmp_path)):
+            data = {"key": "value"}
+            write_json(data, "answer.json", serializer="compact")
+            data["key"] = "changed"  # изменения после вызова не попадают в файл
+        assert writer.get_output_writer().flush(5)
+    finally:
+        stop_output_writer()
+
+    assert writer.get_output_writer() is None
+    assert (tmp_path / "answer.json").read_text(encoding="utf-8") == '{"key":"value"}'